@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark offline do CloudSniffer
+
+Sobe um servidor local que imita S3, GCS, Azure, Firebase e os provedores
+compatíveis com S3, redireciona para ele todos os hostnames gerados pelo
+tester (override do resolver + reescrita de esquema/porta) e mede cada
+configuração de engine em um processo separado: probes/s, latência p50/p99,
+pico de RSS e tempo de CPU.
+
+A latência é medida igual nos dois engines: do envio (ou da conexão) até os
+cabeçalhos da resposta, sem a espera na fila do connector do engine async.
+Acima do throughput da máquina a concorrência vira fila (latência ≈
+concorrência / probes/s): compare configurações por probes/s.
+
+    python3 benchmark.py                                   # todas as configurações
+    python3 benchmark.py --configs threads-w15,async-c200  # apenas algumas
+    python3 benchmark.py --compare benchmark_baseline.json # compara com o baseline
+    python3 benchmark.py --save-baseline                   # atualiza o baseline
+"""
+
+import argparse
+import http.server
+import json
+import os
+import platform
+import random
+import re
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import cloudSniffer
+from cloudSniffer import Colors
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Configurações de engine comparadas (opções repassadas ao CloudBucketTester)
+CONFIGS = {
+    'threads-w15': {'engine': 'threads', 'workers': 15},
+    'threads-w50': {'engine': 'threads', 'workers': 50},
+    'async-c200': {'engine': 'async', 'workers': 15, 'concurrency': 200},
+    'async-c1000': {'engine': 'async', 'workers': 15, 'concurrency': 1000},
+}
+
+# Nome dos buckets gerados; o índice decide se o bucket é público, privado ou inexistente
+BUCKET_PATTERN = re.compile(r'bench-(\d+)')
+
+def bucket_state(index: int) -> str:
+    """5% públicos, 10% privados, o resto inexistente"""
+    if index % 20 == 0:
+        return 'open'
+    if index % 10 == 5:
+        return 'private'
+    return 'missing'
+
+class MockCloudHandler(http.server.BaseHTTPRequestHandler):
+    """Responde como o provedor indicado pelo cabeçalho Host, com status e cabeçalhos realistas"""
+    protocol_version = 'HTTP/1.1'
+    options: Dict[str, Any] = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def provider(self, host: str) -> str:
+        if host.endswith('.blob.core.windows.net') or 'windows.net' in host or host.endswith(('.azureedge.net', '.azurewebsites.net')):
+            return 'azure'
+        if host.endswith(('.firebaseio.com', '.web.app', '.firebaseapp.com')) or host.startswith('firebasestorage.'):
+            return 'firebase'
+        if 'googleapis.com' in host:
+            return 'gcp'
+        return 's3'  # AWS e compatíveis (DigitalOcean, Wasabi, Backblaze, ...)
+
+    def respond(self, send_body: bool):
+        options = self.options
+        delay = options['latency'] + random.uniform(-options['jitter'], options['jitter'])
+        if delay > 0:
+            time.sleep(delay)
+
+        host = (self.headers.get('Host') or '').split(':')[0].lower()
+        provider = self.provider(host)
+        match = BUCKET_PATTERN.search(host + self.path)
+        state = bucket_state(int(match.group(1))) if match else 'missing'
+
+        if random.random() < options['throttle']:
+            status, headers, body = self.throttled(provider)
+        else:
+            status, headers, body = getattr(self, f'{provider}_response')(state, match.group(0) if match else '')
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def listing(self, template: str) -> bytes:
+        """Repete entradas de listagem até --body-size bytes"""
+        entry = template.encode()
+        return entry * max(1, self.options['body_size'] // len(entry))
+
+    def throttled(self, provider: str):
+        if provider == 's3':
+            return 503, {'Server': 'AmazonS3', 'Retry-After': '0'}, b'<Error><Code>SlowDown</Code></Error>'
+        return 429, {'Retry-After': '0'}, b'Too Many Requests'
+
+    def s3_response(self, state: str, bucket: str):
+        headers = {
+            'Server': 'AmazonS3',
+            'x-amz-request-id': 'B1A2C3D4E5F60718',
+            'x-amz-id-2': 'Zm9vYmFyYmF6cXV4' * 5,
+            'Content-Type': 'application/xml'
+        }
+        if state == 'missing':
+            return 404, headers, b'<?xml version="1.0" encoding="UTF-8"?><Error><Code>NoSuchBucket</Code></Error>'
+        headers['x-amz-bucket-region'] = 'us-east-1'
+        if state == 'private':
+            return 403, headers, b'<?xml version="1.0" encoding="UTF-8"?><Error><Code>AccessDenied</Code></Error>'
+        body = (b'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                + self.listing('<Contents><Key>data/file.csv</Key><Size>1024</Size></Contents>')
+                + b'</ListBucketResult>')
+        return 200, headers, body
+
+    def gcp_response(self, state: str, bucket: str):
+        headers = {
+            'Server': 'UploadServer',
+            'x-goog-generation': '1700000000000000',
+            'X-GUploader-UploadID': 'ADPycdt' * 10,
+            'Content-Type': 'application/json; charset=UTF-8'
+        }
+        if state == 'missing':
+            return 404, headers, b'{"error": {"code": 404, "message": "The specified bucket does not exist."}}'
+        if state == 'private':
+            return 403, headers, b'{"error": {"code": 403, "message": "Anonymous caller does not have storage.objects.list access."}}'
+        return 200, headers, b'{"items": [' + self.listing('{"name": "data/file.csv"},').rstrip(b',') + b']}'
+
+    def azure_response(self, state: str, bucket: str):
+        headers = {
+            'Server': 'Windows-Azure-Blob/1.0 Microsoft-HTTPAPI/2.0',
+            'x-ms-request-id': 'a1b2c3d4-0000-0000-0000-000000000000',
+            'x-ms-version': '2009-09-19',
+            'Content-Type': 'application/xml'
+        }
+        if state == 'missing':
+            headers['x-ms-error-code'] = 'ResourceNotFound'
+            return 404, headers, b'<?xml version="1.0" encoding="utf-8"?><Error><Code>ResourceNotFound</Code></Error>'
+        if state == 'private':
+            headers['x-ms-error-code'] = 'PublicAccessNotPermitted'
+            return 409, headers, b'<?xml version="1.0" encoding="utf-8"?><Error><Code>PublicAccessNotPermitted</Code></Error>'
+        body = (b'<?xml version="1.0" encoding="utf-8"?><EnumerationResults><Blobs>'
+                + self.listing('<Blob><Name>data/file.csv</Name></Blob>') + b'</Blobs></EnumerationResults>')
+        return 200, headers, body
+
+    def firebase_response(self, state: str, bucket: str):
+        headers = {'Server': 'Google Frontend', 'Content-Type': 'application/json; charset=utf-8'}
+        if state == 'missing':
+            return 404, headers, b'{"error": "Firebase error. Please ensure that you spelled the name correctly"}'
+        if state == 'private':
+            return 401, headers, b'{"error": "Permission denied"}'
+        return 200, headers, b'{' + self.listing('"item": "value",').rstrip(b',') + b'}'
+
+class MockCloudServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # Backlog do listen(): o padrão (5) descarta SYNs com centenas de conexões simultâneas e o cliente
+    # só retransmite após 1s/3s/7s, medindo o servidor simulado em vez do engine
+    request_queue_size = 4096
+    children: List[int] = []
+
+    def handle_error(self, request, client_address):
+        pass  # Clientes que desistem da conexão (timeout, fim do scan) são esperados
+
+    def stop(self):
+        """Encerra a thread de atendimento e os processos extras"""
+        self.shutdown()
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        self.server_close()
+
+def start_mock_server(latency: float, jitter: float, throttle: float, body_size: int, processes: int = 1) -> MockCloudServer:
+    """Sobe o servidor simulado em uma porta livre; processes > 1 atende o mesmo socket a partir de vários processos (GIL)"""
+    MockCloudHandler.options = {'latency': latency, 'jitter': jitter, 'throttle': throttle, 'body_size': body_size}
+    server = MockCloudServer(('127.0.0.1', 0), MockCloudHandler)
+    server.children = []
+    for _ in range(processes - 1):
+        pid = os.fork()  # Antes de qualquer thread: o filho herda apenas o socket em escuta
+        if pid == 0:
+            signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+            server.serve_forever()
+            os._exit(0)
+        server.children.append(pid)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def route_to_mock(port: int):
+    """Override do resolver: qualquer hostname resolve para 127.0.0.1 (requests, aiohttp e DNSResolver)"""
+    real_getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(host, *args, **kwargs):
+        if isinstance(host, bytes):
+            host = host.decode()
+        if host and not re.match(r'^[\d.:]+$', host):
+            host = '127.0.0.1'
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    socket.getaddrinfo = getaddrinfo
+
+class BenchmarkTester(cloudSniffer.CloudBucketTester):
+    """Tester com override de transporte: mantém o hostname, troca esquema/porta pelos do servidor simulado"""
+    def __init__(self, port: int, **kwargs):
+        super().__init__(**kwargs)
+        self.port = port
+
+    def route(self, url: str) -> str:
+        parsed = urlparse(url)
+        return parsed._replace(scheme='http', netloc=f'{parsed.hostname}:{self.port}').geturl()
+
+    def build_probe_plan(self, bucket: str) -> List[cloudSniffer.Probe]:
+        return [probe._replace(url=self.route(probe.url)) for probe in super().build_probe_plan(bucket)]
+
+    def s3_discovery_url(self, bucket: str) -> str:
+        return self.route(super().s3_discovery_url(bucket))
+
+    def s3_list_url(self, bucket: str, region: str) -> str:
+        return self.route(super().s3_list_url(bucket, region))
+
+    def gcs_list_url(self, bucket: str) -> str:
+        return self.route(super().gcs_list_url(bucket))
+
+    def azure_list_url(self, bucket: str) -> str:
+        return self.route(super().azure_list_url(bucket))
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil pelo método nearest-rank (values ordenado)"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+def run_config(name: str, port: int, buckets: int, with_cli: bool) -> Dict[str, Any]:
+    """Executa uma configuração no processo atual e devolve as métricas"""
+    route_to_mock(port)
+    options = CONFIGS[name]
+    tester = BenchmarkTester(
+        port,
+        timeout=10,
+        workers=options['workers'],
+        engine=options['engine'],
+        concurrency=options.get('concurrency', 1000),
+        resolver=cloudSniffer.DNSResolver(timeout=5),
+        s3_region_cache=cloudSniffer.S3RegionCache(),  # Em memória: execuções reprodutíveis
+        host_health=cloudSniffer.HostHealthCache()
+    )
+    names = [f'bench-{i:05d}' for i in range(buckets)]
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    results = tester.test_buckets(names, no_cli=not with_cli, quiet=True)
+    wall = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    tester.close()
+
+    probes = [test for result in results for test in result['http_tests'] + result['advanced_tests']]
+    latencies = sorted(test['response_time'] for test in probes if test['status_code'] is not None)
+    # ru_maxrss: KB no Linux, bytes no macOS
+    rss_divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'config': name,
+        'options': options,
+        'buckets': buckets,
+        'probes': len(probes),
+        'errors': sum(1 for test in probes if test['status_code'] is None),
+        'wall_seconds': round(wall, 3),
+        'probes_per_second': round(len(probes) / wall, 1) if wall else 0.0,
+        'latency_p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'peak_rss_mb': round(usage_after.ru_maxrss / rss_divisor, 1),
+        'cpu_seconds': round((usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime), 3)
+    }
+
+def run_isolated(name: str, port: int, args) -> Optional[Dict[str, Any]]:
+    """Roda a configuração em um processo filho para medir RSS e CPU sem interferência das demais"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--run-config', name, '--port', str(port),
+           '--buckets', str(args.buckets)]
+    if args.with_cli:
+        cmd.append('--with-cli')
+    completed = subprocess.run(cmd, capture_output=True, text=True)
+    if completed.returncode != 0:
+        print(f"{Colors.ERROR}{name}: falhou{Colors.RESET}\n{completed.stderr.strip()}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def print_table(runs: List[Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]] = None, threshold: float = 20.0):
+    print(f"\n{Colors.HEADER}{'config':<14}{'probes':>8}{'erros':>7}{'probes/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'RSS MB':>9}{'CPU s':>8}{Colors.RESET}")
+    for run in runs:
+        line = (f"{run['config']:<14}{run['probes']:>8}{run['errors']:>7}{run['probes_per_second']:>11}{run['latency_p50_ms']:>9}"
+                f"{run['latency_p99_ms']:>9}{run['peak_rss_mb']:>9}{run['cpu_seconds']:>8}")
+        reference = (baseline or {}).get(run['config'])
+        if reference and reference['probes_per_second']:
+            change = (run['probes_per_second'] / reference['probes_per_second'] - 1) * 100
+            color = Colors.ERROR if change < -threshold else Colors.SUCCESS
+            line += f"  {color}{change:+.1f}% vs baseline{Colors.RESET}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline do CloudSniffer contra um servidor multi-cloud simulado')
+    parser.add_argument('--configs', type=str, default=','.join(CONFIGS), help='Configurações a medir (padrão: todas)')
+    parser.add_argument('--buckets', type=int, default=100, help='Buckets sintéticos por configuração (padrão: 100)')
+    parser.add_argument('--latency', type=float, default=20.0, help='Latência do servidor simulado em ms (padrão: 20)')
+    parser.add_argument('--jitter', type=float, default=10.0, help='Variação aleatória da latência em ms (padrão: 10)')
+    parser.add_argument('--throttle', type=float, default=0.0, help='Fração de respostas 429/503 com Retry-After (padrão: 0)')
+    parser.add_argument('--body-size', type=int, default=4096, help='Tamanho aproximado do corpo das listagens públicas (padrão: 4096)')
+    parser.add_argument('--server-processes', type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help='Processos do servidor simulado (padrão: metade das CPUs)')
+    parser.add_argument('--with-cli', action='store_true', help='Inclui as listagens nativas (S3/GCS/Azure)')
+    parser.add_argument('--output', type=str, help='Salva as métricas desta execução em JSON')
+    parser.add_argument('--compare', type=str, help='Compara probes/s com um arquivo de baseline')
+    parser.add_argument('--threshold', type=float, default=20.0, help='Queda percentual de probes/s considerada regressão (padrão: 20)')
+    parser.add_argument('--save-baseline', action='store_true', help=f'Grava as métricas em {os.path.basename(BASELINE_FILE)}')
+    parser.add_argument('--run-config', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_config:
+        # Processo filho: uma configuração, métricas em JSON na última linha
+        print(json.dumps(run_config(args.run_config, args.port, args.buckets, args.with_cli)))
+        return
+
+    names = [name.strip() for name in args.configs.split(',') if name.strip()]
+    unknown = [name for name in names if name not in CONFIGS]
+    if unknown:
+        print(f"{Colors.ERROR}Configurações desconhecidas: {', '.join(unknown)} (disponíveis: {', '.join(CONFIGS)}){Colors.RESET}")
+        sys.exit(1)
+    if cloudSniffer.aiohttp is None:
+        skipped = [name for name in names if CONFIGS[name]['engine'] == 'async']
+        if skipped:
+            print(f"{Colors.WARNING}aiohttp não instalado: pulando {', '.join(skipped)}{Colors.RESET}")
+        names = [name for name in names if name not in skipped]
+
+    server = start_mock_server(args.latency / 1000, args.jitter / 1000, args.throttle, args.body_size, args.server_processes)
+    port = server.server_address[1]
+    print(f"{Colors.INFO}Servidor simulado em 127.0.0.1:{port} | latência {args.latency}±{args.jitter} ms | "
+          f"throttling {args.throttle:.0%} | {args.buckets} buckets | {args.server_processes} processo(s){Colors.RESET}")
+
+    runs = []
+    for name in names:
+        print(f"{Colors.INFO}Medindo {name}...{Colors.RESET}")
+        run = run_isolated(name, port, args)
+        if run is not None:
+            runs.append(run)
+    server.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = {run['config']: run for run in json.load(f)['runs']}
+    print_table(runs, baseline, args.threshold)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'mock': {'latency_ms': args.latency, 'jitter_ms': args.jitter, 'throttle': args.throttle,
+                 'body_size': args.body_size, 'buckets': args.buckets, 'with_cli': args.with_cli,
+                 'server_processes': args.server_processes},
+        'runs': runs
+    }
+    for filename in filter(None, [args.output, BASELINE_FILE if args.save_baseline else None]):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"\n{Colors.INFO}Métricas salvas em: {filename}{Colors.RESET}")
+
+    if baseline and any(run['config'] in baseline and baseline[run['config']]['probes_per_second'] and
+                        run['probes_per_second'] < baseline[run['config']]['probes_per_second'] * (1 - args.threshold / 100)
+                        for run in runs):
+        sys.exit(2)
+
+if __name__ == '__main__':
+    main()
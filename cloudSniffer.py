@@ -6,18 +6,65 @@ Author: TheZakMan
 """
 
 import random
+import re
 import requests
 import subprocess
 import sys
 import argparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import urlparse
+from urllib.parse import urlparse, parse_qsl, quote
+from xml.etree import ElementTree
 import json
 import time
+from itertools import chain, product
 import os
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import gzip
+import lzma
+import queue
+import threading
+import asyncio
+import ipaddress
+import socket
+import struct
+import sqlite3
+import configparser
+import hmac
+import hashlib
+import multiprocessing
+import signal
+import socketserver
+import bisect
+import math
+import string
+import cProfile
+import tempfile
+import pstats
+from array import array
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from enum import Enum
+from email.utils import parsedate_to_datetime
+from http.cookiejar import DefaultCookiePolicy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, NamedTuple, Iterable, Iterator, Callable, Tuple
 from colorama import init, Fore, Back, Style
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError, NameResolutionError, ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+
+try:
+    import aiohttp
+except ImportError:  # Dependência opcional, necessária apenas para --engine async
+    aiohttp = None
+
+try:
+    import yaml
+except ImportError:  # Dependência opcional, necessária apenas para --provider-file em YAML
+    yaml = None
 
 import random
 from colorama import Fore, Style
@@ -67,44 +114,2273 @@ class Colors:
     BOLD = Style.BRIGHT
     RESET = Style.RESET_ALL
 
+class Provider(str, Enum):
+    """Provedores dos probes embutidos"""
+    AWS = 'aws'
+    GCP = 'gcp'
+    AZURE = 'azure'
+    FIREBASE = 'firebase'
+    DIGITALOCEAN = 'digitalocean'
+    LINODE = 'linode'
+    ORACLE = 'oracle'
+    IBM = 'ibm'
+    BACKBLAZE = 'backblaze'
+    WASABI = 'wasabi'
+    VULTR = 'vultr'
+    SCALEWAY = 'scaleway'
+    OVH = 'ovh'
+    MINIO = 'minio'
+    
+    def __str__(self) -> str:
+        return self.value
+
+class Variant(str, Enum):
+    """Variantes de endpoint (ver classify_probe_variant)"""
+    PATH_STYLE = 'path-style'
+    VIRTUAL_HOSTED = 'virtual-hosted'
+    WEBSITE = 'website'
+    ACCELERATE = 'accelerate'
+    DUALSTACK = 'dualstack'
+    CDN = 'cdn'
+    API = 'api'
+    DISCOVERY = 'discovery'
+    
+    def __str__(self) -> str:
+        return self.value
+
+def intern_label(enum: type, value: str):
+    """Membro do enum para rótulos conhecidos; string internada para os demais"""
+    try:
+        return enum(value)
+    except ValueError:
+        return sys.intern(value)
+
+class Probe(NamedTuple):
+    """Uma requisição planejada do probe plan"""
+    url: str
+    provider: Provider
+    variant: Variant
+    tag: str  # 'http' (URLs padrão) ou 'advanced'
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def canonicalize_url(url: str) -> str:
+    """Forma canônica de uma URL: esquema/host em minúsculas, sem porta padrão e sem barra final redundante"""
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parsed.port}'
+    path = parsed.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+    canonical = f'{scheme}://{host}{path}'
+    if parsed.query:
+        canonical += f'?{parsed.query}'
+    return canonical
+
+def classify_probe_variant(url: str, bucket: str) -> str:
+    """Rótulo da variante de endpoint de uma URL (path-style, virtual-hosted, website, ...)"""
+    parsed = urlparse(url)
+    host = parsed.hostname or ''
+    if 'website' in host or host.endswith(('.web.app', '.firebaseapp.com', '.azurewebsites.net', '.web.core.windows.net')):
+        return 'website'
+    if 'accelerate' in host:
+        return 'accelerate'
+    if 'dualstack' in host:
+        return 'dualstack'
+    if '.cdn.' in host or host.endswith('.azureedge.net'):
+        return 'cdn'
+    if parsed.query or '/storage/v1/' in parsed.path or '/v0/b/' in parsed.path or host.endswith('.firebaseio.com'):
+        return 'api'
+    if host.startswith(f'{bucket.lower()}.'):
+        return 'virtual-hosted'
+    return 'path-style'
+
+# Cabeçalhos relevantes para segurança guardados no cache de probes ('*' = prefixo)
+HEADER_ALLOWLIST = ('server', 'content-length', 'location', 'x-amz-bucket-region', 'x-ms-*', 'x-goog-*')
+
+def filter_headers(headers, allowlist=HEADER_ALLOWLIST) -> Dict[str, str]:
+    """Mantém apenas os cabeçalhos da allowlist (comparação sem diferenciar maiúsculas)"""
+    exact = {name for name in allowlist if not name.endswith('*')}
+    prefixes = tuple(name[:-1] for name in allowlist if name.endswith('*'))
+    return {k: v for k, v in headers.items() if k.lower() in exact or k.lower().startswith(prefixes)}
+
+# Fases medidas em cada probe: resolução DNS, conexão TCP, handshake TLS, tempo até o primeiro byte e total
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'total')
+
+def phase_timings(dns: Optional[float], connect: Optional[float], tls: Optional[float],
+                  headers: float, total: float) -> tuple:
+    """Tupla de fases a partir das medições de conexão; headers = tempo até os cabeçalhos da resposta"""
+    setup = sum(phase or 0.0 for phase in (dns, connect, tls))
+    return tuple(None if value is None else round(value, 6)
+                 for value in (dns, connect, tls, max(headers - setup, 0.0), total))
+
+# Marca o nome do bucket nos templates de URL (nunca aparece em uma URL real)
+BUCKET_MARK = '\0'
+
+class ProbeResult:
+    """Resultado de um probe em forma compacta; acessível como dict e gravado como dict no JSON"""
+    __slots__ = ('_template', '_bucket', 'method', 'status_code', 'accessible', 'headers', 'size', 'truncated',
+                 'retries', 'error', 'response_time', '_timings', 'cached', 'provider', 'variant')
+    FIELDS = ('url', 'method', 'status_code', 'accessible', 'headers', 'size', 'truncated',
+              'retries', 'error', 'response_time', 'timings', 'cached', 'provider', 'variant')
+    
+    def __init__(self, url: str, method: str, status_code: Optional[int] = None, accessible: bool = False,
+                 headers: Optional[Dict[str, str]] = None, size: int = 0, truncated: bool = False, retries: int = 0,
+                 error: Optional[str] = None, response_time: float = 0, cached: bool = False,
+                 timings: Optional[tuple] = None):
+        self._template = url
+        self._bucket: Optional[str] = None
+        self.method = method
+        self.status_code = status_code
+        self.accessible = accessible
+        self.headers = headers if headers is not None else {}
+        self.size = size
+        self.truncated = truncated
+        self.retries = retries
+        self.error = error
+        self.response_time = response_time
+        self._timings = timings  # Tupla na ordem de PHASES (None = fase não medida)
+        self.cached = cached
+        self.provider = None
+        self.variant = None
+    
+    @property
+    def url(self) -> str:
+        if self._bucket is None:
+            return self._template
+        return self._template.replace(BUCKET_MARK, self._bucket)
+    
+    @url.setter
+    def url(self, url: str):
+        self._template = url
+        self._bucket = None
+    
+    @property
+    def timings(self) -> Optional[Dict[str, Optional[float]]]:
+        if self._timings is None:
+            return None
+        return dict(zip(PHASES, self._timings))
+    
+    @timings.setter
+    def timings(self, timings: Optional[Dict[str, Optional[float]]]):
+        self._timings = tuple(timings.get(phase) for phase in PHASES) if timings else None
+    
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __setitem__(self, key: str, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+    
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+    
+    def keys(self):
+        return self.to_dict().keys()
+    
+    @property
+    def hit(self) -> bool:
+        """Resposta que interessa ao relatório (404 NoSuchBucket conta como acessível, mas não é achado)"""
+        return self.accessible and self.status_code != 404
+    
+    def compact(self, bucket: str, allowlist=HEADER_ALLOWLIST):
+        """Troca a URL por um template internado e reduz os cabeçalhos à allowlist (exceto em achados)"""
+        if self._bucket is None and bucket in self._template:
+            self._template = sys.intern(self._template.replace(bucket, BUCKET_MARK))
+            self._bucket = bucket
+        if not self.hit:
+            self.headers = filter_headers(self.headers, allowlist)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma serializada, compatível com os resultados em dict"""
+        record = {field: getattr(self, field) for field in self.FIELDS[:-2]}
+        if self.provider is not None:
+            record['provider'] = self.provider
+            record['variant'] = self.variant
+        return record
+    
+    def __repr__(self) -> str:
+        return f'ProbeResult({self.to_dict()!r})'
+
+def json_default(value):
+    """Serializa ProbeResult nos json.dump(s) de resultados"""
+    if isinstance(value, ProbeResult):
+        return value.to_dict()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def probe_error_result(url: str, method: str, error: str, response_time: float = 0) -> ProbeResult:
+    """Resultado de probe sem resposta HTTP (response_time = tempo até a falha)"""
+    return ProbeResult(url, method, error=error, response_time=response_time)
+
+PROBE_MODES = ['get', 'head', 'range', 'stream']
+
+def declared_body_size(headers) -> Optional[int]:
+    """Tamanho total do corpo informado pelos cabeçalhos (Content-Range tem prioridade)"""
+    total = headers.get('Content-Range', '').rpartition('/')[2]
+    if total.isdigit():
+        return int(total)
+    length = headers.get('Content-Length', '')
+    if length.isdigit():
+        return int(length)
+    return None
+
+# Pools mantidos para hosts que não dependem do bucket (path-style e endpoints regionais)
+SHARED_POOL_HOSTS = 1024
+
+class PoolStats:
+    """Contadores thread-safe de reuso de conexões do pool"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connects = 0
+        self.hosts = 0
+
+    def record_checkout(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_host(self):
+        with self._lock:
+            self.hosts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = max(self.requests - self.connects, 0)
+            return {
+                'requests': self.requests,
+                'hits': hits,
+                'misses': self.connects,
+                'hit_ratio': round(hits / self.requests, 4) if self.requests else 0.0,
+                'hosts': self.hosts
+            }
+
+# Fases da última conexão aberta pela thread atual (None = conexão reaproveitada do pool)
+_connection_phases = threading.local()
+
+class _CountingConnectionMixin:
+    """Conta cada handshake TCP/TLS real (miss do pool) e mede DNS, conexão TCP e TLS"""
+    pool_stats: Optional[PoolStats] = None
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host.strip('[]'), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        if not addresses:
+            raise NewConnectionError(self, 'getaddrinfo returns an empty list')
+        resolved = time.perf_counter()
+        
+        # Como o create_connection do urllib3: tenta cada endereço resolvido, em ordem, até um aceitar;
+        # cada tentativa passa pelo _new_conn original (timeout e exceções do urllib3) com o IP já resolvido
+        dns_host = self._dns_host
+        error = None
+        try:
+            for address in dict.fromkeys(info[4][0] for info in addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except ConnectTimeoutError as e:  # Inclui NewConnectionError (recusa, rede inalcançável)
+                    error = e
+            else:
+                raise error
+        finally:
+            self._dns_host = dns_host
+        
+        # connect inclui as tentativas que falharam antes do endereço que respondeu
+        _connection_phases.current = [resolved - start, time.perf_counter() - resolved, None]
+        return sock
+
+    def connect(self):
+        if self.pool_stats is not None:
+            self.pool_stats.record_connect()
+        _connection_phases.current = None
+        start = time.perf_counter()
+        super().connect()
+        phases = getattr(_connection_phases, 'current', None)
+        if phases is not None and isinstance(self, HTTPSConnection):
+            phases[2] = max(time.perf_counter() - start - phases[0] - phases[1], 0.0)
+
+class _CountingHTTPConnection(_CountingConnectionMixin, HTTPConnection):
+    pass
+
+class _CountingHTTPSConnection(_CountingConnectionMixin, HTTPSConnection):
+    pass
+
+class _CountingPoolMixin:
+    """Conta checkouts de conexão e propaga os contadores para as conexões"""
+    pool_stats: Optional[PoolStats] = None
+
+    def _get_conn(self, timeout=None):
+        if self.pool_stats is not None:
+            self.pool_stats.record_checkout()
+        return super()._get_conn(timeout)
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.pool_stats = self.pool_stats
+        return conn
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+class _PoolLRU:
+    """LRU thread-safe de pools de conexão; os pools expulsos ou descartados são fechados"""
+    def __init__(self, capacity: int):
+        self.capacity = max(capacity, 1)
+        self.lock = threading.Lock()
+        self.pools: OrderedDict = OrderedDict()
+    
+    def get_or_create(self, key, create: Callable[[], Any]):
+        evicted = []
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is not None:
+                self.pools.move_to_end(key)
+                return pool
+            pool = self.pools[key] = create()
+            while len(self.pools) > self.capacity:
+                evicted.append(self.pools.popitem(last=False)[1])
+        for old in evicted:
+            old.close()  # Fora do lock: fechar um pool pode esperar conexões em uso
+        return pool
+    
+    def clear(self):
+        with self.lock:
+            pools = list(self.pools.values())
+            self.pools.clear()
+        for pool in pools:
+            pool.close()
+    
+    def __len__(self) -> int:
+        return len(self.pools)
+
+class _CountingPoolManager(PoolManager):
+    """PoolManager que cria pools por host instrumentados; hosts compartilhados entre buckets
+    têm uma LRU própria, da qual os virtual-hosts de cada bucket não os expulsam"""
+    def __init__(self, *args, pool_stats: Optional[PoolStats] = None, shared_hosts: Optional[re.Pattern] = None,
+                 shared_pools: int = SHARED_POOL_HOSTS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_stats = pool_stats
+        self.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool
+        }
+        self.shared_hosts = shared_hosts  # None = uma única LRU para todos os hosts
+        self.shared_pools = _PoolLRU(shared_pools)
+    
+    def connection_from_pool_key(self, pool_key, request_context):
+        if self.shared_hosts is None or not self.shared_hosts.fullmatch(request_context['host'] or ''):
+            return super().connection_from_pool_key(pool_key, request_context)
+        return self.shared_pools.get_or_create(pool_key, lambda: self._new_pool(
+            request_context['scheme'], request_context['host'], request_context['port'], request_context=request_context))
+    
+    def clear(self):
+        super().clear()
+        self.shared_pools.clear()
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.pool_stats = self.pool_stats
+        if self.pool_stats is not None:
+            self.pool_stats.record_host()
+        return pool
+
+class _PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter que usa o PoolManager instrumentado"""
+    def __init__(self, pool_stats: PoolStats, shared_hosts: Optional[re.Pattern] = None, **kwargs):
+        self.pool_stats = pool_stats
+        self.shared_hosts = shared_hosts
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _CountingPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            pool_stats=self.pool_stats,
+            shared_hosts=self.shared_hosts,
+            **pool_kwargs
+        )
+
+class SharedHTTPClient:
+    """Sessão HTTP keep-alive compartilhada por todo o scan (todas as threads e buckets)"""
+    def __init__(self, workers: int = 15, max_hosts: Optional[int] = None, shared_hosts: Optional[re.Pattern] = None):
+        self.stats = PoolStats()
+        # Cada host mantém até `workers` conexões vivas. Os endpoints fixos (s3.<region>,
+        # storage.googleapis.com, ...) ficam em uma LRU de SHARED_POOL_HOSTS; max_hosts
+        # limita só os virtual-hosts de cada bucket, que raramente são reaproveitados
+        self.adapter = _PooledHTTPAdapter(
+            self.stats,
+            shared_hosts=shared_hosts,
+            pool_connections=max_hosts or max(64, workers * 4),
+            pool_maxsize=workers,
+            pool_block=False
+        )
+        self.session = requests.Session()
+        # Sem cookies: cada probe deve se comportar como uma requisição isolada
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method=method, url=url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+# Regiões usadas pela estratégia --aws-strategy fanout (comportamento original)
+AWS_FANOUT_REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1', 'sa-east-1', 'us-east-2', 'eu-central-1']
+
+# Qualquer região válida informada pelo S3 (comerciais, opt-in e GovCloud)
+AWS_REGION_PATTERN = re.compile(r'^[a-z]{2}(-[a-z]+)+-\d+$')
+
+# Endpoint global path-style da descoberta de região do S3
+S3_DISCOVERY_ENDPOINT = 'https://s3.amazonaws.com'
+
+# Estado de descoberta para buckets que o S3 confirmou não existirem
+S3_MISSING = ''
+
+# Regras de nome de bucket por provedor: nomes impossíveis saem do plano antes de DNS/HTTP
+S3_NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9.-]{1,61}[a-z0-9]$')
+GCS_NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9._-]*[a-z0-9]$')
+DNS_LABEL_PATTERN = re.compile(r'^[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?$', re.IGNORECASE)
+B2_NAME_PATTERN = re.compile(r'^[a-z0-9-]{6,50}$', re.IGNORECASE)
+# Contas de storage Azure: 3-24 caracteres minúsculos/dígitos
+AZURE_ACCOUNT_PATTERN = re.compile(r'^[a-z0-9]{3,24}$')
+
+def is_ip_address(name: str) -> bool:
+    try:
+        ipaddress.ip_address(name)
+        return True
+    except ValueError:
+        return False
+
+def valid_s3_name(name: str) -> bool:
+    """Regras do S3 (e compatíveis): 3-63 caracteres minúsculos DNS-safe, sem '..', sem formato de IP"""
+    return (S3_NAME_PATTERN.match(name) is not None and '..' not in name and '.-' not in name and '-.' not in name
+            and not is_ip_address(name) and not name.startswith(('xn--', 'sthree-')) and not name.endswith(('-s3alias', '--ol-s3')))
+
+def valid_gcs_name(name: str) -> bool:
+    """Regras do GCS: 3-63 caracteres (até 222 com pontos, 63 por componente), sem 'goog'/'google'"""
+    if GCS_NAME_PATTERN.match(name) is None or name.startswith('goog') or 'google' in name or is_ip_address(name):
+        return False
+    if '.' in name:
+        return len(name) <= 222 and all(0 < len(part) <= 63 for part in name.split('.'))
+    return 3 <= len(name) <= 63
+
+def valid_hostname_part(name: str) -> bool:
+    """Nome usável como parte de um hostname (rótulos DNS de até 63 caracteres)"""
+    return len(name) <= 253 and all(DNS_LABEL_PATTERN.match(label) for label in name.split('.'))
+
+def valid_path_segment(name: str) -> bool:
+    """Nome usável como um único segmento de caminho"""
+    return bool(name) and not any(char in name for char in '/?#%\\') and not any(char.isspace() for char in name)
+
+BUCKET_NAME_RULES: Dict[str, Callable[[str], bool]] = {
+    's3': valid_s3_name,
+    'gcs': valid_gcs_name,
+    'azure-account': lambda name: AZURE_ACCOUNT_PATTERN.match(name) is not None,
+    'dns-label': lambda name: DNS_LABEL_PATTERN.match(name) is not None,
+    'b2': lambda name: B2_NAME_PATTERN.match(name) is not None and not name.lower().startswith('b2-'),
+    'hostname': valid_hostname_part,  # Aplicada a todo template com {bucket} no host
+    'path': valid_path_segment,  # Aplicada a todo template com {bucket} no caminho
+}
+
+# Registro embutido de provedores. Cada grupo de testes ('http' = URLs padrão, 'advanced') é uma lista de
+# templates com {bucket} e, opcionalmente, {region}; ou {"regions": [...], "urls": [...]} com regiões próprias.
+# Um template também pode ser {"url": ..., "regions": [...], "fanout_only": true} para restringir as regiões
+# ou, em provedores com descoberta de região, gerar a URL apenas sem descoberta (--aws-strategy fanout).
+# "name_rule" (provedor ou template) aponta para BUCKET_NAME_RULES: nomes inválidos não geram probes.
+# "global_namespace": um 404 em um endpoint REST do provedor significa que o bucket não existe em nenhuma região.
+MINIO_HOSTS = ['minio', 's3', 'storage', 'object', 'bucket']
+
+BUILTIN_PROVIDERS: Dict[str, Dict[str, Any]] = {
+    'aws': {
+        'discovery': True,  # Regiões vêm da descoberta do S3 (--aws-strategy discover)
+        'global_namespace': True,
+        'name_rule': 's3',
+        'regions': AWS_FANOUT_REGIONS,
+        'http': [
+            'https://s3.{region}.amazonaws.com/{bucket}',
+            'https://s3.{region}.amazonaws.com/{bucket}/',
+            'https://{bucket}.s3.{region}.amazonaws.com/',
+            'https://{bucket}.s3.{region}.amazonaws.com',
+            # Legacy (na estratégia discover o endpoint global já foi consultado)
+            {'url': 'https://s3.amazonaws.com/{bucket}', 'regions': ['us-east-1'], 'fanout_only': True},
+            {'url': 'https://s3.amazonaws.com/{bucket}/', 'regions': ['us-east-1'], 'fanout_only': True},
+            {'url': 'https://{bucket}.s3.amazonaws.com/', 'regions': ['us-east-1'], 'fanout_only': True},
+            {'url': 'https://{bucket}.s3.amazonaws.com', 'regions': ['us-east-1'], 'fanout_only': True},
+        ],
+        'advanced': {
+            'regions': ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1'],
+            'urls': [
+                'http://{bucket}.s3-website-{region}.amazonaws.com',
+                'http://{bucket}.s3-website.{region}.amazonaws.com',
+                'https://{bucket}.s3-accelerate.amazonaws.com',
+                'https://{bucket}.s3.dualstack.{region}.amazonaws.com',
+            ]
+        }
+    },
+    'gcp': {
+        'global_namespace': True,
+        'name_rule': 'gcs',
+        'http': [
+            'https://storage.googleapis.com/{bucket}',
+            'https://storage.googleapis.com/{bucket}/',
+            'https://{bucket}.storage.googleapis.com/',
+            'https://{bucket}.storage.googleapis.com',
+            'https://www.googleapis.com/storage/v1/b/{bucket}/o',
+        ],
+        'advanced': [
+            'https://storage.googleapis.com/{bucket}?list-type=2',
+            'https://storage.googleapis.com/{bucket}?delimiter=%2F',
+            'https://{bucket}.storage.googleapis.com/?list-type=2',
+            'https://www.googleapis.com/storage/v1/b/{bucket}',
+            'https://www.googleapis.com/storage/v1/b/{bucket}/o',
+            'https://storage.googleapis.com/storage/v1/b/{bucket}',
+        ]
+    },
+    'azure': {
+        'name_rule': 'azure-account',
+        'http': [
+            'https://{bucket}.blob.core.windows.net/',
+            'https://{bucket}.blob.core.windows.net',
+            'https://{bucket}.blob.core.windows.net/?restype=container&comp=list',
+            'https://{bucket}.z1.web.core.windows.net/',
+            'https://{bucket}.z13.web.core.windows.net/',
+            'https://{bucket}.z22.web.core.windows.net/',
+            {'url': 'https://{bucket}.azurewebsites.net/', 'name_rule': 'dns-label'},
+        ],
+        'advanced': [
+            'https://{bucket}.blob.core.windows.net/?restype=container&comp=list&include=metadata',
+            'https://{bucket}.blob.core.windows.net/?restype=service&comp=properties',
+            'https://{bucket}.file.core.windows.net/',
+            'https://{bucket}.table.core.windows.net/',
+            'https://{bucket}.queue.core.windows.net/',
+            {'url': 'https://{bucket}.azureedge.net/', 'name_rule': 'dns-label'},
+        ]
+    },
+    'firebase': {
+        'name_rule': 'gcs',
+        'http': [
+            'https://firebasestorage.googleapis.com/v0/b/{bucket}/o',
+            'https://firebasestorage.googleapis.com/v0/b/{bucket}.appspot.com/o',
+            {'url': 'https://{bucket}.web.app/', 'name_rule': 'dns-label'},
+            {'url': 'https://{bucket}.firebaseapp.com/', 'name_rule': 'dns-label'},
+            {'url': 'https://{bucket}.firebaseio.com/', 'name_rule': 'dns-label'},
+        ]
+    },
+    'digitalocean': {
+        'name_rule': 's3',
+        'regions': ['nyc3', 'ams3', 'sgp1', 'sfo3', 'fra1', 'blr1', 'syd1'],
+        'http': [
+            'https://{bucket}.{region}.digitaloceanspaces.com/',
+            'https://{bucket}.{region}.digitaloceanspaces.com',
+            'https://{bucket}.{region}.cdn.digitaloceanspaces.com/',
+            'https://{bucket}.{region}.cdn.digitaloceanspaces.com',
+        ]
+    },
+    'linode': {
+        'name_rule': 's3',
+        'regions': ['us-east-1', 'eu-central-1', 'ap-south-1', 'us-southeast-1'],
+        'http': [
+            'https://{bucket}.{region}.linodeobjects.com/',
+            'https://{bucket}.{region}.linodeobjects.com',
+        ]
+    },
+    'oracle': {
+        'regions': ['us-phoenix-1', 'us-ashburn-1', 'eu-frankfurt-1', 'ap-tokyo-1'],
+        'http': [
+            'https://objectstorage.{region}.oraclecloud.com/n/namespace/b/{bucket}/o',
+            'https://{bucket}.compat.objectstorage.{region}.oraclecloud.com/',
+        ]
+    },
+    'ibm': {
+        'name_rule': 's3',
+        'regions': ['us-south', 'eu-gb', 'ap-jp', 'us-east'],
+        'http': [
+            'https://s3.{region}.cloud-object-storage.appdomain.cloud/{bucket}',
+            'https://{bucket}.s3.{region}.cloud-object-storage.appdomain.cloud/',
+        ]
+    },
+    'backblaze': {
+        'name_rule': 'b2',
+        'http': [
+            'https://f000.backblazeb2.com/file/{bucket}',
+            'https://f001.backblazeb2.com/file/{bucket}',
+            'https://f002.backblazeb2.com/file/{bucket}',
+            'https://f003.backblazeb2.com/file/{bucket}',
+        ]
+    },
+    'wasabi': {
+        'name_rule': 's3',
+        'regions': ['us-east-1', 'us-east-2', 'us-west-1', 'eu-central-1', 'ap-northeast-1'],
+        'http': [
+            'https://s3.{region}.wasabisys.com/{bucket}',
+            'https://s3.{region}.wasabisys.com/{bucket}/',
+            'https://{bucket}.s3.{region}.wasabisys.com/',
+            'https://{bucket}.s3.{region}.wasabisys.com',
+        ]
+    },
+    'vultr': {
+        'name_rule': 's3',
+        'regions': ['ewr1', 'sgp1', 'ams1', 'fra1', 'sjc1'],
+        'http': [
+            'https://{bucket}.{region}.vultrobjects.com/',
+            'https://{bucket}.{region}.vultrobjects.com',
+        ]
+    },
+    'scaleway': {
+        'name_rule': 's3',
+        'regions': ['fr-par', 'nl-ams', 'pl-waw'],
+        'http': [
+            'https://s3.{region}.scw.cloud/{bucket}',
+            'https://s3.{region}.scw.cloud/{bucket}/',
+            'https://{bucket}.s3.{region}.scw.cloud/',
+            'https://{bucket}.s3.{region}.scw.cloud',
+        ]
+    },
+    'ovh': {
+        'name_rule': 's3',
+        'regions': ['gra', 'sbg', 'rbx', 'bhs', 'waw', 'de', 'uk'],
+        'http': [
+            'https://s3.{region}.cloud.ovh.net/{bucket}',
+            'https://s3.{region}.cloud.ovh.net/{bucket}/',
+            'https://{bucket}.s3.{region}.cloud.ovh.net/',
+            'https://{bucket}.s3.{region}.cloud.ovh.net',
+        ]
+    },
+    'minio': {
+        # Hosts comuns em ambientes self-hosted
+        'name_rule': 's3',
+        'http': [f'{scheme}://{host}:{port}/{{bucket}}{slash}'
+                 for host in MINIO_HOSTS
+                 for port, schemes in (('9000', ('http', 'https')), ('9001', ('http', 'https')), ('443', ('https',)), ('80', ('http',)))
+                 for scheme in schemes
+                 for slash in ('', '/')]
+    },
+}
+
+TEMPLATE_GROUPS = ('http', 'advanced')
+
+class CompiledTemplate(NamedTuple):
+    """URL canônica pré-partida em {bucket}: a expansão por bucket é um único str.join"""
+    parts: tuple
+    variant: Variant
+    rules: tuple  # Regras de BUCKET_NAME_RULES que o nome precisa cumprir
+
+class ProviderGroup:
+    """Templates de um provedor em um grupo de testes, compilados por conjunto de regiões"""
+    def __init__(self, provider: str, tag: str, templates: List[tuple], regions: Optional[List[str]],
+                 discovery: bool = False, max_regions: int = 0):
+        self.provider = intern_label(Provider, provider)
+        self.tag = tag
+        self.templates = templates  # (url, regiões permitidas ou None, fanout_only, regra de nome ou None)
+        self.regions = regions  # None = provedor sem regiões
+        self.discovery = discovery
+        self.max_regions = max_regions  # Regiões descobertas usadas no grupo (tamanho da lista antes de --regions)
+        self._compiled: Dict[tuple, Tuple[List[CompiledTemplate], int]] = {}
+    
+    def compile(self, regions: Optional[tuple] = None, fanout: bool = True) -> Tuple[List[CompiledTemplate], int]:
+        """Templates canônicos e sem duplicatas para as regiões dadas; retorna (templates, total antes da deduplicação)"""
+        if regions is None:
+            regions = tuple(self.regions or ())
+        key = (regions, fanout)
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            return compiled
+        
+        templates = []
+        seen = set()
+        raw = 0
+        for url, allowed, fanout_only, name_rule in self.templates:
+            if fanout_only and not fanout:
+                continue
+            active = [region for region in regions if allowed is None or region in allowed]
+            if '{region}' in url:
+                expansions = [url.replace('{region}', region) for region in active]
+            else:
+                # Sem {region}: uma vez, desde que o provedor não tenha regiões ou ao menos uma esteja ativa
+                expansions = [url] if self.regions is None or active else []
+            for expanded in expansions:
+                raw += 1
+                canonical = canonicalize_url(expanded)
+                if canonical in seen:
+                    continue
+                seen.add(canonical)
+                rules = ('hostname' if '{bucket}' in urlparse(canonical).netloc else 'path',)
+                if name_rule is not None:
+                    rules += (name_rule,)
+                templates.append(CompiledTemplate(tuple(canonical.split('{bucket}')),
+                                                  intern_label(Variant, classify_probe_variant(canonical, '{bucket}')), rules))
+        self._compiled[key] = compiled = (templates, raw)
+        return compiled
+
+class ProviderRegistry:
+    """Provedores, regiões e templates de URL (embutidos + arquivo do usuário) compilados uma vez na partida"""
+    def __init__(self, providers: Optional[Dict[str, Dict[str, Any]]] = None, selected: Optional[List[str]] = None,
+                 regions: Optional[List[str]] = None):
+        providers = BUILTIN_PROVIDERS if providers is None else providers
+        unknown = [name for name in selected or () if name not in providers]
+        if unknown:
+            raise ValueError(f"Provedores desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(providers)})")
+        self.names = [name for name in providers if not selected or name in selected]
+        self.region_filter = set(regions) if regions else None
+        self.global_namespaces = {intern_label(Provider, name) for name in self.names if providers[name].get('global_namespace')}
+        
+        self.groups: List[ProviderGroup] = []
+        for tag in TEMPLATE_GROUPS:
+            for name in self.names:
+                entry = providers[name]
+                if entry.get(tag):
+                    self.groups.append(self.build_group(name, tag, entry))
+        for group in self.groups:
+            if not group.discovery:
+                group.compile()  # Provedores com descoberta compilam sob demanda, por região descoberta
+    
+    def build_group(self, name: str, tag: str, entry: Dict[str, Any]) -> ProviderGroup:
+        """Valida e normaliza um grupo de templates do registro"""
+        spec = entry[tag]
+        regions = entry.get('regions')
+        if isinstance(spec, dict):
+            regions = spec.get('regions', regions)
+            spec = spec.get('urls', [])
+        templates = []
+        for template in spec:
+            if isinstance(template, str):
+                template = {'url': template}
+            url = template.get('url', '')
+            if '{bucket}' not in url:
+                raise ValueError(f"Template sem {{bucket}} em {name}/{tag}: {url!r}")
+            if '{region}' in url and not regions:
+                raise ValueError(f"Template com {{region}} em {name}/{tag}, mas o provedor não define regiões: {url!r}")
+            allowed = template.get('regions')
+            name_rule = template.get('name_rule', entry.get('name_rule'))
+            if name_rule is not None and name_rule not in BUCKET_NAME_RULES:
+                raise ValueError(f"Regra de nome desconhecida em {name}/{tag}: {name_rule} (disponíveis: {', '.join(BUCKET_NAME_RULES)})")
+            templates.append((url, frozenset(allowed) if allowed else None, bool(template.get('fanout_only')), name_rule))
+        max_regions = len(regions or ())
+        if regions is not None and self.region_filter is not None:
+            regions = [region for region in regions if region in self.region_filter]
+        return ProviderGroup(name, tag, templates, regions, bool(entry.get('discovery')), max_regions)
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+    
+    def shared_host_pattern(self) -> Optional[re.Pattern]:
+        """Hosts dos templates sem {bucket} no netloc ({region} vira curinga): servem a todos os buckets"""
+        patterns = set()
+        for group in self.groups:
+            for url, *_ in group.templates:
+                netloc = url.split('://', 1)[-1].split('/', 1)[0]
+                if '{bucket}' not in netloc:
+                    host = netloc.rsplit('@', 1)[-1].split(':', 1)[0]
+                    patterns.add(re.escape(host).replace(re.escape('{region}'), '[a-z0-9-]+'))
+        patterns.add(re.escape(urlparse(S3_DISCOVERY_ENDPOINT).hostname))
+        return re.compile('|'.join(sorted(patterns)), re.IGNORECASE)
+    
+    @staticmethod
+    def load(filename: str) -> Dict[str, Dict[str, Any]]:
+        """Registro embutido mais os provedores de um arquivo JSON/YAML (entradas de mesmo nome substituem as embutidas)"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            if filename.endswith(('.yaml', '.yml')):
+                if yaml is None:
+                    raise ValueError("Arquivos YAML de provedores requerem o pacote PyYAML (pip3 install pyyaml)")
+                try:
+                    data = yaml.safe_load(f)
+                except yaml.YAMLError as e:
+                    raise ValueError(f"Arquivo de provedores inválido: {filename} ({e})")
+            else:
+                data = json.load(f)
+        if isinstance(data, dict) and 'providers' in data:
+            data = data['providers']
+        if not isinstance(data, dict) or not all(isinstance(entry, dict) for entry in data.values()):
+            raise ValueError(f"Arquivo de provedores inválido: {filename} (esperado um objeto nome -> provedor)")
+        return {**BUILTIN_PROVIDERS, **data}
+
+class S3RegionCache:
+    """Cache persistente (JSON) bucket -> região do S3, reaproveitado entre execuções"""
+    def __init__(self, filename: Optional[str] = None, max_age: int = 30 * 86400):
+        self.filename = filename
+        self.max_age = max_age
+        self.regions: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        if filename and os.path.exists(filename):
+            try:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    self.regions = json.load(f)
+            except (OSError, ValueError):
+                self.regions = {}
+    
+    def get(self, bucket: str) -> Optional[str]:
+        with self._lock:
+            entry = self.regions.get(bucket)
+        if entry and time.time() - entry.get('timestamp', 0) < self.max_age:
+            return entry.get('region')
+        return None
+    
+    def set(self, bucket: str, region: str):
+        with self._lock:
+            self.regions[bucket] = {'region': region, 'timestamp': int(time.time())}
+            self.dirty = True
+    
+    def save(self):
+        """Grava o cache de forma atômica"""
+        if not self.filename or not self.dirty:
+            return
+        with self._lock:
+            data = json.dumps(self.regions, ensure_ascii=False)
+            self.dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        tmp = f'{self.filename}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp, self.filename)
+
+class AWSCredentials(NamedTuple):
+    """Credenciais AWS usadas para assinar (SigV4) a listagem nativa do S3"""
+    access_key: str
+    secret_key: str
+    token: Optional[str] = None
+
+def load_aws_credentials(profile: Optional[str] = None) -> Optional[AWSCredentials]:
+    """Credenciais do perfil (~/.aws/credentials) ou das variáveis de ambiente; None se ausentes"""
+    if profile is None and os.environ.get('AWS_ACCESS_KEY_ID') and os.environ.get('AWS_SECRET_ACCESS_KEY'):
+        return AWSCredentials(os.environ['AWS_ACCESS_KEY_ID'], os.environ['AWS_SECRET_ACCESS_KEY'],
+                              os.environ.get('AWS_SESSION_TOKEN'))
+    
+    filename = os.environ.get('AWS_SHARED_CREDENTIALS_FILE') or os.path.join(os.path.expanduser('~'), '.aws', 'credentials')
+    parser = configparser.RawConfigParser()
+    try:
+        parser.read(filename, encoding='utf-8')
+    except configparser.Error:
+        return None
+    section = profile or os.environ.get('AWS_PROFILE') or 'default'
+    if not parser.has_option(section, 'aws_access_key_id') or not parser.has_option(section, 'aws_secret_access_key'):
+        return None
+    return AWSCredentials(parser.get(section, 'aws_access_key_id'), parser.get(section, 'aws_secret_access_key'),
+                          parser.get(section, 'aws_session_token', fallback=None))
+
+# Entradas pedidas em cada listagem nativa: basta uma página para comprovar o acesso
+NATIVE_LIST_MAX_KEYS = 100
+
+# SHA-256 do corpo vazio (requisições GET)
+EMPTY_PAYLOAD_SHA256 = hashlib.sha256(b'').hexdigest()
+
+def sign_aws_request(method: str, url: str, region: str, credentials: AWSCredentials, service: str = 's3',
+                     now: Optional[datetime] = None) -> Dict[str, str]:
+    """Cabeçalhos AWS Signature Version 4 para uma requisição sem corpo"""
+    parsed = urlparse(url)
+    amz_date = (now or datetime.now(timezone.utc)).strftime('%Y%m%dT%H%M%SZ')
+    scope = f'{amz_date[:8]}/{region}/{service}/aws4_request'
+    
+    headers = {'host': parsed.netloc, 'x-amz-content-sha256': EMPTY_PAYLOAD_SHA256, 'x-amz-date': amz_date}
+    if credentials.token:
+        headers['x-amz-security-token'] = credentials.token
+    signed_headers = ';'.join(sorted(headers))
+    query = sorted(parse_qsl(parsed.query, keep_blank_values=True))
+    canonical_request = '\n'.join([
+        method,
+        quote(parsed.path or '/', safe='/-_.~'),
+        '&'.join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in query),
+        ''.join(f'{name}:{headers[name]}\n' for name in sorted(headers)),
+        signed_headers,
+        EMPTY_PAYLOAD_SHA256
+    ])
+    string_to_sign = '\n'.join(['AWS4-HMAC-SHA256', amz_date, scope,
+                                hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()])
+    
+    key = f'AWS4{credentials.secret_key}'.encode('utf-8')
+    for part in (amz_date[:8], region, service, 'aws4_request'):
+        key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+    
+    headers['Authorization'] = (f'AWS4-HMAC-SHA256 Credential={credentials.access_key}/{scope}, '
+                                f'SignedHeaders={signed_headers}, Signature={signature}')
+    del headers['host']  # Enviado pelo requests
+    return headers
+
+def parse_listing(provider: str, body: bytes) -> List[str]:
+    """Nomes de objetos/prefixos de uma listagem S3 (XML), GCS (JSON) ou Azure (XML)"""
+    try:
+        if provider == 'gcp':
+            data = json.loads(body)
+            if not isinstance(data, dict):
+                return []  # JSON válido, mas não é uma listagem (ex.: erro em texto de um proxy)
+            entries = []
+            prefixes, items = data.get('prefixes'), data.get('items')
+            if isinstance(prefixes, list):
+                entries.extend(prefix for prefix in prefixes if isinstance(prefix, str))
+            if isinstance(items, list):
+                entries.extend(item['name'] for item in items if isinstance(item, dict) and isinstance(item.get('name'), str))
+            return entries
+        root = ElementTree.fromstring(body)
+    except (ValueError, KeyError, ElementTree.ParseError):
+        return []
+    # Elemento de cada entrada -> filho com o nome (comparando sem o namespace XML do S3)
+    entry_names = {'aws': {'Contents': 'Key', 'CommonPrefixes': 'Prefix'},
+                   'azure': {'Blob': 'Name', 'BlobPrefix': 'Name'}}[provider]
+    entries = []
+    for element in root.iter():
+        name_tag = entry_names.get(element.tag.rsplit('}', 1)[-1])
+        if name_tag is None:
+            continue
+        entries.extend(child.text for child in element if child.tag.rsplit('}', 1)[-1] == name_tag and child.text)
+    return entries
+
+class DNSEntry(NamedTuple):
+    """Resultado (em cache) da resolução de um hostname"""
+    state: str  # 'ok', 'nxdomain', 'nodata' ou 'error'
+    addresses: tuple
+    expires: float
+
+class _DNSQueryProtocol(asyncio.DatagramProtocol):
+    """Protocolo UDP de uma única consulta DNS"""
+    def __init__(self, waiter: asyncio.Future):
+        self.waiter = waiter
+
+    def datagram_received(self, data, addr):
+        if not self.waiter.done():
+            self.waiter.set_result(data)
+
+    def error_received(self, exc):
+        if not self.waiter.done():
+            self.waiter.set_exception(exc)
+
+class DNSResolver:
+    """Pré-resolução DNS assíncrona em lote, com cache positivo/negativo sensível a TTL"""
+    def __init__(self, nameserver: Optional[tuple] = None, timeout: float = 2.0, retries: int = 1,
+                 positive_ttl: int = 300, negative_ttl: int = 300, concurrency: int = 256,
+                 max_entries: int = 65536, sweep_interval: float = 60.0):
+        self.nameserver = nameserver  # None = resolver do sistema (getaddrinfo)
+        self.timeout = timeout
+        self.retries = retries
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.concurrency = concurrency
+        # Quase todo host é de um único bucket: LRU limitada e varredura periódica dos expirados
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.cache: 'OrderedDict[str, DNSEntry]' = OrderedDict()
+        self.evicted = 0
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=min(concurrency, 64))
+        self.queries = 0
+        self.cache_hits = 0
+        self.nxdomain = 0
+        self.skipped_probes = 0
+    
+    @staticmethod
+    def parse_nameserver(value: str) -> tuple:
+        """Converte 'HOST[:PORT]' em (host, porta)"""
+        if value.count(':') == 1:
+            host, port = value.split(':')
+            return (host, int(port))
+        return (value.strip('[]'), 53)
+    
+    def lookup(self, host: str) -> Optional[DNSEntry]:
+        """Entrada válida do cache para o host, se houver"""
+        with self._lock:
+            entry = self.cache.get(host)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                del self.cache[host]
+                return None
+            self.cache.move_to_end(host)
+            return entry
+    
+    def _sweep(self, now: float):
+        """Remove as entradas expiradas (chamado com o lock)"""
+        expired = [host for host, entry in self.cache.items() if entry.expires < now]
+        for host in expired:
+            del self.cache[host]
+        self.evicted += len(expired)
+        self._next_sweep = now + self.sweep_interval
+    
+    def store(self, host: str, state: str, addresses: tuple = (), ttl: Optional[int] = None) -> DNSEntry:
+        """Grava uma resolução no cache (erros transitórios não são cacheados)"""
+        if ttl is None:
+            ttl = self.positive_ttl if state in ('ok', 'nodata') else self.negative_ttl
+        now = time.monotonic()
+        entry = DNSEntry(state, addresses, now + ttl)
+        with self._lock:
+            if state != 'error':
+                self.cache[host] = entry
+                self.cache.move_to_end(host)
+                if now >= self._next_sweep:
+                    self._sweep(now)
+                while len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+                    self.evicted += 1
+            if state == 'nxdomain':
+                self.nxdomain += 1
+        return entry
+    
+    @staticmethod
+    def build_query(host: str, query_id: int) -> bytes:
+        """Monta uma consulta DNS do tipo A com recursão"""
+        qname = b''
+        for label in host.rstrip('.').split('.'):
+            encoded = label.encode('ascii')
+            if not encoded or len(encoded) > 63:
+                raise ValueError(f'label DNS inválido: {label!r}')
+            qname += bytes([len(encoded)]) + encoded
+        return struct.pack('>HHHHHH', query_id, 0x0100, 1, 0, 0, 0) + qname + b'\x00' + struct.pack('>HH', 1, 1)
+    
+    @staticmethod
+    def _skip_name(data: bytes, offset: int) -> int:
+        while True:
+            length = data[offset]
+            if length & 0xC0 == 0xC0:  # Ponteiro de compressão
+                return offset + 2
+            if length == 0:
+                return offset + 1
+            offset += length + 1
+    
+    def parse_response(self, data: bytes, query_id: int) -> tuple:
+        """Interpreta a resposta: (estado, endereços, ttl)"""
+        rid, flags, qdcount, ancount, nscount, _ = struct.unpack('>HHHHHH', data[:12])
+        if rid != query_id:
+            raise ValueError('ID de resposta DNS inesperado')
+        rcode = flags & 0x000F
+        offset = 12
+        for _ in range(qdcount):
+            offset = self._skip_name(data, offset) + 4
+        
+        addresses = []
+        ttls = []
+        soa_ttl = None
+        for index in range(ancount + nscount):
+            offset = self._skip_name(data, offset)
+            rtype, _, ttl, rdlength = struct.unpack('>HHIH', data[offset:offset + 10])
+            offset += 10
+            rdata = data[offset:offset + rdlength]
+            offset += rdlength
+            if index < ancount:
+                ttls.append(ttl)
+                if rtype == 1 and rdlength == 4:
+                    addresses.append(socket.inet_ntoa(rdata))
+            elif rtype == 6:  # SOA: TTL negativo = min(TTL do SOA, campo MINIMUM)
+                minimum = struct.unpack('>I', rdata[-4:])[0]
+                soa_ttl = min(ttl, minimum)
+        
+        if rcode == 3:
+            return 'nxdomain', (), soa_ttl if soa_ttl is not None else self.negative_ttl
+        if rcode != 0 or flags & 0x0200:  # SERVFAIL/REFUSED ou resposta truncada
+            return 'error', (), 0
+        if addresses:
+            return 'ok', tuple(addresses), min(ttls)
+        return 'nodata', (), soa_ttl if soa_ttl is not None else self.negative_ttl
+    
+    async def _query_nameserver(self, host: str) -> DNSEntry:
+        loop = asyncio.get_running_loop()
+        query = self.build_query(host, 0)  # ValueError para nomes inválidos no DNS
+        for _ in range(self.retries + 1):
+            query_id = random.randint(0, 0xFFFF)
+            waiter = loop.create_future()
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DNSQueryProtocol(waiter), remote_addr=self.nameserver)
+            try:
+                transport.sendto(struct.pack('>H', query_id) + query[2:])
+                data = await asyncio.wait_for(waiter, self.timeout)
+                state, addresses, ttl = self.parse_response(data, query_id)
+                return self.store(host, state, addresses, ttl)
+            except (asyncio.TimeoutError, OSError, ValueError, struct.error, IndexError):
+                continue
+            finally:
+                transport.close()
+        return self.store(host, 'error')
+    
+    async def _query_system(self, host: str) -> DNSEntry:
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.run_in_executor(self._executor, socket.getaddrinfo, host, None, 0, socket.SOCK_STREAM)
+            return self.store(host, 'ok', tuple(sorted({info[4][0] for info in infos})))
+        except socket.gaierror as e:
+            negative = {socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)}
+            return self.store(host, 'nxdomain' if e.errno in negative else 'error')
+        except (UnicodeError, OSError):
+            return self.store(host, 'error')
+    
+    async def resolve(self, host: str) -> DNSEntry:
+        """Resolve um host (cache primeiro)"""
+        entry = self.lookup(host)
+        if entry is not None:
+            with self._lock:
+                self.cache_hits += 1
+            return entry
+        with self._lock:
+            self.queries += 1
+        # Hosts de um único label (ex.: 'minio') dependem de search domains e /etc/hosts
+        if self.nameserver is None or '.' not in host:
+            return await self._query_system(host)
+        try:
+            return await self._query_nameserver(host)
+        except ValueError:
+            return self.store(host, 'nxdomain')  # Nome que nunca pode existir no DNS
+    
+    async def resolve_many(self, hosts) -> Dict[str, DNSEntry]:
+        """Resolve um lote de hosts em paralelo"""
+        slots = asyncio.Semaphore(self.concurrency)
+        
+        async def bounded(host: str):
+            async with slots:
+                return host, await self.resolve(host)
+        
+        pending = []
+        for host in set(hosts):
+            try:
+                ipaddress.ip_address(host)
+            except ValueError:
+                pending.append(bounded(host))
+        return dict(await asyncio.gather(*pending))
+    
+    def record_skip(self):
+        """Conta um probe HTTP evitado por NXDOMAIN em cache"""
+        with self._lock:
+            self.skipped_probes += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'nameserver': f'{self.nameserver[0]}:{self.nameserver[1]}' if self.nameserver else 'system',
+                'queries': self.queries,
+                'cache_hits': self.cache_hits,
+                'nxdomain': self.nxdomain,
+                'skipped_probes': self.skipped_probes,
+                'cached_hosts': len(self.cache),
+                'evicted': self.evicted
+            }
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+def classify_connection_error(exc: Exception) -> Optional[str]:
+    """Classifica falhas de conexão que se repetem para qualquer bucket no mesmo host"""
+    if aiohttp is not None and isinstance(exc, aiohttp.ClientError):
+        if isinstance(exc, (aiohttp.ClientSSLError, aiohttp.ClientConnectorCertificateError)):
+            return 'tls'
+        os_error = getattr(exc, 'os_error', None)
+        if isinstance(os_error, socket.gaierror):
+            return 'dns'
+        if isinstance(os_error, ConnectionRefusedError):
+            return 'refused'
+        return None
+    
+    if isinstance(exc, requests.exceptions.SSLError):
+        return 'tls'
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return 'connect-timeout'
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        reason = exc.args[0] if exc.args else None
+        reason = getattr(reason, 'reason', reason)
+        if type(reason).__name__ == 'NameResolutionError' or 'Name or service not known' in str(reason):
+            return 'dns'
+        if isinstance(reason, NewConnectionError) and 'refused' in str(reason).lower():
+            return 'refused'
+    return None
+
+# Falhas que marcam o host como morto; 'connect-timeout' só com --host-cache-timeouts
+HOST_FAILURE_REASONS = ('dns', 'refused', 'tls')
+
+class HostHealthCache:
+    """Cache de saúde por (esquema, host, porta): falhas de DNS/conexão/TLS são registradas uma vez só"""
+    def __init__(self, recheck_interval: int = 600, cache_timeouts: bool = False, max_hosts: int = 65536):
+        self.recheck_interval = recheck_interval
+        self.reasons = HOST_FAILURE_REASONS + (('connect-timeout',) if cache_timeouts else ())
+        # Hosts de um único bucket dominam: LRU limitada e varredura dos expirados a cada recheck_interval
+        self.max_hosts = max_hosts
+        self.failures: 'OrderedDict[tuple, tuple]' = OrderedDict()  # chave -> (motivo, erro, expira_em)
+        self.short_circuits = 0
+        self.evicted = 0
+        self._next_sweep = time.monotonic() + recheck_interval
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(url: str) -> tuple:
+        parsed = urlparse(url)
+        scheme = parsed.scheme.lower()
+        try:
+            port = parsed.port
+        except ValueError:
+            port = None
+        return (scheme, (parsed.hostname or '').lower(), port or DEFAULT_PORTS.get(scheme))
+    
+    def check(self, url: str) -> Optional[tuple]:
+        """(motivo, erro) de uma falha ainda válida para o host da URL"""
+        key = self.key(url)
+        with self._lock:
+            entry = self.failures.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self.failures[key]  # Re-checa o host no próximo probe
+                return None
+            self.failures.move_to_end(key)
+            self.short_circuits += 1
+            return entry[0], entry[1]
+    
+    def record_failure(self, url: str, reason: str, error: str):
+        if reason not in self.reasons:
+            return
+        key = self.key(url)
+        now = time.monotonic()
+        with self._lock:
+            self.failures[key] = (reason, error, now + self.recheck_interval)
+            self.failures.move_to_end(key)
+            if now >= self._next_sweep:
+                expired = [host for host, entry in self.failures.items() if entry[2] < now]
+                for host in expired:
+                    del self.failures[host]
+                self.evicted += len(expired)
+                self._next_sweep = now + self.recheck_interval
+            while len(self.failures) > self.max_hosts:
+                self.failures.popitem(last=False)
+                self.evicted += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            reasons: Dict[str, int] = {}
+            for reason, _, _ in self.failures.values():
+                reasons[reason] = reasons.get(reason, 0) + 1
+            return {
+                'recheck_interval': self.recheck_interval,
+                'failed_hosts': len(self.failures),
+                'failed_by_reason': reasons,
+                'short_circuits': self.short_circuits,
+                'evicted': self.evicted
+            }
+
+# Respostas de throttling (429 Too Many Requests, 503 SlowDown)
+THROTTLE_STATUS = (429, 503)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converte Retry-After (segundos ou data HTTP) em segundos de espera"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+class _HostLimit:
+    """Estado de limitação de um host"""
+    __slots__ = ('rate', 'window', 'tokens', 'last', 'in_flight', 'blocked_until')
+
+    def __init__(self, rate: float, window: float, now: float):
+        self.rate = rate
+        self.window = window
+        self.tokens = max(1.0, rate)
+        self.last = now
+        self.in_flight = 0
+        self.blocked_until = 0.0
+
+class HostRateLimiter:
+    """Limitador por host: token bucket + concorrência AIMD, com recuo em 429/503 e Retry-After"""
+    def __init__(self, rate: float = 100.0, max_concurrency: int = 15, min_rate: float = 1.0, decrease: float = 0.5,
+                 sweep_interval: float = 5.0):
+        self.max_rate = rate  # 0 = sem token bucket, apenas concorrência AIMD
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.decrease = decrease
+        self.hosts: Dict[str, _HostLimit] = {}
+        self.throttled = 0
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._lock = threading.Lock()
+    
+    def idle(self, state: _HostLimit, now: float) -> bool:
+        """Host sem requisições, nos limites padrão e com o token bucket cheio: igual a um estado novo"""
+        if state.in_flight or state.blocked_until > now or state.window < self.max_concurrency:
+            return False
+        if not self.max_rate:
+            return True
+        return state.rate >= self.max_rate and state.tokens + (now - state.last) * state.rate >= max(1.0, state.rate)
+    
+    def _sweep(self, now: float):
+        """Descarta estados ociosos (chamado com o lock); remover antes disso liberaria a taxa do host"""
+        for host in [host for host, state in self.hosts.items() if self.idle(state, now)]:
+            del self.hosts[host]
+        self._next_sweep = now + self.sweep_interval
+    
+    def reserve(self, host: str) -> float:
+        """Tenta ocupar uma vaga no host; retorna 0 se conseguiu ou quantos segundos esperar"""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            state = self.hosts.get(host)
+            if state is None:
+                state = self.hosts[host] = _HostLimit(self.max_rate, float(self.max_concurrency), now)
+            if state.blocked_until > now:
+                return state.blocked_until - now
+            if state.rate:
+                state.tokens = min(max(1.0, state.rate), state.tokens + (now - state.last) * state.rate)
+                state.last = now
+            if state.in_flight >= max(1, int(state.window)):
+                return 0.01
+            if state.rate and state.tokens < 1:
+                return (1 - state.tokens) / state.rate
+            state.tokens -= 1
+            state.in_flight += 1
+            return 0.0
+    
+    def acquire(self, host: str):
+        """Versão bloqueante de reserve (threads)"""
+        while True:
+            delay = self.reserve(host)
+            if not delay:
+                return
+            time.sleep(delay)
+    
+    async def acquire_async(self, host: str):
+        """Versão assíncrona de reserve (engine async)"""
+        while True:
+            delay = self.reserve(host)
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+    
+    def release(self, host: str, throttled: bool = False, retry_after: Optional[float] = None):
+        """Libera a vaga: aumento aditivo em sucesso, redução multiplicativa em throttling"""
+        now = time.monotonic()
+        with self._lock:
+            state = self.hosts.get(host)
+            if state is None:
+                return
+            state.in_flight = max(state.in_flight - 1, 0)
+            if throttled:
+                self.throttled += 1
+                state.window = max(1.0, state.window * self.decrease)
+                if state.rate:
+                    state.rate = max(self.min_rate, state.rate * self.decrease)
+                if retry_after:
+                    state.blocked_until = max(state.blocked_until, now + retry_after)
+                return
+            state.window = min(float(self.max_concurrency), state.window + 1.0 / state.window)
+            if state.rate:
+                state.rate = min(self.max_rate, state.rate + 1.0 / state.window)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            limited = {host: {'concurrency': round(state.window, 2), 'rate': round(state.rate, 2)}
+                       for host, state in self.hosts.items()
+                       if state.window < self.max_concurrency or (self.max_rate and state.rate < self.max_rate)}
+            return {
+                'host_rate': self.max_rate,
+                'max_concurrency': self.max_concurrency,
+                'throttled_responses': self.throttled,
+                'limited_hosts': limited
+            }
+
+class ConcurrencyBudget:
+    """Limite global de requisições simultâneas, compartilhado por todos os jobs do subcomando serve"""
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError(f"Orçamento de concorrência inválido: {limit} (mínimo 1)")
+        self.limit = limit
+        self.active = 0
+        self.peak = 0
+        self.waits = 0  # Requisições que aguardaram uma vaga
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        if not self._semaphore.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            self._semaphore.acquire()
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        return self
+    
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self.active -= 1
+        self._semaphore.release()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'limit': self.limit, 'active': self.active, 'peak': self.peak, 'waits': self.waits}
+
+# Erros que indicam host inexistente/morto (cacheados com o TTL negativo)
+DEAD_HOST_ERROR = re.compile(r'NXDOMAIN|\[host-cache:(dns|refused)\]|NameResolutionError|Name or service not known|'
+                             r'nodename nor servname|No address associated')
+
+# Status que encerram os probes do bucket no --first-hit quando não há --status
+FIRST_HIT_STATUS = (200,)
+
+# Variantes que respondem pela API REST do provedor (um 404 nelas significa bucket inexistente)
+REST_VARIANTS = frozenset((Variant.PATH_STYLE, Variant.VIRTUAL_HOSTED, Variant.API))
+
+class BucketCutoff:
+    """Cancela os probes restantes de um bucket: --first-hit, --first-hit-per-provider e pushdown do --status"""
+    def __init__(self, first_hit: Optional[str], qualifying: set, missing_cutoff: set):
+        self.first_hit = first_hit  # None, 'bucket' ou 'provider'
+        self.qualifying = qualifying  # Status que confirmam um achado
+        self.missing_cutoff = missing_cutoff  # Provedores em que um 404 REST encerra os demais probes
+        self.closed = False
+        self.closed_providers = set()
+    
+    def allows(self, provider: str) -> bool:
+        return not self.closed and provider not in self.closed_providers
+    
+    def observe(self, provider: str, result: Dict[str, Any]) -> bool:
+        """Registra um resultado; True quando algum probe pendente deixou de ser necessário"""
+        status = result['status_code']
+        if self.first_hit and status in self.qualifying:
+            if self.first_hit == 'bucket':
+                self.closed = True
+            else:
+                self.closed_providers.add(provider)
+            return True
+        if status == 404 and provider in self.missing_cutoff and result.get('variant') in REST_VARIANTS:
+            self.closed_providers.add(provider)
+            return True
+        return False
+
+class ProbeCache:
+    """Cache persistente (SQLite) de resultados de probe entre execuções, com TTL positivo e negativo"""
+    def __init__(self, filename: str, positive_ttl: int = 3600, negative_ttl: int = 86400, max_entries: int = 1000000,
+                 header_allowlist: tuple = HEADER_ALLOWLIST):
+        self.filename = filename
+        self.header_allowlist = header_allowlist
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        # Vários processos (--processes) podem compartilhar o arquivo: WAL + espera por lock
+        self._db = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS probes (key TEXT PRIMARY KEY, method TEXT, status INTEGER, '
+                         'accessible INTEGER, size INTEGER, truncated INTEGER, headers TEXT, error TEXT, '
+                         'negative INTEGER, stored REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS probes_stored ON probes (stored)')
+        self._db.commit()
+    
+    @staticmethod
+    def is_negative(result: ProbeResult) -> Optional[bool]:
+        """True = resultado negativo (NoSuchBucket, host morto), False = positivo, None = transitório (não cacheia)"""
+        status = result['status_code']
+        if status is None:
+            return True if DEAD_HOST_ERROR.search(result['error'] or '') else None
+        if status in (400, 404):
+            return True  # Nome inválido / NoSuchBucket
+        if status >= 500 or status in THROTTLE_STATUS:
+            return None
+        return False
+    
+    def get(self, key: str, url: str) -> Optional[ProbeResult]:
+        """Resultado ainda válido para a chave, no formato de um probe (sem I/O de rede)"""
+        with self._lock:
+            row = self._db.execute('SELECT method, status, accessible, size, truncated, headers, error, negative, stored '
+                                   'FROM probes WHERE key = ?', (key,)).fetchone()
+            if row is None or time.time() - row[8] >= (self.negative_ttl if row[7] else self.positive_ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+        method, status, accessible, size, truncated, headers, error = row[:7]
+        return ProbeResult(url, method, status_code=status, accessible=bool(accessible), headers=json.loads(headers),
+                           size=size, truncated=bool(truncated), error=error, cached=True)
+    
+    def set(self, key: str, result: ProbeResult):
+        negative = self.is_negative(result)
+        if negative is None:
+            return
+        row = (key, result['method'], result['status_code'], int(result['accessible']), result['size'],
+               int(result['truncated']), json.dumps(filter_headers(result['headers'], self.header_allowlist)), result['error'],
+               int(negative), time.time())
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+            self.stores += 1
+            self._pending += 1
+            # Commits em lote: no máximo um por segundo para não travar outros processos
+            if time.monotonic() - self._last_commit >= 1.0:
+                self._commit()
+            if self.stores % 10000 == 0:
+                self._evict()
+    
+    def _commit(self):
+        if self._pending:
+            self._db.commit()
+            self._pending = 0
+        self._last_commit = time.monotonic()
+    
+    def _evict(self):
+        """Remove as entradas mais antigas quando o cache passa de max_entries (mantém 90%)"""
+        count = self._db.execute('SELECT COUNT(*) FROM probes').fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * 0.9)
+        self._db.execute('DELETE FROM probes WHERE key IN (SELECT key FROM probes ORDER BY stored LIMIT ?)', (excess,))
+        self._db.commit()
+        self.evicted += excess
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'file': self.filename,
+                'positive_ttl': self.positive_ttl,
+                'negative_ttl': self.negative_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'stores': self.stores,
+                'evicted': self.evicted
+            }
+    
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._evict()
+            self._db.close()
+
+class ScanJournal:
+    """Journal append-only de buckets concluídos (um JSON por linha, fsync a cada bucket)"""
+    def __init__(self, filename: str, resume: bool = False):
+        self.filename = filename
+        self.completed: Dict[str, Dict[str, Any]] = self.load() if resume else {}
+        self._file = open(filename, 'a' if resume else 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+    
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Lê os buckets já concluídos, descartando uma última linha incompleta (crash no meio da escrita)"""
+        completed = {}
+        if not os.path.exists(self.filename):
+            return completed
+        valid_end = 0
+        with open(self.filename, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    break
+                completed[result['bucket']] = result
+                valid_end += len(line)
+        with open(self.filename, 'r+b') as f:
+            f.truncate(valid_end)
+        return completed
+    
+    def record(self, result: Dict[str, Any]):
+        """Grava um bucket concluído e força a escrita em disco"""
+        line = json.dumps(result, ensure_ascii=False, default=json_default) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+    
+    def close(self):
+        self._file.close()
+
+class NDJSONResultWriter:
+    """Escreve resultados em NDJSON à medida que cada bucket termina (memória constante)"""
+    def __init__(self, filename: str, metadata: Dict[str, Any]):
+        self.filename = filename
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(filename, 'w', encoding='utf-8')
+        self._write(dict(metadata, type='metadata', phase='start'))
+    
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False, default=json_default) + '\n')
+        self._file.flush()
+    
+    def write(self, result: Dict[str, Any]):
+        with self._lock:
+            self._write(dict(result, type='bucket'))
+            self.count += 1
+    
+    def close(self, metadata: Dict[str, Any]):
+        """Grava o trailer com os metadados finais"""
+        with self._lock:
+            self._write(dict(metadata, type='metadata', phase='end'))
+            self._file.close()
+
+def iter_result_file(source: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Lê um arquivo de resultados (JSON agregado ou NDJSON) gerando ('metadata' | 'bucket', registro)"""
+    with open(source, 'r', encoding='utf-8') as f:
+        try:
+            first = json.loads(f.readline() or '{}')
+        except json.JSONDecodeError:
+            first = None  # JSON agregado indentado: a primeira linha não é um objeto completo
+        if first is None or 'results' in first:
+            f.seek(0)
+            data = json.load(f)
+            yield 'metadata', data.get('metadata', {})
+            for result in data.get('results', []):
+                yield 'bucket', result
+            return
+        
+        f.seek(0)
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.pop('type', None)
+            record.pop('phase', None)
+            yield kind, record
+
+def write_results_json(destination: str, metadata: Dict[str, Any], results: Iterable[Dict[str, Any]]) -> int:
+    """Grava o JSON agregado bucket a bucket, sem montar a lista inteira em memória; retorna o total"""
+    total = 0
+    with open(destination, 'w', encoding='utf-8') as dst:
+        dst.write('{\n  "metadata": ')
+        dst.write(json.dumps(metadata, indent=2, ensure_ascii=False).replace('\n', '\n  '))
+        dst.write(',\n  "results": [')
+        for record in results:
+            dst.write(',\n    ' if total else '\n    ')
+            dst.write(json.dumps(record, indent=2, ensure_ascii=False, default=json_default).replace('\n', '\n    '))
+            total += 1
+        dst.write('\n  ]\n}\n' if total else ']\n}\n')
+    return total
+
+def convert_ndjson_to_json(source: str, destination: str) -> int:
+    """Converte um NDJSON do --output-format ndjson para o JSON agregado; retorna o total de buckets"""
+    metadata: Dict[str, Any] = {}
+    for kind, record in iter_result_file(source):
+        if kind == 'metadata':
+            metadata.update(record)
+    
+    # Segunda passada: os buckets são copiados um a um, sem carregar o arquivo inteiro
+    results = (record for kind, record in iter_result_file(source) if kind == 'bucket')
+    return write_results_json(destination, metadata, results)
+
+def merge_result_files(sources: List[str], destination: str) -> Tuple[Dict[str, Any], 'ReportAggregator']:
+    """Combina resultados de vários shards/processos em um JSON agregado; retorna (metadados, relatório)"""
+    shards: List[Dict[str, Any]] = []
+    seen = set()
+    for source in sources:
+        metadata: Dict[str, Any] = {}
+        buckets = 0
+        for kind, record in iter_result_file(source):
+            if kind == 'metadata':
+                metadata.update(record)
+            elif kind == 'bucket':
+                buckets += 1
+                seen.add(record['bucket'])
+        shards.append(dict(metadata, source=source, buckets=buckets))
+    
+    metadata = {
+        'version': '3.0',
+        'timestamp': datetime.now().isoformat(),
+        'total_buckets': len(seen),
+        'tool': 'CloudSniff',
+        'merged_from': shards
+    }
+    
+    report = ReportAggregator()
+    
+    def results() -> Iterator[Dict[str, Any]]:
+        # Um bucket presente em mais de um arquivo (ex.: scans repetidos) entra uma única vez
+        emitted = set()
+        for source in sources:
+            for kind, record in iter_result_file(source):
+                if kind != 'bucket' or record['bucket'] in emitted:
+                    continue
+                emitted.add(record['bucket'])
+                report.observe(record)
+                yield record
+    
+    write_results_json(destination, metadata, results())
+    return metadata, report
+
+def missing_shards(shards: List[Dict[str, Any]]) -> List[str]:
+    """Shards 'i/n' ausentes quando todos os arquivos vêm do mesmo particionamento"""
+    declared = {shard.get('shard') for shard in shards}
+    if None in declared:
+        return []
+    counts = {parse_shard(shard)[1] for shard in declared}
+    if len(counts) != 1:
+        return []
+    count = counts.pop()
+    return [f'{index}/{count}' for index in range(1, count + 1) if f'{index}/{count}' not in declared]
+
+# Limites (segundos) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Região no hostname (s3.us-east-1.amazonaws.com, s3-website-eu-west-1, ...)
+REGION_PATTERN = re.compile(r'(?:^|[.-])([a-z]{2}(?:-gov)?-[a-z]+-\d+)(?=[.-]|$)')
+
+class LatencyHistogram:
+    """Histograma cumulativo no formato Prometheus"""
+    __slots__ = ('counts', 'count', 'sum')
+    
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def copy(self) -> 'LatencyHistogram':
+        histogram = LatencyHistogram()
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.sum = self.sum
+        return histogram
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantil aproximado (limite superior do bucket que o contém)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class PhaseMetrics:
+    """Histogramas de latência por fase (DNS, conexão, TLS, TTFB, total) e por provedor, região e host"""
+    def __init__(self, max_hosts: int = 500):
+        self.max_hosts = max_hosts
+        self.lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+        self.hosts = set()
+        self.probes = 0
+        self.errors = 0
+    
+    def host_label(self, url: str, bucket: str) -> str:
+        """Hostname com o nome do bucket trocado por {bucket}; acima de max_hosts, 'other'"""
+        host = (urlparse(url).hostname or '').replace(bucket, '{bucket}')
+        if host not in self.hosts:
+            if len(self.hosts) >= self.max_hosts:
+                return 'other'
+            self.hosts.add(host)
+        return host
+    
+    def observe_bucket(self, result: Dict[str, Any]):
+        """Registra as fases de todos os probes HTTP de um bucket concluído"""
+        bucket = result['bucket']
+        with self.lock:
+            for test in chain(result['http_tests'], result.get('advanced_tests', [])):
+                if test.get('cached'):
+                    continue
+                self.probes += 1
+                timings = test.get('timings')
+                if timings is None:
+                    self.errors += 1
+                    continue
+                host = self.host_label(test['url'], bucket)
+                region = REGION_PATTERN.search(host)
+                labels = (('provider', str(test.get('provider') or 'unknown')),
+                          ('region', region.group(1) if region else 'global'),
+                          ('host', host))
+                for phase, value in timings.items():
+                    if value is None:
+                        continue
+                    for dimension, label in labels:
+                        key = (dimension, label, phase)
+                        histogram = self.histograms.get(key)
+                        if histogram is None:
+                            histogram = self.histograms[key] = LatencyHistogram()
+                        histogram.observe(value)
+    
+    def snapshot(self) -> Tuple[int, int, List[Tuple[Tuple[str, str, str], LatencyHistogram]]]:
+        """Contadores e cópias dos histogramas lidos juntos, sob o lock (consistentes entre si)"""
+        with self.lock:
+            return self.probes, self.errors, sorted((key, histogram.copy()) for key, histogram in self.histograms.items())
+    
+    def prometheus(self) -> str:
+        """Exposição no formato texto do Prometheus"""
+        probes, errors, items = self.snapshot()
+        lines = ['# HELP cloudsniff_probes_total Probes HTTP concluídos (sem cache).',
+                 '# TYPE cloudsniff_probes_total counter',
+                 f'cloudsniff_probes_total {probes}',
+                 '# HELP cloudsniff_probe_errors_total Probes sem resposta HTTP.',
+                 '# TYPE cloudsniff_probe_errors_total counter',
+                 f'cloudsniff_probe_errors_total {errors}']
+        for dimension in ('provider', 'region', 'host'):
+            name = f'cloudsniff_probe_phase_seconds_by_{dimension}'
+            lines.append(f'# HELP {name} Latência de cada fase do probe por {dimension}.')
+            lines.append(f'# TYPE {name} histogram')
+            for (key_dimension, label, phase), histogram in items:
+                if key_dimension != dimension:
+                    continue
+                tags = f'{dimension}="{label}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{tags},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{tags}}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{{tags}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+    
+    def summary(self) -> Dict[str, Any]:
+        """Resumo por dimensão/rótulo/fase (contagem, média e quantis aproximados)"""
+        probes, errors, items = self.snapshot()
+        summary = {'probes': probes, 'errors': errors, 'buckets': list(LATENCY_BUCKETS)}
+        for (dimension, label, phase), histogram in items:
+            summary.setdefault(dimension, {}).setdefault(label, {})[phase] = {
+                'count': histogram.count,
+                'mean': round(histogram.sum / histogram.count, 6),
+                'p50': histogram.quantile(0.5),
+                'p99': histogram.quantile(0.99)
+            }
+        return summary
+
+def start_metrics_server(metrics: PhaseMetrics, port: int) -> ThreadingHTTPServer:
+    """Servidor HTTP local com /metrics (Prometheus) e /metrics.json"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path == '/metrics':
+                body, content_type = metrics.prometheus().encode(), 'text/plain; version=0.0.4; charset=utf-8'
+            elif path == '/metrics.json':
+                body, content_type = json.dumps(metrics.summary(), default=json_default).encode(), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+REPORT_SAMPLES = 3  # URLs de amostra por status code no relatório
+SUMMARY_SAMPLES = 2  # URLs por tipo no resumo de progresso (modo não verboso)
+REPORT_TOP_BUCKETS = 5  # Buckets com mais achados listados nas estatísticas
+
+class ReportAggregator:
+    """Estatísticas do relatório atualizadas a cada bucket concluído (por provedor, status e bucket);
+    o relatório final é montado dos blocos já renderizados, sem reler os resultados. Os blocos ficam
+    em um arquivo temporário: a memória não cresce com o número de buckets encontrados"""
+    def __init__(self, samples: int = REPORT_SAMPLES):
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.buckets = 0
+        self.found = 0
+        self.accessible = {'http': 0, 'advanced': 0}
+        self.cli_successes = 0
+        self.providers: Dict[str, List[int]] = {}  # Provedor -> [probes, acessíveis]
+        self.statuses: Dict[int, int] = {}  # Status code -> URLs acessíveis
+        self.top: List[Tuple[int, str]] = []  # (-achados, bucket) dos REPORT_TOP_BUCKETS com mais achados
+        self.hit_range: Optional[Tuple[int, int]] = None  # Menor e maior número de achados por bucket
+        self.spool = None  # Arquivo temporário com os blocos renderizados (criado no primeiro bucket encontrado)
+        self.sections = array('q')  # (ordem, posição, tamanho) de cada bloco no spool
+    
+    @classmethod
+    def from_results(cls, results: Iterable[Dict[str, Any]]) -> 'ReportAggregator':
+        """Agregador montado a partir de resultados já concluídos (na ordem dada)"""
+        report = cls()
+        for index, result in enumerate(results, 1):
+            report.observe(result, index)
+        return report
+    
+    def tally(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Uma única passada pelos testes do bucket: acessíveis agrupados por status, com amostras"""
+        providers: Dict[str, List[int]] = {}
+        tally = {'bucket': result['bucket'], 'providers': providers,
+                 'cli': [test['command'] for test in result.get('cli_tests', ()) if test['success']]}
+        for kind, key in (('http', 'http_tests'), ('advanced', 'advanced_tests')):
+            groups: Dict[int, List[Any]] = {}  # Status -> [contagem, URLs de amostra]
+            first: List[Tuple[int, str]] = []
+            count = 0
+            for test in result.get(key, ()):
+                provider = str(test.get('provider') or 'unknown')
+                counts = providers.get(provider)
+                if counts is None:
+                    counts = providers[provider] = [0, 0]
+                counts[0] += 1
+                if not test['accessible']:
+                    continue
+                counts[1] += 1
+                count += 1
+                status = test['status_code']
+                group = groups.get(status)
+                if group is None:
+                    group = groups[status] = [0, []]
+                group[0] += 1
+                if len(group[1]) < self.samples:
+                    group[1].append(test['url'])
+                if len(first) < SUMMARY_SAMPLES:
+                    first.append((status, test['url']))
+            tally[kind] = (count, groups, first)
+        return tally
+    
+    def render_bucket(self, tally: Dict[str, Any]) -> str:
+        """Bloco do relatório de um bucket encontrado"""
+        parts = [f"\n{Colors.SUBHEADER}BUCKET: {tally['bucket']}{Colors.RESET}\n"]
+        for kind, label in (('http', 'URLs padrão'), ('advanced', 'URLs avançadas')):
+            count, groups, _ = tally[kind]
+            if not count:
+                continue
+            parts.append(f"   {Colors.INFO}{label} encontradas ({count}){Colors.RESET}:\n")
+            for status in sorted(groups):
+                total, urls = groups[status]
+                color = Colors.SUCCESS if 200 <= status < 300 else Colors.WARNING
+                parts.append(f"     {color}[{status}] ({total} URLs){Colors.RESET}\n")
+                parts.extend(f"       {url}\n" for url in urls)
+                if total > len(urls):
+                    parts.append(f"       ... e mais {total - len(urls)} URLs\n")
+        if tally['cli']:
+            parts.append(f"   {Colors.INFO}CLI comandos ({len(tally['cli'])}){Colors.RESET}:\n")
+            parts.extend(f"     {Colors.SUCCESS}{command}{Colors.RESET}\n" for command in tally['cli'])
+        return ''.join(parts)
+    
+    def observe(self, result: Dict[str, Any], index: Optional[int] = None) -> Dict[str, Any]:
+        """Incorpora um bucket concluído; retorna o tally usado também no resumo de progresso"""
+        tally = self.tally(result)
+        hits = tally['http'][0] + tally['advanced'][0] + len(tally['cli'])
+        section = self.render_bucket(tally) if hits else None
+        with self.lock:
+            self.buckets += 1
+            for provider, (probes, accessible) in tally['providers'].items():
+                counts = self.providers.get(provider)
+                if counts is None:
+                    counts = self.providers[provider] = [0, 0]
+                counts[0] += probes
+                counts[1] += accessible
+            for kind in ('http', 'advanced'):
+                for status, (count, _) in tally[kind][1].items():
+                    self.statuses[status] = self.statuses.get(status, 0) + count
+            if section is not None:
+                self.found += 1
+                self.accessible['http'] += tally['http'][0]
+                self.accessible['advanced'] += tally['advanced'][0]
+                self.cli_successes += len(tally['cli'])
+                self.rank(tally['bucket'], hits)
+                self.store(self.buckets if index is None else index, section)
+        return tally
+    
+    def rank(self, bucket: str, hits: int):
+        """Mantém apenas os REPORT_TOP_BUCKETS buckets com mais achados (chamado com o lock)"""
+        low, high = self.hit_range or (hits, hits)
+        self.hit_range = (min(low, hits), max(high, hits))
+        entry = (-hits, bucket)
+        if len(self.top) < REPORT_TOP_BUCKETS or entry < self.top[-1]:
+            bisect.insort(self.top, entry)
+            del self.top[REPORT_TOP_BUCKETS:]
+    
+    def store(self, order: int, section: str):
+        """Grava o bloco no spool (chamado com o lock)"""
+        if self.spool is None:
+            self.spool = tempfile.TemporaryFile()
+        data = section.encode('utf-8')
+        offset = self.spool.seek(0, os.SEEK_END)
+        self.spool.write(data)
+        self.sections.extend((order, offset, len(data)))
+    
+    def iter_sections(self, entries: List[Tuple[int, int, int]]) -> Iterator[str]:
+        """Relê os blocos do spool, um por vez"""
+        for _, offset, length in entries:
+            with self.lock:
+                self.spool.seek(offset)
+                data = self.spool.read(length)
+            yield data.decode('utf-8')
+    
+    def top_buckets(self, limit: int = REPORT_TOP_BUCKETS) -> List[Tuple[str, int]]:
+        """Buckets encontrados com mais achados (no máximo REPORT_TOP_BUCKETS)"""
+        return [(bucket, -hits) for hits, bucket in self.top[:limit]]
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'buckets': self.buckets,
+                'found': self.found,
+                'accessible_urls': dict(self.accessible),
+                'cli_successes': self.cli_successes,
+                'providers': {provider: {'probes': probes, 'accessible': accessible}
+                              for provider, (probes, accessible) in sorted(self.providers.items())},
+                'statuses': dict(sorted(self.statuses.items())),
+                'top_buckets': self.top_buckets()
+            }
+    
+    def render(self, total_buckets: Optional[int] = None, notes: Iterable[str] = ()) -> str:
+        """Relatório completo; notes são linhas extras das estatísticas (já formatadas)"""
+        return ''.join(self.iter_render(total_buckets, notes))
+    
+    def iter_render(self, total_buckets: Optional[int] = None, notes: Iterable[str] = ()) -> Iterator[str]:
+        """Relatório em partes, com os blocos dos buckets lidos do spool sob demanda"""
+        with self.lock:
+            sections = self.sections
+            entries = sorted(zip(sections[0::3], sections[1::3], sections[2::3]))
+            if self.spool is not None:
+                self.spool.flush()
+            providers = sorted(self.providers.items())
+            statuses = sorted(self.statuses.items())
+            # Ranking só quando os buckets diferem em número de achados
+            top = self.top_buckets() if self.hit_range and self.hit_range[0] != self.hit_range[1] else []
+        yield f"\n{Colors.HEADER}{'='*60}\n"
+        yield "              RELATÓRIO DE RESULTADOS v3.0\n"
+        yield f"{'='*60}{Colors.RESET}\n"
+        yield from self.iter_sections(entries)
+        parts = [f"\n{Colors.HEADER}ESTATÍSTICAS{Colors.RESET}:\n"]
+        parts.append(f"   Buckets testados: {Colors.BOLD}{self.buckets if total_buckets is None else total_buckets}{Colors.RESET}\n")
+        parts.append(f"   Buckets encontrados: {Colors.SUCCESS}{self.found}{Colors.RESET}\n")
+        parts.append(f"   URLs padrão acessíveis: {Colors.SUCCESS}{self.accessible['http']}{Colors.RESET}\n")
+        parts.append(f"   URLs avançadas acessíveis: {Colors.SUCCESS}{self.accessible['advanced']}{Colors.RESET}\n")
+        parts.append(f"   CLI sucessos: {Colors.SUCCESS}{self.cli_successes}{Colors.RESET}\n")
+        if statuses:
+            by_status = ', '.join(f'{status}: {count}' for status, count in statuses)
+            parts.append(f"   Acessíveis por status: {Colors.INFO}{by_status}{Colors.RESET}\n")
+            by_provider = ', '.join(f'{provider}: {accessible}/{probes}' for provider, (probes, accessible) in providers
+                                    if accessible)
+            parts.append(f"   Acessíveis por provedor (acessíveis/probes): {Colors.INFO}{by_provider}{Colors.RESET}\n")
+        if top:
+            ranking = ', '.join(f'{bucket} ({hits})' for bucket, hits in top)
+            parts.append(f"   Buckets com mais achados: {Colors.INFO}{ranking}{Colors.RESET}\n")
+        parts.extend(notes)
+        if self.found == 0:
+            parts.append(f"\n{Colors.ERROR}Nenhum bucket acessível encontrado.{Colors.RESET}\n")
+        yield ''.join(parts)
+
+class ResultCollector:
+    """Destino dos resultados de cada bucket: lista em memória (JSON) ou streaming (NDJSON);
+    o relatório é agregado à medida que os buckets terminam"""
+    def __init__(self, journal: Optional[ScanJournal] = None, writer: Optional[NDJSONResultWriter] = None,
+                 progress: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                 metrics: Optional[PhaseMetrics] = None, report: Optional[ReportAggregator] = None):
+        self.journal = journal
+        self.writer = writer
+        self.progress = progress  # Recebe (contagem, tally do ReportAggregator)
+        self.metrics = metrics
+        self.report = report or ReportAggregator()
+        self.count = 0
+        self._ordered: Dict[int, Dict[str, Any]] = {}
+    
+    def add(self, index: int, result: Dict[str, Any], journaled: bool = False):
+        """Registra um bucket concluído (journal, writer e/ou memória)"""
+        if self.journal and not journaled:
+            self.journal.record(result)
+        self.count += 1
+        if self.metrics and not journaled:
+            self.metrics.observe_bucket(result)
+        tally = self.report.observe(result, index)
+        if self.progress and not journaled:
+            self.progress(self.count, tally)
+        if self.writer is None:
+            self._ordered[index] = result
+            return
+        # Streaming: o resultado completo vai para o disco; o relatório já está no agregador
+        self.writer.write(result)
+    
+    def results(self) -> List[Dict[str, Any]]:
+        if self.writer is None:
+            return [self._ordered[index] for index in sorted(self._ordered)]
+        return []
+
 class CloudBucketTester:
-    def __init__(self, timeout: int = 10, workers: int = 15, aws_profile: Optional[str] = None):
+    def __init__(self, timeout: int = 10, workers: int = 15, aws_profile: Optional[str] = None,
+                 engine: str = 'threads', concurrency: int = 1000, per_host: Optional[int] = None,
+                 resolver: Optional[DNSResolver] = None, aws_strategy: str = 'discover',
+                 s3_region_cache: Optional[S3RegionCache] = None, host_health: Optional[HostHealthCache] = None,
+                 probe_mode: str = 'get', max_body: int = 65536,
+                 rate_limiter: Optional[HostRateLimiter] = None, max_retries: int = 2,
+                 processes: int = 1, shard: Optional[str] = None, cli_mode: str = 'native',
+                 probe_cache: Optional[ProbeCache] = None, header_allowlist: tuple = HEADER_ALLOWLIST,
+                 registry: Optional[ProviderRegistry] = None, first_hit: Optional[str] = None,
+                 budget: Optional[ConcurrencyBudget] = None):
         self.timeout = timeout
         self.workers = workers
         self.aws_profile = aws_profile
+        self.engine = engine
+        self.concurrency = concurrency
+        self.per_host = per_host or workers
         self.results = []
+        self.registry = registry or ProviderRegistry()  # Provedores/regiões selecionados, templates compilados
+        self.http = SharedHTTPClient(workers=workers, shared_hosts=self.registry.shared_host_pattern())
+        self.resolver = resolver  # None = sem pré-resolução DNS
+        self.aws_strategy = aws_strategy
+        self.s3_region_cache = s3_region_cache or S3RegionCache()
+        # bucket -> [região, S3_MISSING ou None; scans em andamento que a usam] (jobs simultâneos do serve)
+        self._s3_discovery: Dict[str, List[Any]] = {}
+        self._s3_discovery_lock = threading.Lock()
+        self.host_health = host_health  # None = sem cache de saúde de hosts
+        self.probe_mode = probe_mode
+        self.max_body = max_body
+        self.rate_limiter = rate_limiter  # None = sem limitação por host
+        self.max_retries = max_retries
+        self.processes = processes
+        self.shard = shard  # 'i/n' quando o scan cobre apenas uma partição dos buckets
+        self.options: Dict[str, Any] = {}  # Opções da CLI, repassadas aos processos filhos
+        self.process_pool: Optional['ProcessScanPool'] = None
+        self.cli_mode = cli_mode  # native (listagens via HTTP) ou subprocess (aws/gsutil/az)
+        self.aws_credentials = load_aws_credentials(aws_profile) if cli_mode == 'native' else None
+        self.probe_cache = probe_cache  # None = sem cache persistente de probes
+        self.header_allowlist = header_allowlist
+        self.name_skips: Dict[str, int] = {}  # Provedor -> probes descartados por nome inválido
+        self._name_skip_lock = threading.Lock()
+        self.first_hit = first_hit  # None, 'bucket' ou 'provider' (--first-hit / --first-hit-per-provider)
+        self.cancelled_probes = 0  # Probes cancelados por BucketCutoff
+        self.metrics = PhaseMetrics()  # Latência por fase; exposta em --metrics-port e nos metadados
+        self.report = ReportAggregator()  # Estatísticas do relatório, atualizadas a cada bucket
+        self.budget = budget  # None = sem limite global de requisições (ver serve)
         
-    def test_http_endpoint(self, url: str, method: str = 'GET') -> Dict[str, Any]:
+    def host_health_result(self, url: str, method: str = 'GET') -> Optional[Dict[str, Any]]:
+        """Resultado em cache para hosts que falharam recentemente (DNS, conexão recusada, TLS)"""
+        if self.host_health is None:
+            return None
+        failure = self.host_health.check(url)
+        if failure is None:
+            return None
+        reason, error = failure
+        return probe_error_result(url, method, f'[host-cache:{reason}] {error}')
+    
+    def record_host_failure(self, url: str, exc: Exception):
+        """Registra no cache de saúde falhas de conexão que valem para todo o host"""
+        if self.host_health is None:
+            return
+        reason = classify_connection_error(exc)
+        if reason is not None:
+            # Em redirecionamentos a falha pertence ao host de destino
+            failed_url = getattr(getattr(exc, 'request', None), 'url', None) or url
+            self.host_health.record_failure(failed_url, reason, str(exc))
+    
+    def probe_request(self, method: str) -> tuple:
+        """Método, cabeçalhos extras e leitura em streaming conforme o --probe-mode"""
+        if method != 'GET' or self.probe_mode == 'get':
+            return method, {}, False
+        if self.probe_mode == 'head':
+            return 'HEAD', {}, False
+        if self.probe_mode == 'range':
+            return 'GET', {'Range': f'bytes=0-{self.max_body - 1}'}, True
+        return 'GET', {}, True
+    
+    def probe_result(self, url: str, method: str, status: int, headers, read: int, exhausted: bool,
+                     response_time: float, ranged: bool = False, timings: Optional[tuple] = None) -> ProbeResult:
+        """Monta o resultado de um probe respondido; o tamanho vem dos cabeçalhos quando o corpo não foi lido inteiro"""
+        if ranged and status in (206, 416):
+            status = 200  # O objeto responde 200 a um GET normal; 416 = corpo vazio
+        declared = declared_body_size(headers) if self.probe_mode != 'get' else None
+        size = declared if declared is not None else read
+        return ProbeResult(
+            url, method,
+            status_code=status,
+            accessible=status < 500,  # Considera 4xx como acessível
+            headers=dict(headers),
+            size=size,
+            truncated=size > read if declared is not None else not exhausted,
+            response_time=response_time,
+            timings=timings
+        )
+    
+    def throttle_delay(self, result: Dict[str, Any], attempt: int) -> Optional[float]:
+        """Espera antes de repetir um probe com throttling (None = não repetir)"""
+        if result['status_code'] not in THROTTLE_STATUS or attempt >= self.max_retries:
+            return None
+        retry_after = parse_retry_after(next((v for k, v in result['headers'].items() if k.lower() == 'retry-after'), None))
+        if retry_after is not None:
+            return min(retry_after, 30.0) + random.uniform(0, 0.5)
+        return random.uniform(0, min(0.5 * 2 ** attempt, 10.0))  # Backoff exponencial com jitter total
+    
+    def finish_throttled(self, result: ProbeResult, retries: int) -> ProbeResult:
+        """Registra as tentativas; throttling persistente não indica bucket acessível"""
+        result['retries'] = retries
+        if result['status_code'] in THROTTLE_STATUS:
+            result['accessible'] = False
+            result['error'] = f"Throttled ({result['status_code']}) após {retries} tentativas extras"
+        return result
+    
+    def test_http_endpoint(self, url: str, method: str = 'GET', allow_redirects: bool = True) -> ProbeResult:
         """Testa endpoint HTTP/HTTPS"""
+        cached = self.host_health_result(url, method)
+        if cached is not None:
+            return cached
+        
+        host = urlparse(url).netloc.lower()
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(host)
+            with self.budget or nullcontext():
+                result = self.send_probe(url, method, allow_redirects)
+            delay = self.throttle_delay(result, attempt)
+            if self.rate_limiter is not None:
+                throttled = result['status_code'] in THROTTLE_STATUS
+                self.rate_limiter.release(host, throttled, delay if throttled else None)
+            if delay is None:
+                return self.finish_throttled(result, attempt)
+            attempt += 1
+            time.sleep(delay)
+    
+    def send_probe(self, url: str, method: str = 'GET', allow_redirects: bool = True) -> ProbeResult:
+        """Uma única tentativa de requisição HTTP/HTTPS"""
+        method, extra_headers, stream = self.probe_request(method)
+        _connection_phases.current = None
+        start = time.perf_counter()
         try:
-            response = requests.request(
+            with self.http.request(
                 method=method,
                 url=url,
                 timeout=self.timeout,
-                allow_redirects=True,
-                verify=True
-            )
-            return {
-                'url': url,
-                'method': method,
-                'status_code': response.status_code,
-                'accessible': response.status_code < 500,  # Considera 4xx como acessível
-                'headers': dict(response.headers),
-                'size': len(response.content) if response.content else 0,
-                'error': None,
-                'response_time': response.elapsed.total_seconds()
-            }
+                allow_redirects=allow_redirects,
+                verify=True,
+                headers=extra_headers,
+                stream=stream
+            ) as response:
+                read, exhausted = 0, True
+                if stream:
+                    # Para de ler após --max-body bytes
+                    exhausted = False
+                    chunks = response.iter_content(chunk_size=min(16384, self.max_body))
+                    while read < self.max_body:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            exhausted = True
+                            break
+                        read += len(chunk)
+                elif method != 'HEAD':
+                    read = len(response.content) if response.content else 0
+                
+                # Sem conexão nova (reuso do pool): DNS, TCP e TLS não custaram nada
+                dns, connect, tls = getattr(_connection_phases, 'current', None) or \
+                    (0.0, 0.0, 0.0 if url.startswith('https:') else None)
+                timings = phase_timings(dns, connect, tls, response.elapsed.total_seconds(), time.perf_counter() - start)
+                return self.probe_result(url, method, response.status_code, response.headers, read, exhausted,
+                                         response.elapsed.total_seconds(), ranged='Range' in extra_headers, timings=timings)
         except requests.exceptions.RequestException as e:
-            return {
-                'url': url,
-                'method': method,
-                'status_code': None,
-                'accessible': False,
-                'headers': {},
-                'size': 0,
-                'error': str(e),
-                'response_time': 0
-            }
+            self.record_host_failure(url, e)
+            return probe_error_result(url, method, str(e), time.perf_counter() - start)
     
     def test_aws_cli(self, bucket: str, no_sign_request: bool = False) -> Dict[str, Any]:
         """Testa AWS CLI"""
@@ -206,283 +2482,340 @@ class CloudBucketTester:
                 'error': str(e)
             }
     
-    def generate_aws_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para AWS S3"""
-        regions = ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1', 'sa-east-1', 'us-east-2', 'eu-central-1']
-        urls = []
-        
-        for region in regions:
-            # Formato path-style
-            urls.append(f'https://s3.{region}.amazonaws.com/{bucket}')
-            urls.append(f'https://s3.{region}.amazonaws.com/{bucket}/')
-            # Formato virtual-hosted-style
-            urls.append(f'https://{bucket}.s3.{region}.amazonaws.com/')
-            urls.append(f'https://{bucket}.s3.{region}.amazonaws.com')
-            # Formato legacy
-            if region == 'us-east-1':
-                urls.append(f'https://s3.amazonaws.com/{bucket}')
-                urls.append(f'https://s3.amazonaws.com/{bucket}/')
-                urls.append(f'https://{bucket}.s3.amazonaws.com/')
-                urls.append(f'https://{bucket}.s3.amazonaws.com')
-        
-        return urls
-    
-    def generate_gcp_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para Google Cloud Storage"""
-        return [
-            f'https://storage.googleapis.com/{bucket}',
-            f'https://storage.googleapis.com/{bucket}/',
-            f'https://{bucket}.storage.googleapis.com/',
-            f'https://{bucket}.storage.googleapis.com',
-            #f'https://storage.cloud.google.com/{bucket}',
-            #f'https://storage.cloud.google.com/{bucket}/',
-            #f'https://console.cloud.google.com/storage/browser/{bucket}',
-            f'https://www.googleapis.com/storage/v1/b/{bucket}/o',
-        ]
+    def native_list_result(self, command: str, provider: str, response: Optional[requests.Response] = None,
+                           error: Optional[str] = None) -> Dict[str, Any]:
+        """Registro de uma listagem nativa no formato de cli_tests (return_code = status HTTP)"""
+        if response is None:
+            return {'command': command, 'success': False, 'stdout': '', 'stderr': error, 'return_code': -1, 'error': error}
+        success = response.status_code == 200
+        return {
+            'command': command,
+            'success': success,
+            'stdout': '\n'.join(parse_listing(provider, response.content)) if success else '',
+            'stderr': '' if success else response.text[:1000],
+            'return_code': response.status_code,
+            'error': None
+        }
     
-    def generate_azure_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para Azure Blob Storage"""
-        return [
-            f'https://{bucket}.blob.core.windows.net/',
-            f'https://{bucket}.blob.core.windows.net',
-            f'https://{bucket}.blob.core.windows.net/?restype=container&comp=list',
-            f'https://{bucket}.z1.web.core.windows.net/',
-            f'https://{bucket}.z13.web.core.windows.net/',
-            f'https://{bucket}.z22.web.core.windows.net/',
-            f'https://{bucket}.azurewebsites.net/',
-        ]
+    def native_list(self, command: str, provider: str, url: str) -> Dict[str, Any]:
+        """Listagem anônima em uma única requisição pelo cliente HTTP compartilhado"""
+        try:
+            with self.budget or nullcontext():
+                response = self.http.request('GET', url, timeout=self.timeout, allow_redirects=False)
+        except requests.RequestException as e:
+            self.record_host_failure(url, e)
+            return self.native_list_result(command, provider, error=str(e))
+        return self.native_list_result(command, provider, response)
     
-    def generate_firebase_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para Firebase Storage"""
-        return [
-            f'https://firebasestorage.googleapis.com/v0/b/{bucket}/o',
-            f'https://firebasestorage.googleapis.com/v0/b/{bucket}.appspot.com/o',
-            f'https://{bucket}.web.app/',
-            f'https://{bucket}.firebaseapp.com/',
-            f'https://{bucket}.firebaseio.com/',
-        ]
+    def s3_list_url(self, bucket: str, region: str) -> str:
+        """ListObjectsV2 path-style no endpoint regional"""
+        host = 's3.amazonaws.com' if region == 'us-east-1' else f's3.{region}.amazonaws.com'
+        return f"https://{host}/{quote(bucket, safe='')}?list-type=2&max-keys={NATIVE_LIST_MAX_KEYS}"
     
-    def generate_digitalocean_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para DigitalOcean Spaces"""
-        regions = ['nyc3', 'ams3', 'sgp1', 'sfo3', 'fra1', 'blr1', 'syd1']
-        urls = []
-        
-        for region in regions:
-            urls.append(f'https://{bucket}.{region}.digitaloceanspaces.com/')
-            urls.append(f'https://{bucket}.{region}.digitaloceanspaces.com')
-            urls.append(f'https://{bucket}.{region}.cdn.digitaloceanspaces.com/')
-            urls.append(f'https://{bucket}.{region}.cdn.digitaloceanspaces.com')
-        
-        return urls
+    def gcs_list_url(self, bucket: str) -> str:
+        return f"https://storage.googleapis.com/storage/v1/b/{quote(bucket, safe='')}/o?maxResults={NATIVE_LIST_MAX_KEYS}"
     
-    def generate_linode_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para Linode Object Storage"""
-        regions = ['us-east-1', 'eu-central-1', 'ap-south-1', 'us-southeast-1']
-        urls = []
-        
-        for region in regions:
-            urls.append(f'https://{bucket}.{region}.linodeobjects.com/')
-            urls.append(f'https://{bucket}.{region}.linodeobjects.com')
-        
-        return urls
+    def azure_list_url(self, bucket: str) -> str:
+        return f'https://{bucket}.blob.core.windows.net/{bucket}?restype=container&comp=list&maxresults={NATIVE_LIST_MAX_KEYS}'
     
-    def generate_oracle_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para Oracle Cloud Storage"""
-        regions = ['us-phoenix-1', 'us-ashburn-1', 'eu-frankfurt-1', 'ap-tokyo-1']
-        urls = []
+    def native_s3_list(self, bucket: str, signed: bool = False) -> Dict[str, Any]:
+        """Equivalente a `aws s3 ls`: ListObjectsV2 anônimo ou assinado (SigV4) com as credenciais do perfil"""
+        if signed:
+            command = f"native: s3 ListObjectsV2 s3://{bucket} (perfil {self.aws_profile or 'default'})"
+            if self.aws_credentials is None:
+                return self.native_list_result(command, 'aws', error='Credenciais AWS não encontradas')
+        else:
+            command = f'native: s3 ListObjectsV2 s3://{bucket} (anônimo)'
+        if not valid_s3_name(bucket.lower()):  # Hostnames não diferenciam maiúsculas
+            return self.native_list_result(command, 'aws', error='Nome inválido para bucket S3')
         
-        for region in regions:
-            urls.append(f'https://objectstorage.{region}.oraclecloud.com/n/namespace/b/{bucket}/o')
-            urls.append(f'https://{bucket}.compat.objectstorage.{region}.oraclecloud.com/')
-        
-        return urls
+        region = self.s3_region_cache.get(bucket) or 'us-east-1'
+        try:
+            for _ in range(2):
+                url = self.s3_list_url(bucket, region)
+                headers = sign_aws_request('GET', url, region, self.aws_credentials) if signed else None
+                with self.budget or nullcontext():
+                    response = self.http.request('GET', url, headers=headers, timeout=self.timeout, allow_redirects=False)
+                # Região errada: o S3 informa a correta em x-amz-bucket-region (301/400)
+                actual = response.headers.get('x-amz-bucket-region', '')
+                if response.status_code == 200 or actual == region or not AWS_REGION_PATTERN.match(actual):
+                    break
+                region = actual
+                self.s3_region_cache.set(bucket, region)
+        except requests.RequestException as e:
+            self.record_host_failure(url, e)
+            return self.native_list_result(command, 'aws', error=str(e))
+        return self.native_list_result(command, 'aws', response)
+    
+    def native_gcs_list(self, bucket: str) -> Dict[str, Any]:
+        """Equivalente anônimo a `gsutil ls` (API JSON do GCS)"""
+        command = f'native: gcs objects.list gs://{bucket} (anônimo)'
+        if not valid_gcs_name(bucket):
+            return self.native_list_result(command, 'gcp', error='Nome inválido para bucket GCS')
+        return self.native_list(command, 'gcp', self.gcs_list_url(bucket))
+    
+    def native_azure_list(self, bucket: str) -> Dict[str, Any]:
+        """Listagem anônima do container <bucket> na conta <bucket>"""
+        command = f'native: azure List Blobs {bucket}/{bucket} (anônimo)'
+        if not AZURE_ACCOUNT_PATTERN.match(bucket):
+            return self.native_list_result(command, 'azure', error='Nome inválido para conta de storage Azure')
+        return self.native_list(command, 'azure', self.azure_list_url(bucket))
+    
+    def s3_discovery_url(self, bucket: str) -> str:
+        """Endpoint global path-style usado na descoberta de região"""
+        return f'{S3_DISCOVERY_ENDPOINT}/{bucket}'
     
-    def generate_ibm_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para IBM Cloud Object Storage"""
-        regions = ['us-south', 'eu-gb', 'ap-jp', 'us-east']
-        urls = []
+    def discover_s3_region(self, bucket: str) -> Optional[Dict[str, Any]]:
+        """Descobre a região do bucket com um HEAD no endpoint global (x-amz-bucket-region / 301)"""
+        if self.aws_strategy != 'discover' or 'aws' not in self.registry:
+            return None
+        if not valid_s3_name(bucket.lower()):
+            self.remember_discovery(bucket, S3_MISSING)  # Nome que o S3 não aceita: nenhum probe AWS
+            return None
         
-        for region in regions:
-            urls.append(f'https://s3.{region}.cloud-object-storage.appdomain.cloud/{bucket}')
-            urls.append(f'https://{bucket}.s3.{region}.cloud-object-storage.appdomain.cloud/')
+        cached = self.s3_region_cache.get(bucket)
+        if cached:
+            self.remember_discovery(bucket, cached)
+            return None
         
-        return urls
+        result = self.test_http_endpoint(self.s3_discovery_url(bucket), method='HEAD', allow_redirects=False)
+        result['provider'] = Provider.AWS
+        result['variant'] = Variant.DISCOVERY
+        
+        region = {k.lower(): v for k, v in result['headers'].items()}.get('x-amz-bucket-region', '')
+        if AWS_REGION_PATTERN.match(region):
+            self.remember_discovery(bucket, region)
+            self.s3_region_cache.set(bucket, region)
+        elif result['status_code'] in (400, 404):
+            self.remember_discovery(bucket, S3_MISSING)  # NoSuchBucket / nome inválido
+        else:
+            self.remember_discovery(bucket, None)  # Falha de rede ou resposta ambígua: usa o fan-out
+        return result
     
-    def generate_backblaze_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para Backblaze B2"""
-        return [
-            f'https://f000.backblazeb2.com/file/{bucket}',
-            f'https://f001.backblazeb2.com/file/{bucket}',
-            f'https://f002.backblazeb2.com/file/{bucket}',
-            f'https://f003.backblazeb2.com/file/{bucket}',
-        ]
+    def remember_discovery(self, bucket: str, region: Optional[str]):
+        """Guarda a descoberta até o plano do bucket ser montado; cada scan que descobre conta uma referência"""
+        with self._s3_discovery_lock:
+            entry = self._s3_discovery.get(bucket)
+            if entry is None:
+                self._s3_discovery[bucket] = [region, 1]
+            else:
+                entry[0] = region
+                entry[1] += 1
     
-    def generate_wasabi_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para Wasabi Cloud Storage"""
-        regions = ['us-east-1', 'us-east-2', 'us-west-1', 'eu-central-1', 'ap-northeast-1']
-        urls = []
-        
-        for region in regions:
-            urls.append(f'https://s3.{region}.wasabisys.com/{bucket}')
-            urls.append(f'https://s3.{region}.wasabisys.com/{bucket}/')
-            urls.append(f'https://{bucket}.s3.{region}.wasabisys.com/')
-            urls.append(f'https://{bucket}.s3.{region}.wasabisys.com')
-        
-        return urls
-    
-    def generate_vultr_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para Vultr Object Storage"""
-        regions = ['ewr1', 'sgp1', 'ams1', 'fra1', 'sjc1']
-        urls = []
-        
-        for region in regions:
-            urls.append(f'https://{bucket}.{region}.vultrobjects.com/')
-            urls.append(f'https://{bucket}.{region}.vultrobjects.com')
-        
-        return urls
-    
-    def generate_scaleway_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para Scaleway Object Storage"""
-        regions = ['fr-par', 'nl-ams', 'pl-waw']
-        urls = []
-        
-        for region in regions:
-            urls.append(f'https://s3.{region}.scw.cloud/{bucket}')
-            urls.append(f'https://s3.{region}.scw.cloud/{bucket}/')
-            urls.append(f'https://{bucket}.s3.{region}.scw.cloud/')
-            urls.append(f'https://{bucket}.s3.{region}.scw.cloud')
-        
-        return urls
-    
-    def generate_ovh_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para OVH Object Storage"""
-        regions = ['gra', 'sbg', 'rbx', 'bhs', 'waw', 'de', 'uk']
-        urls = []
-        
-        for region in regions:
-            urls.append(f'https://s3.{region}.cloud.ovh.net/{bucket}')
-            urls.append(f'https://s3.{region}.cloud.ovh.net/{bucket}/')
-            urls.append(f'https://{bucket}.s3.{region}.cloud.ovh.net/')
-            urls.append(f'https://{bucket}.s3.{region}.cloud.ovh.net')
-        
-        return urls
-    
-    def generate_minio_urls(self, bucket: str) -> List[str]:
-        """Gera URLs para MinIO (comum em ambientes self-hosted)"""
-        common_ports = ['9000', '9001', '443', '80']
-        common_hosts = ['minio', 's3', 'storage', 'object', 'bucket']
-        urls = []
-        
-        for host in common_hosts:
-            for port in common_ports:
-                if port in ['443']:
-                    urls.append(f'https://{host}:{port}/{bucket}')
-                    urls.append(f'https://{host}:{port}/{bucket}/')
-                elif port in ['80']:
-                    urls.append(f'http://{host}:{port}/{bucket}')
-                    urls.append(f'http://{host}:{port}/{bucket}/')
-                else:
-                    urls.append(f'http://{host}:{port}/{bucket}')
-                    urls.append(f'http://{host}:{port}/{bucket}/')
-                    urls.append(f'https://{host}:{port}/{bucket}')
-                    urls.append(f'https://{host}:{port}/{bucket}/')
-        
-        return urls
+    def release_discovery(self, bucket: str):
+        """Plano montado: descarta a descoberta quando nenhum outro scan do mesmo bucket ainda a usa"""
+        with self._s3_discovery_lock:
+            entry = self._s3_discovery.get(bucket)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._s3_discovery[bucket]
+    
+    def aws_regions_for(self, bucket: str) -> List[str]:
+        """Regiões a testar para o bucket conforme a estratégia AWS"""
+        if self.aws_strategy != 'discover':
+            return AWS_FANOUT_REGIONS
+        with self._s3_discovery_lock:
+            entry = self._s3_discovery.get(bucket)
+        if entry is not None:
+            region = entry[0]
+        else:
+            # Ainda sem descoberta (ex.: --dry-run): apenas o cache persistente
+            region = self.s3_region_cache.get(bucket) or S3_MISSING
+        if region is None:
+            return AWS_FANOUT_REGIONS
+        return [region] if region else []
+    
+    def expand_group(self, group: ProviderGroup, bucket: str) -> Tuple[List[CompiledTemplate], int]:
+        """Templates compilados de um grupo para o bucket (regiões da descoberta do S3 quando aplicável)"""
+        if not group.discovery or self.aws_strategy != 'discover':
+            return group.compile()
+        region_filter = self.registry.region_filter
+        regions = [region for region in self.aws_regions_for(bucket) if region_filter is None or region in region_filter]
+        return group.compile(tuple(regions[:group.max_regions]), fanout=False)
+    
+    def build_probe_plan(self, bucket: str) -> List[Probe]:
+        """Monta o probe plan do bucket antes de qualquer I/O: URLs canônicas e sem duplicatas"""
+        plan = []
+        seen = set()
+        # Templates já são canônicos; só nomes com maiúsculas precisam normalizar o host de novo.
+        # As regras de nome avaliam a forma minúscula: o host não diferencia maiúsculas, e o nome
+        # digitado continua sendo testado (como antes das regras), em vez de descartado
+        name = bucket.lower()
+        recanonicalize = bucket != name
+        verdicts: Dict[str, bool] = {}
+        skipped: Dict[str, int] = {}
+        for group in self.registry.groups:
+            for template in self.expand_group(group, bucket)[0]:
+                if not all(self.name_allowed(rule, name, verdicts) for rule in template.rules):
+                    skipped[group.provider] = skipped.get(group.provider, 0) + 1
+                    continue
+                url = bucket.join(template.parts)
+                if recanonicalize:
+                    url = canonicalize_url(url)
+                if url in seen:
+                    continue
+                seen.add(url)
+                plan.append(Probe(url, group.provider, template.variant, group.tag))
+        if skipped:
+            with self._name_skip_lock:
+                for provider, count in skipped.items():
+                    self.name_skips[provider] = self.name_skips.get(provider, 0) + count
+        return plan
+    
+    @staticmethod
+    def name_allowed(rule: str, bucket: str, verdicts: Dict[str, bool]) -> bool:
+        """Avalia uma regra de nome uma única vez por bucket"""
+        verdict = verdicts.get(rule)
+        if verdict is None:
+            verdict = verdicts[rule] = BUCKET_NAME_RULES[rule](bucket)
+        return verdict
+    
+    def name_skip_counts(self) -> Dict[str, int]:
+        """Probes descartados por nome inválido, por provedor (incluindo os processos filhos)"""
+        counts = dict(self.name_skips)
+        for worker in self.process_pool.metadata if self.process_pool else ():
+            for provider, count in (worker.get('name_skips') or {}).items():
+                counts[provider] = counts.get(provider, 0) + count
+        return {str(provider): count for provider, count in sorted(counts.items(), key=lambda item: -item[1])}
+    
+    def new_cutoff(self, status_filter: Optional[List[int]] = None) -> Optional[BucketCutoff]:
+        """Corte de probes do bucket; None quando nem --first-hit nem o pushdown do --status se aplicam"""
+        # Sem 404 no filtro, um 404 REST em provedor de namespace global torna os demais probes dele inúteis
+        missing_cutoff = self.registry.global_namespaces if status_filter and 404 not in status_filter else set()
+        if not self.first_hit and not missing_cutoff:
+            return None
+        return BucketCutoff(self.first_hit, set(status_filter or FIRST_HIT_STATUS), missing_cutoff)
+    
+    def apply_cutoff(self, cutoff: Optional[BucketCutoff], bucket_results: Dict[str, Any], plan: List[Probe]) -> List[Probe]:
+        """Considera os resultados já obtidos (descoberta, cache) e remove do plano os probes desnecessários"""
+        if cutoff is None:
+            return plan
+        for test in chain(bucket_results['http_tests'], bucket_results['advanced_tests']):
+            cutoff.observe(test.get('provider'), test)
+        pending = [probe for probe in plan if cutoff.allows(probe.provider)]
+        self.record_cancelled(len(plan) - len(pending))
+        return pending
+    
+    def record_cancelled(self, count: int):
+        if count:
+            with self._name_skip_lock:
+                self.cancelled_probes += count
+    
+    def cancelled_probe_count(self) -> int:
+        """Probes cancelados, incluindo os dos processos filhos"""
+        workers = self.process_pool.metadata if self.process_pool else ()
+        return self.cancelled_probes + sum(worker.get('cancelled_probes') or 0 for worker in workers)
+    
+    def generate_urls(self, bucket: str, tag: str = 'http', provider: Optional[str] = None) -> List[str]:
+        """URLs do probe plan de um grupo de testes, opcionalmente de um único provedor"""
+        return [probe.url for probe in self.build_probe_plan(bucket)
+                if probe.tag == tag and (provider is None or probe.provider == provider)]
     
     def generate_all_urls(self, bucket: str) -> List[str]:
         """Gera todas as URLs possíveis"""
-        urls = []
-        urls.extend(self.generate_aws_urls(bucket))
-        urls.extend(self.generate_gcp_urls(bucket))
-        urls.extend(self.generate_azure_urls(bucket))
-        urls.extend(self.generate_firebase_urls(bucket))
-        urls.extend(self.generate_digitalocean_urls(bucket))
-        urls.extend(self.generate_linode_urls(bucket))
-        urls.extend(self.generate_oracle_urls(bucket))
-        urls.extend(self.generate_ibm_urls(bucket))
-        urls.extend(self.generate_backblaze_urls(bucket))
-        urls.extend(self.generate_wasabi_urls(bucket))
-        urls.extend(self.generate_vultr_urls(bucket))
-        urls.extend(self.generate_scaleway_urls(bucket))
-        urls.extend(self.generate_ovh_urls(bucket))
-        urls.extend(self.generate_minio_urls(bucket))
-        
-        return urls
+        return self.generate_urls(bucket, 'http')
+    
+    def generate_advanced_urls(self, bucket: str) -> List[str]:
+        """Gera todas as URLs dos testes avançados"""
+        return self.generate_urls(bucket, 'advanced')
+    
+    def plan_hosts(self, plan: List[Probe]) -> set:
+        """Hostnames distintos de um probe plan"""
+        return {urlparse(probe.url).hostname for probe in plan}
+    
+    def prefetch_dns(self, plan: List[Probe]):
+        """Pré-resolve em lote todos os hosts do plano (fase síncrona)"""
+        if self.resolver is not None:
+            asyncio.run(self.resolver.resolve_many(self.plan_hosts(plan)))
+    
+    def dns_failure_result(self, probe: Probe) -> Optional[Dict[str, Any]]:
+        """Resultado sem HTTP para probes cujo host está em cache como NXDOMAIN"""
+        if self.resolver is None:
+            return None
+        host = urlparse(probe.url).hostname
+        entry = self.resolver.lookup(host)
+        if entry is None or entry.state != 'nxdomain':
+            return None
+        self.resolver.record_skip()
+        return probe_error_result(probe.url, 'GET', f'NXDOMAIN: {host}')
+    
+    def probe_cache_key(self, url: str) -> str:
+        """Chave do cache de probes: o resultado depende do --probe-mode"""
+        return f'{self.probe_mode} {url}'
+    
+    def serve_cached_probes(self, plan: List[Probe], bucket_results: Dict[str, Any], verbose: bool = False) -> List[Probe]:
+        """Atende do cache persistente os probes com entrada válida; retorna os que ainda precisam de rede"""
+        if self.probe_cache is None:
+            return plan
+        pending = []
+        for probe in plan:
+            result = self.probe_cache.get(self.probe_cache_key(probe.url), probe.url)
+            if result is None:
+                pending.append(probe)
+                continue
+            result['provider'] = probe.provider
+            result['variant'] = probe.variant
+            bucket_results[f'{probe.tag}_tests'].append(result)
+            if verbose and result['accessible']:
+                self.print_probe_result(result)
+        return pending
+    
+    def cache_probe_result(self, url: str, result: Dict[str, Any]):
+        if self.probe_cache is not None:
+            self.probe_cache.set(self.probe_cache_key(url), result)
+    
+    def cache_probe_results(self, results: Iterable[Tuple[str, Dict[str, Any]]]):
+        for url, result in results:
+            self.cache_probe_result(url, result)
+    
+    def run_probe(self, probe: Probe) -> ProbeResult:
+        """Executa um probe do plano e rotula o resultado com provedor e variante"""
+        result = self.dns_failure_result(probe) or self.test_http_endpoint(probe.url)
+        self.cache_probe_result(probe.url, result)
+        result['provider'] = probe.provider
+        result['variant'] = probe.variant
+        return result
+    
+    def print_probe_plan(self, buckets: Iterable[str]) -> int:
+        """Exibe o probe plan (--dry-run) e retorna o total de requisições"""
+        total = 0
+        count = 0
+        for bucket in buckets:
+            count += 1
+            skips_before = sum(self.name_skips.values())
+            plan = self.build_probe_plan(bucket)
+            skipped = sum(self.name_skips.values()) - skips_before
+            raw = sum(self.expand_group(group, bucket)[1] for group in self.registry.groups)
+            discovery = (self.aws_strategy == 'discover' and 'aws' in self.registry and valid_s3_name(bucket.lower())
+                         and not self.s3_region_cache.get(bucket))
+            total += len(plan) + discovery
+            print(f"\n{Colors.SUBHEADER}BUCKET: {bucket}{Colors.RESET} "
+                  f"({len(plan) + discovery} requisições, {raw - len(plan) - skipped} duplicadas removidas, "
+                  f"{skipped} inválidas para o provedor)")
+            if discovery:
+                print(f"  [aws/discovery] HEAD {self.s3_discovery_url(bucket)} (URLs AWS dependem da região descoberta)")
+            for probe in plan:
+                print(f"  [{probe.provider}/{probe.variant}] {probe.url}{' (advanced)' if probe.tag == 'advanced' else ''}")
+        
+        print(f"\n{Colors.HEADER}Total planejado: {total} requisições para {count} buckets{Colors.RESET}")
+        name_skips = self.name_skip_counts()
+        if name_skips:
+            skipped = ', '.join(f'{provider}: {count}' for provider, count in name_skips.items())
+            print(f"{Colors.INFO}Probes evitados (nome inválido no provedor): {skipped}{Colors.RESET}")
+        return total
     
     def test_advanced_aws_methods(self, bucket: str) -> List[Dict[str, Any]]:
         """Testes avançados específicos para AWS S3"""
-        tests = []
-        
-        # Teste de website endpoints
-        regions = ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1']
-        for region in regions:
-            # Website endpoint format
-            website_url = f'http://{bucket}.s3-website-{region}.amazonaws.com'
-            tests.append(self.test_http_endpoint(website_url))
-            
-            # Alternative website format
-            alt_website_url = f'http://{bucket}.s3-website.{region}.amazonaws.com'
-            tests.append(self.test_http_endpoint(alt_website_url))
-            
-            # Transfer acceleration endpoint
-            accel_url = f'https://{bucket}.s3-accelerate.amazonaws.com'
-            tests.append(self.test_http_endpoint(accel_url))
-            
-            # Dual-stack endpoint
-            dual_stack_url = f'https://{bucket}.s3.dualstack.{region}.amazonaws.com'
-            tests.append(self.test_http_endpoint(dual_stack_url))
-        
-        return tests
+        return [self.test_http_endpoint(url) for url in self.generate_urls(bucket, 'advanced', 'aws')]
     
     def test_advanced_gcp_methods(self, bucket: str) -> List[Dict[str, Any]]:
         """Testes avançados específicos para Google Cloud Storage"""
-        tests = []
-        
-        # XML API endpoints
-        xml_urls = [
-            f'https://storage.googleapis.com/{bucket}?list-type=2',
-            f'https://storage.googleapis.com/{bucket}?delimiter=%2F',
-            f'https://{bucket}.storage.googleapis.com/?list-type=2',
-        ]
-        
-        for url in xml_urls:
-            tests.append(self.test_http_endpoint(url))
-        
-        # JSON API endpoints
-        json_urls = [
-            f'https://www.googleapis.com/storage/v1/b/{bucket}',
-            f'https://www.googleapis.com/storage/v1/b/{bucket}/o',
-            f'https://storage.googleapis.com/storage/v1/b/{bucket}',
-        ]
-        
-        for url in json_urls:
-            tests.append(self.test_http_endpoint(url))
-        
-        return tests
+        return [self.test_http_endpoint(url) for url in self.generate_urls(bucket, 'advanced', 'gcp')]
     
     def test_advanced_azure_methods(self, bucket: str) -> List[Dict[str, Any]]:
         """Testes avançados específicos para Azure Storage"""
-        tests = []
-        
-        # REST API endpoints
-        rest_urls = [
-            f'https://{bucket}.blob.core.windows.net/?restype=container&comp=list&include=metadata',
-            f'https://{bucket}.blob.core.windows.net/?restype=service&comp=properties',
-            f'https://{bucket}.file.core.windows.net/',
-            f'https://{bucket}.table.core.windows.net/',
-            f'https://{bucket}.queue.core.windows.net/',
-        ]
-        
-        for url in rest_urls:
-            tests.append(self.test_http_endpoint(url))
-        
-        # CDN endpoints
-        cdn_regions = ['akamai', 'verizon']
-        for cdn in cdn_regions:
-            cdn_url = f'https://{bucket}.azureedge.net/'
-            tests.append(self.test_http_endpoint(cdn_url))
-        
-        return tests
+        return [self.test_http_endpoint(url) for url in self.generate_urls(bucket, 'advanced', 'azure')]
     
     def sort_results_by_status(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Ordena resultados por status code (200s primeiro, depois outros)"""
@@ -504,283 +2837,261 @@ class CloudBucketTester:
         """Filtra resultados por status codes específicos"""
         return [r for r in results if r.get('status_code') in status_codes]
     
-    def test_bucket_comprehensive(self, bucket: str, verbose: bool = False, status_filter: Optional[List[int]] = None, no_cli: bool = False) -> Dict[str, Any]:
-        """Testa um bucket de forma abrangente"""
-        if verbose:
-            print(f"\n{Colors.HEADER}Testando bucket: {bucket}{Colors.RESET}")
-        
-        bucket_results = {
+    def status_color(self, status: int) -> str:
+        """Cor padronizada para um status code"""
+        if 200 <= status < 300:
+            return Colors.SUCCESS
+        if 300 <= status < 500:
+            return Colors.WARNING
+        return Colors.ERROR
+    
+    def print_probe_result(self, result: Dict[str, Any]):
+        """Exibe um resultado HTTP acessível (modo verboso)"""
+        status = result['status_code']
+        time_ms = int(result['response_time'] * 1000)
+        color = self.status_color(status)
+        print(f"{color}[{status}] {result['url']} ({time_ms}ms){Colors.RESET}")
+    
+    def new_bucket_results(self, bucket: str) -> Dict[str, Any]:
+        """Estrutura vazia de resultados de um bucket"""
+        return {
             'bucket': bucket,
             'timestamp': time.time(),
             'http_tests': [],
             'cli_tests': [],
             'advanced_tests': []
         }
+    
+    def finalize_bucket_results(self, bucket_results: Dict[str, Any], status_filter: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Ordena e filtra os resultados HTTP de um bucket"""
+        # Ordena resultados por status code
+        bucket_results['http_tests'] = self.sort_results_by_status(bucket_results['http_tests'])
+        bucket_results['advanced_tests'] = self.sort_results_by_status(bucket_results['advanced_tests'])
+        
+        # Forma compacta: templates de URL internados e cabeçalhos completos apenas nos achados
+        for test in chain(bucket_results['http_tests'], bucket_results['advanced_tests']):
+            test.compact(bucket_results['bucket'], self.header_allowlist)
+        
+        # Aplica filtro de status codes se especificado
+        if status_filter:
+            bucket_results['http_tests'] = self.filter_by_status_codes(bucket_results['http_tests'], status_filter)
+            bucket_results['advanced_tests'] = self.filter_by_status_codes(bucket_results['advanced_tests'], status_filter)
         
-        # Testa URLs HTTP
-        urls = self.generate_all_urls(bucket)
+        return bucket_results
+    
+    def submit_cli_tests(self, executor: ThreadPoolExecutor, bucket: str) -> List[tuple]:
+        """Dispara os testes de listagem (AWS, GCP e Azure) em paralelo; retorna pares (rótulo, future)"""
+        if self.cli_mode == 'native':
+            tests = [
+                ('aws', 'S3 ListObjectsV2 (assinado)', self.native_s3_list, (bucket, True)),
+                ('aws', 'S3 ListObjectsV2 (anônimo)', self.native_s3_list, (bucket,)),
+                ('gcp', 'GCS list (anônimo)', self.native_gcs_list, (bucket,)),
+                ('azure', 'Azure container list (anônimo)', self.native_azure_list, (bucket,)),
+            ]
+        else:
+            tests = [
+                ('aws', 'AWS CLI (autenticado)', self.test_aws_cli, (bucket,)),
+                ('aws', 'AWS CLI (público)', self.test_aws_cli, (bucket, True)),
+                ('gcp', 'GCP CLI', self.test_gcp_cli, (bucket,)),
+                ('azure', 'Azure CLI', self.test_azure_cli, (bucket,)),
+            ]
+        # Apenas provedores selecionados em --providers
+        return [(label, executor.submit(test, *args)) for provider, label, test, args in tests if provider in self.registry]
+    
+    def collect_cli_tests(self, pending: List[tuple], verbose: bool = False) -> List[Dict[str, Any]]:
+        """Aguarda os testes de CLI disparados por submit_cli_tests"""
         if verbose:
-            print(f"{Colors.INFO}Testando {len(urls)} URLs HTTP...{Colors.RESET}")
+            print(f"\n{Colors.SUBHEADER}Testes de CLI...{Colors.RESET}")
         
-        with ThreadPoolExecutor(max_workers=self.workers) as executor:
-            future_to_url = {
-                executor.submit(self.test_http_endpoint, url): url 
-                for url in urls
-            }
+        cli_tests = []
+        for label, future in pending:
+            test = future.result()
+            cli_tests.append(test)
             
-            for future in as_completed(future_to_url):
-                result = future.result()
-                bucket_results['http_tests'].append(result)
-                
-                if verbose and result['accessible']:
-                    status = result['status_code']
-                    time_ms = int(result['response_time'] * 1000)
-                    
-                    if status == 200:
-                        color = Colors.SUCCESS
-                    elif 200 <= status < 300:
-                        color = Colors.SUCCESS
-                    elif 300 <= status < 400:
-                        color = Colors.WARNING
-                    elif 400 <= status < 500:
-                        color = Colors.WARNING
-                    else:
-                        color = Colors.ERROR
-                    
-                    print(f"{color}[{status}] {result['url']} ({time_ms}ms){Colors.RESET}")
+            if verbose:
+                if test['success']:
+                    print(f"{Colors.SUCCESS}{label}: OK{Colors.RESET}")
+                else:
+                    print(f"{Colors.ERROR}{label}: ERRO{Colors.RESET}")
         
-        # Testes avançados específicos por provedor
+        return cli_tests
+    
+    def test_bucket_comprehensive(self, bucket: str, verbose: bool = False, status_filter: Optional[List[int]] = None, no_cli: bool = False) -> Dict[str, Any]:
+        """Testa um bucket de forma abrangente"""
         if verbose:
-            print(f"\n{Colors.SUBHEADER}Executando testes avançados...{Colors.RESET}")
+            print(f"\n{Colors.HEADER}Testando bucket: {bucket}{Colors.RESET}")
         
-        # Testes avançados AWS
-        aws_advanced = self.test_advanced_aws_methods(bucket)
-        bucket_results['advanced_tests'].extend(aws_advanced)
+        bucket_results = self.new_bucket_results(bucket)
         
-        # Testes avançados GCP
-        gcp_advanced = self.test_advanced_gcp_methods(bucket)
-        bucket_results['advanced_tests'].extend(gcp_advanced)
+        # CLI roda em paralelo com a fase HTTP (apenas se não for especificado --no-cli)
+        cli_executor = None
+        cli_pending = []
+        if not no_cli:
+            cli_executor = ThreadPoolExecutor(max_workers=4)
+            cli_pending = self.submit_cli_tests(cli_executor, bucket)
         
-        # Testes avançados Azure
-        azure_advanced = self.test_advanced_azure_methods(bucket)
-        bucket_results['advanced_tests'].extend(azure_advanced)
+        # Descoberta de região do S3 antes de montar o plano
+        discovery = self.discover_s3_region(bucket)
+        if discovery is not None:
+            bucket_results['http_tests'].append(discovery)
         
-        # Ordena resultados por status code
-        bucket_results['http_tests'] = self.sort_results_by_status(bucket_results['http_tests'])
-        bucket_results['advanced_tests'] = self.sort_results_by_status(bucket_results['advanced_tests'])
+        # URLs padrão e avançadas compartilham a mesma fila de trabalho
+        try:
+            plan = self.build_probe_plan(bucket)
+        finally:
+            self.release_discovery(bucket)
+        plan = self.serve_cached_probes(plan, bucket_results, verbose)
+        cutoff = self.new_cutoff(status_filter)
+        plan = self.apply_cutoff(cutoff, bucket_results, plan)
+        if verbose:
+            print(f"{Colors.INFO}Testando {len(plan)} URLs HTTP...{Colors.RESET}")
         
-        # Aplica filtro de status codes se especificado
-        if status_filter:
-            bucket_results['http_tests'] = self.filter_by_status_codes(bucket_results['http_tests'], status_filter)
-            bucket_results['advanced_tests'] = self.filter_by_status_codes(bucket_results['advanced_tests'], status_filter)
+        self.prefetch_dns(plan)
         
-        # Testa CLI apenas se não for especificado --no-cli
-        if not no_cli:
-            # Testa AWS CLI
-            if verbose:
-                print(f"\n{Colors.SUBHEADER}Testando AWS CLI...{Colors.RESET}")
-            
-            aws_test = self.test_aws_cli(bucket)
-            bucket_results['cli_tests'].append(aws_test)
-            
-            aws_no_sign_test = self.test_aws_cli(bucket, no_sign_request=True)
-            bucket_results['cli_tests'].append(aws_no_sign_test)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            future_to_probe = {
+                executor.submit(self.run_probe, probe): probe
+                for probe in plan
+            }
             
-            if verbose:
-                if aws_test['success']:
-                    print(f"{Colors.SUCCESS}AWS CLI (autenticado): OK{Colors.RESET}")
-                else:
-                    print(f"{Colors.ERROR}AWS CLI (autenticado): ERRO{Colors.RESET}")
+            for future in as_completed(future_to_probe):
+                if future.cancelled():
+                    continue
+                probe = future_to_probe[future]
+                result = future.result()
+                bucket_results[f'{probe.tag}_tests'].append(result)
                 
-                if aws_no_sign_test['success']:
-                    print(f"{Colors.SUCCESS}AWS CLI (público): OK{Colors.RESET}")
-                else:
-                    print(f"{Colors.ERROR}AWS CLI (público): ERRO{Colors.RESET}")
-            
-            # Testa GCP CLI
-            if verbose:
-                print(f"\n{Colors.SUBHEADER}Testando Google Cloud CLI...{Colors.RESET}")
-            
-            gcp_test = self.test_gcp_cli(bucket)
-            bucket_results['cli_tests'].append(gcp_test)
-            
-            if verbose:
-                if gcp_test['success']:
-                    print(f"{Colors.SUCCESS}GCP CLI: OK{Colors.RESET}")
-                else:
-                    print(f"{Colors.ERROR}GCP CLI: ERRO{Colors.RESET}")
-            
-            # Testa Azure CLI
-            if verbose:
-                print(f"\n{Colors.SUBHEADER}Testando Azure CLI...{Colors.RESET}")
-            
-            azure_test = self.test_azure_cli(bucket)
-            bucket_results['cli_tests'].append(azure_test)
-            
-            if verbose:
-                if azure_test['success']:
-                    print(f"{Colors.SUCCESS}Azure CLI: OK{Colors.RESET}")
-                else:
-                    print(f"{Colors.ERROR}Azure CLI: ERRO{Colors.RESET}")
+                if verbose and result['accessible']:
+                    self.print_probe_result(result)
+                
+                # Achado confirmado (ou bucket inexistente): cancela o que ainda está na fila
+                if cutoff is not None and cutoff.observe(probe.provider, result):
+                    self.record_cancelled(sum(pending.cancel() for pending, queued in future_to_probe.items()
+                                              if not pending.done() and not cutoff.allows(queued.provider)))
+        
+        self.finalize_bucket_results(bucket_results, status_filter)
+        
+        if cli_executor is not None:
+            bucket_results['cli_tests'].extend(self.collect_cli_tests(cli_pending, verbose))
+            cli_executor.shutdown()
         
         return bucket_results
     
-    def test_buckets(self, buckets: List[str], verbose: bool = False, status_filter: Optional[List[int]] = None, no_cli: bool = False) -> List[Dict[str, Any]]:
-        """Testa uma lista de buckets"""
-        results = []
+    def print_bucket_summary(self, tally: Dict[str, Any]):
+        """Exibe o resumo de um bucket (modo não verboso) a partir do tally do ReportAggregator"""
+        # Mostra apenas resultados positivos
+        total_accessible = tally['http'][0] + tally['advanced'][0]
         
-        for i, bucket in enumerate(buckets, 1):
-            if not verbose:
-                print(f"{Colors.INFO}[{i}/{len(buckets)}] {bucket}{Colors.RESET}", end=' ')
-            
-            result = self.test_bucket_comprehensive(bucket, verbose, status_filter, no_cli)
-            results.append(result)
+        if total_accessible > 0 or tally['cli']:
+            print(f"{Colors.SUCCESS}FOUND{Colors.RESET}")
             
-            if not verbose:
-                # Mostra apenas resultados positivos
-                accessible_urls = [t for t in result['http_tests'] if t['accessible']]
-                advanced_accessible = [t for t in result.get('advanced_tests', []) if t['accessible']]
-                successful_cli = [t for t in result['cli_tests'] if t['success']]
-                
-                total_accessible = len(accessible_urls) + len(advanced_accessible)
-                
-                if total_accessible > 0 or successful_cli:
-                    print(f"{Colors.SUCCESS}FOUND{Colors.RESET}")
-                    
-                    # Mostra URLs HTTP regulares
-                    for test in accessible_urls[:2]:  # Mostra apenas os 2 primeiros
-                        status = test['status_code']
-                        if status == 200:
-                            color = Colors.SUCCESS
-                        elif 200 <= status < 300:
-                            color = Colors.SUCCESS
-                        elif 300 <= status < 400:
-                            color = Colors.WARNING
-                        else:
-                            color = Colors.WARNING
-                        print(f"  {color}[{status}] {test['url']}{Colors.RESET}")
-                    
-                    # Mostra URLs avançadas
-                    for test in advanced_accessible[:2]:  # Mostra apenas os 2 primeiros
-                        status = test['status_code']
-                        if status == 200:
-                            color = Colors.SUCCESS
-                        elif 200 <= status < 300:
-                            color = Colors.SUCCESS
-                        elif 300 <= status < 400:
-                            color = Colors.WARNING
-                        else:
-                            color = Colors.WARNING
-                        print(f"  {color}[{status}] {test['url']} (advanced){Colors.RESET}")
-                    
-                    if total_accessible > 4:
-                        print(f"  {Colors.INFO}... e mais {total_accessible - 4} URLs{Colors.RESET}")
-                    
-                    for test in successful_cli:
-                        print(f"  {Colors.SUCCESS}CLI: {test['command']}{Colors.RESET}")
-                else:
-                    print(f"{Colors.ERROR}NONE{Colors.RESET}")
-        
-        return results
-    
-    def generate_report(self, results: List[Dict[str, Any]]) -> str:
-        """Gera relatório resumido dos resultados"""
-        total_buckets = len(results)
-        accessible_buckets = 0
-        total_accessible_urls = 0
-        total_advanced_urls = 0
-        total_successful_cli = 0
-        
-        report = f"\n{Colors.HEADER}{'='*60}\n"
-        report += f"              RELATÓRIO DE RESULTADOS v3.0\n"
-        report += f"{'='*60}{Colors.RESET}\n"
-        
-        for result in results:
-            bucket = result['bucket']
-            accessible_urls = [t for t in result['http_tests'] if t['accessible']]
-            advanced_urls = [t for t in result.get('advanced_tests', []) if t['accessible']]
-            successful_cli = [t for t in result['cli_tests'] if t['success']]
+            # Primeiras URLs HTTP regulares e avançadas
+            for kind, suffix in (('http', ''), ('advanced', ' (advanced)')):
+                for status, url in tally[kind][2]:
+                    print(f"  {self.status_color(status)}[{status}] {url}{suffix}{Colors.RESET}")
             
-            total_accessible = len(accessible_urls) + len(advanced_urls)
+            if total_accessible > 2 * SUMMARY_SAMPLES:
+                print(f"  {Colors.INFO}... e mais {total_accessible - 2 * SUMMARY_SAMPLES} URLs{Colors.RESET}")
             
-            if total_accessible > 0 or successful_cli:
-                accessible_buckets += 1
-                total_accessible_urls += len(accessible_urls)
-                total_advanced_urls += len(advanced_urls)
-                total_successful_cli += len(successful_cli)
-                
-                report += f"\n{Colors.SUBHEADER}BUCKET: {bucket}{Colors.RESET}\n"
-                
-                if accessible_urls:
-                    report += f"   {Colors.INFO}URLs padrão encontradas ({len(accessible_urls)}){Colors.RESET}:\n"
-                    # Agrupa por status code
-                    status_groups = {}
-                    for test in accessible_urls:
-                        status = test['status_code']
-                        if status not in status_groups:
-                            status_groups[status] = []
-                        status_groups[status].append(test)
-                    
-                    for status in sorted(status_groups.keys()):
-                        tests = status_groups[status]
-                        if status == 200:
-                            color = Colors.SUCCESS
-                        elif 200 <= status < 300:
-                            color = Colors.SUCCESS
-                        elif 300 <= status < 400:
-                            color = Colors.WARNING
-                        else:
-                            color = Colors.WARNING
-                        
-                        report += f"     {color}[{status}] ({len(tests)} URLs){Colors.RESET}\n"
-                        for test in tests[:3]:  # Mostra apenas os 3 primeiros de cada status
-                            report += f"       {test['url']}\n"
-                        if len(tests) > 3:
-                            report += f"       ... e mais {len(tests) - 3} URLs\n"
-                
-                if advanced_urls:
-                    report += f"   {Colors.INFO}URLs avançadas encontradas ({len(advanced_urls)}){Colors.RESET}:\n"
-                    # Agrupa por status code
-                    status_groups = {}
-                    for test in advanced_urls:
-                        status = test['status_code']
-                        if status not in status_groups:
-                            status_groups[status] = []
-                        status_groups[status].append(test)
-                    
-                    for status in sorted(status_groups.keys()):
-                        tests = status_groups[status]
-                        if status == 200:
-                            color = Colors.SUCCESS
-                        elif 200 <= status < 300:
-                            color = Colors.SUCCESS
-                        elif 300 <= status < 400:
-                            color = Colors.WARNING
-                        else:
-                            color = Colors.WARNING
-                        
-                        report += f"     {color}[{status}] ({len(tests)} URLs){Colors.RESET}\n"
-                        for test in tests[:3]:  # Mostra apenas os 3 primeiros de cada status
-                            report += f"       {test['url']}\n"
-                        if len(tests) > 3:
-                            report += f"       ... e mais {len(tests) - 3} URLs\n"
-                
-                if successful_cli:
-                    report += f"   {Colors.INFO}CLI comandos ({len(successful_cli)}){Colors.RESET}:\n"
-                    for test in successful_cli:
-                        report += f"     {Colors.SUCCESS}{test['command']}{Colors.RESET}\n"
+            for command in tally['cli']:
+                print(f"  {Colors.SUCCESS}CLI: {command}{Colors.RESET}")
+        else:
+            print(f"{Colors.ERROR}NONE{Colors.RESET}")
+    
+    def test_buckets(self, buckets: Iterable[str], verbose: bool = False, status_filter: Optional[List[int]] = None, no_cli: bool = False,
+                     journal: Optional[ScanJournal] = None, writer: Optional[NDJSONResultWriter] = None,
+                     quiet: bool = False, report: Optional[ReportAggregator] = None) -> List[Dict[str, Any]]:
+        """Testa uma lista de buckets (com writer, nada fica em memória: o relatório vem de self.report);
+        com report, o agregador do chamador é usado e self.report não muda (jobs simultâneos do serve)"""
+        total = progress_total(buckets)
         
-        report += f"\n{Colors.HEADER}ESTATÍSTICAS{Colors.RESET}:\n"
-        report += f"   Buckets testados: {Colors.BOLD}{total_buckets}{Colors.RESET}\n"
-        report += f"   Buckets encontrados: {Colors.SUCCESS}{accessible_buckets}{Colors.RESET}\n"
-        report += f"   URLs padrão acessíveis: {Colors.SUCCESS}{total_accessible_urls}{Colors.RESET}\n"
-        report += f"   URLs avançadas acessíveis: {Colors.SUCCESS}{total_advanced_urls}{Colors.RESET}\n"
-        report += f"   CLI sucessos: {Colors.SUCCESS}{total_successful_cli}{Colors.RESET}\n"
+        def progress(count: int, tally: Dict[str, Any]):
+            print(f"{Colors.INFO}[{count}{total}] {tally['bucket']}{Colors.RESET}", end=' ')
+            self.print_bucket_summary(tally)
         
-        if accessible_buckets == 0:
-            report += f"\n{Colors.ERROR}Nenhum bucket acessível encontrado.{Colors.RESET}\n"
+        if report is None:
+            report = self.report = ReportAggregator()
+        collector = ResultCollector(journal, writer, progress=None if verbose or quiet else progress,
+                                    metrics=self.metrics, report=report)
+        if self.processes > 1:
+            self.process_pool = ProcessScanPool(self.options, self.processes)
+            self.process_pool.run(buckets, collector, verbose, status_filter, no_cli)
+            return collector.results()
+        if self.engine == 'async':
+            engine = AsyncScanEngine(self, concurrency=self.concurrency, per_host=self.per_host)
+            asyncio.run(engine.run(buckets, collector, verbose, status_filter, no_cli))
+            return collector.results()
         
-        return report
+        completed = journal.completed if journal else {}
+        
+        for i, bucket in enumerate(buckets, 1):
+            if bucket in completed:
+                # Retomada: reaproveita o resultado gravado no journal
+                collector.add(i, completed[bucket], journaled=True)
+                continue
+            
+            result = self.test_bucket_comprehensive(bucket, verbose, status_filter, no_cli)
+            collector.add(i, result)
+        
+        return collector.results()
+    
+    def generate_report(self, report: Optional[Any] = None, total_buckets: Optional[int] = None) -> str:
+        """Gera relatório resumido a partir do agregador (padrão: o do último test_buckets);
+        aceita também a lista de resultados, como nas versões anteriores"""
+        if report is not None and not isinstance(report, ReportAggregator):
+            results = list(report)
+            report = ReportAggregator.from_results(results)
+            total_buckets = len(results) if total_buckets is None else total_buckets
+        return ''.join(self.iter_report(report, total_buckets))
+    
+    def print_report(self, report: Optional[ReportAggregator] = None, total_buckets: Optional[int] = None):
+        """Exibe o relatório bloco a bloco, sem montá-lo inteiro em memória"""
+        for part in self.iter_report(report, total_buckets):
+            sys.stdout.write(part)
+        sys.stdout.write('\n')
+    
+    def iter_report(self, report: Optional[ReportAggregator] = None, total_buckets: Optional[int] = None) -> Iterator[str]:
+        """Relatório em partes, com as notas do tester (nomes inválidos, probes cancelados)"""
+        report = report or self.report
+        notes = []
+        name_skips = self.name_skip_counts()
+        if name_skips:
+            skipped = ', '.join(f'{provider}: {count}' for provider, count in name_skips.items())
+            notes.append(f"   Probes evitados (nome inválido no provedor): {Colors.INFO}{skipped}{Colors.RESET}\n")
+        cancelled = self.cancelled_probe_count()
+        if cancelled:
+            notes.append(f"   Probes cancelados (--first-hit / --status): {Colors.INFO}{cancelled}{Colors.RESET}\n")
+        return report.iter_render(total_buckets, notes)
+    
+    def close(self):
+        """Libera conexões e threads compartilhadas"""
+        self.http.close()
+        self.s3_region_cache.save()
+        if self.resolver is not None:
+            self.resolver.close()
+        if self.probe_cache is not None:
+            self.probe_cache.close()
+    
+    def build_metadata(self, total_buckets: int) -> Dict[str, Any]:
+        """Metadados do scan gravados junto com os resultados"""
+        return {
+            'version': '3.0',
+            'timestamp': datetime.now().isoformat(),
+            'total_buckets': total_buckets,
+            'tool': 'CloudSniff',
+            'engine': self.engine,
+            'connection_pool': self.http.stats.snapshot(),
+            'dns': self.resolver.stats() if self.resolver else None,
+            'host_health': self.host_health.stats() if self.host_health else None,
+            'rate_limit': self.rate_limiter.stats() if self.rate_limiter else None,
+            'probe_cache': self.probe_cache.stats() if self.probe_cache else None,
+            'latency': self.metrics.summary(),
+            'name_skips': self.name_skip_counts(),
+            'cancelled_probes': self.cancelled_probe_count(),
+            'concurrency_budget': self.budget.stats() if self.budget else None,
+            'shard': self.shard,
+            'processes': self.process_pool.metadata if self.process_pool else None
+        }
     
     def save_results(self, results: List[Dict[str, Any]], filename: Optional[str] = None):
         """Salva resultados em arquivo JSON com timestamp automático"""
@@ -790,29 +3101,529 @@ class CloudBucketTester:
         
         # Adiciona metadados ao resultado
         output_data = {
-            'metadata': {
-                'version': '3.0',
-                'timestamp': datetime.now().isoformat(),
-                'total_buckets': len(results),
-                'tool': 'CloudSniff'
-            },
+            'metadata': self.build_metadata(len(results)),
             'results': results
         }
         
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+            json.dump(output_data, f, indent=2, ensure_ascii=False, default=json_default)
         print(f"\n{Colors.INFO}Resultados salvos em: {filename}{Colors.RESET}")
 
+class AsyncScanEngine:
+    """Engine asyncio: mantém milhares de probes em voo entre todos os buckets"""
+    def __init__(self, tester: CloudBucketTester, concurrency: int = 1000, per_host: int = 15):
+        if aiohttp is None:
+            raise RuntimeError("--engine async requer o pacote aiohttp (pip3 install aiohttp)")
+        self.tester = tester
+        self.concurrency = concurrency
+        self.per_host = per_host
+    
+    async def test_http_endpoint(self, session, url: str, method: str = 'GET') -> ProbeResult:
+        """Versão assíncrona de CloudBucketTester.test_http_endpoint (mesmo formato de resultado)"""
+        cached = self.tester.host_health_result(url, method)
+        if cached is not None:
+            return cached
+        
+        limiter = self.tester.rate_limiter
+        host = urlparse(url).netloc.lower()
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire_async(host)
+            result = await self.send_probe(session, url, method)
+            delay = self.tester.throttle_delay(result, attempt)
+            if limiter is not None:
+                throttled = result['status_code'] in THROTTLE_STATUS
+                limiter.release(host, throttled, delay if throttled else None)
+            if delay is None:
+                return self.tester.finish_throttled(result, attempt)
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    async def send_probe(self, session, url: str, method: str = 'GET') -> ProbeResult:
+        """Uma única tentativa de requisição (aiohttp); a espera na fila do connector não entra nos tempos"""
+        method, extra_headers, stream = self.tester.probe_request(method)
+        marks = {}
+        start = time.perf_counter()
+        try:
+            async with session.request(method, url, allow_redirects=True, headers=extra_headers,
+                                       trace_request_ctx=marks) as response:
+                # Como no engine threads: do início da conexão (ou do reuso) até os cabeçalhos
+                response_time = time.perf_counter() - start - self.queue_wait(marks)
+                read, exhausted = 0, True
+                if stream:
+                    # Para de ler após --max-body bytes
+                    while read < self.tester.max_body:
+                        chunk = await response.content.read(self.tester.max_body - read)
+                        if not chunk:
+                            break
+                        read += len(chunk)
+                    exhausted = response.content.at_eof()
+                elif method != 'HEAD':
+                    read = len(await response.read())
+                
+                total = time.perf_counter() - start - self.queue_wait(marks)
+                return self.tester.probe_result(url, method, response.status, response.headers, read, exhausted,
+                                                response_time, ranged='Range' in extra_headers,
+                                                timings=self.phase_timings(marks, response_time, total))
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            if isinstance(e, aiohttp.ClientConnectorError):
+                failed_url = url
+                if e.host != urlparse(url).hostname:  # Falha em um redirecionamento
+                    failed_url = f'{"https" if e.port == 443 else "http"}://{e.host}:{e.port}/'
+                self.tester.record_host_failure(failed_url, e)
+            return probe_error_result(url, method, str(e) or type(e).__name__,
+                                      time.perf_counter() - start - self.queue_wait(marks))
+    
+    @staticmethod
+    def queue_wait(marks: Dict[str, float]) -> float:
+        """Tempo aguardando uma vaga no connector (limite global/por host do --engine async)"""
+        if 'connection_queued_start' not in marks:
+            return 0.0
+        return marks.get('connection_queued_end', time.perf_counter()) - marks['connection_queued_start']
+    
+    @staticmethod
+    def trace_config() -> 'aiohttp.TraceConfig':
+        """Marca a fila do connector, a resolução DNS e a criação de conexões em trace_request_ctx"""
+        config = aiohttp.TraceConfig()
+        
+        def mark(name: str):
+            async def callback(session, context, params):
+                context.trace_request_ctx.setdefault(name, time.perf_counter())
+            return callback
+        
+        for signal_name in ('connection_queued_start', 'connection_queued_end',
+                            'dns_resolvehost_start', 'dns_resolvehost_end',
+                            'connection_create_start', 'connection_create_end'):
+            getattr(config, f'on_{signal_name}').append(mark(signal_name))
+        return config
+    
+    @staticmethod
+    def phase_timings(marks: Dict[str, float], headers: float, total: float) -> tuple:
+        """Fases a partir das marcas do trace; no aiohttp o handshake TLS fica dentro de connect"""
+        dns = marks.get('dns_resolvehost_end', 0.0) - marks.get('dns_resolvehost_start', 0.0)
+        connect = marks.get('connection_create_end', 0.0) - marks.get('connection_create_start', 0.0)
+        return phase_timings(dns, max(connect - dns, 0.0), None, headers, total)
+    
+    async def test_bucket(self, session, executor: ThreadPoolExecutor, bucket: str, verbose: bool = False,
+                          status_filter: Optional[List[int]] = None, no_cli: bool = False) -> Dict[str, Any]:
+        """Testa um bucket; os probes HTTP entram no pool global de concorrência"""
+        bucket_results = self.tester.new_bucket_results(bucket)
+        
+        cli_pending = [] if no_cli else self.tester.submit_cli_tests(executor, bucket)
+        loop = asyncio.get_running_loop()
+        fresh: List[Tuple[str, ProbeResult]] = []  # Gravados no --cache de uma vez, fora do event loop
+        
+        async def run_probe(probe: Probe):
+            result = self.tester.dns_failure_result(probe) or await self.test_http_endpoint(session, probe.url)
+            fresh.append((probe.url, result))
+            result['provider'] = probe.provider
+            result['variant'] = probe.variant
+            return probe.tag, result
+        
+        discovery = await loop.run_in_executor(executor, self.tester.discover_s3_region, bucket)
+        if discovery is not None:
+            bucket_results['http_tests'].append(discovery)
+        
+        try:
+            plan = self.tester.build_probe_plan(bucket)
+        finally:
+            self.tester.release_discovery(bucket)
+        if self.tester.probe_cache is not None:
+            # SQLite bloqueia: a consulta roda no executor para não parar os probes em voo
+            plan = await loop.run_in_executor(executor, self.tester.serve_cached_probes, plan, bucket_results, verbose)
+        cutoff = self.tester.new_cutoff(status_filter)
+        plan = self.tester.apply_cutoff(cutoff, bucket_results, plan)
+        if self.tester.resolver is not None:
+            await self.tester.resolver.resolve_many(self.tester.plan_hosts(plan))
+        
+        task_to_probe = {asyncio.ensure_future(run_probe(probe)): probe for probe in plan}
+        pending = set(task_to_probe)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                tag, result = task.result()
+                bucket_results[f'{tag}_tests'].append(result)
+                if verbose and result['accessible']:
+                    self.tester.print_probe_result(result)
+                # Achado confirmado (ou bucket inexistente): cancela inclusive as requisições em voo
+                if cutoff is not None and cutoff.observe(task_to_probe[task].provider, result):
+                    self.tester.record_cancelled(sum(other.cancel() for other in pending
+                                                     if not other.done() and not cutoff.allows(task_to_probe[other].provider)))
+        
+        if fresh and self.tester.probe_cache is not None:
+            await loop.run_in_executor(executor, self.tester.cache_probe_results, fresh)
+        self.tester.finalize_bucket_results(bucket_results, status_filter)
+        
+        if cli_pending:
+            await asyncio.gather(*(asyncio.wrap_future(future) for _, future in cli_pending))
+            bucket_results['cli_tests'].extend(self.tester.collect_cli_tests(cli_pending))
+        
+        return bucket_results
+    
+    async def run(self, buckets: Iterable[str], collector: ResultCollector, verbose: bool = False,
+                  status_filter: Optional[List[int]] = None, no_cli: bool = False):
+        """Testa todos os buckets com limite global e por host de requisições simultâneas"""
+        loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.tester.timeout)
+        # Limita quantos buckets são expandidos ao mesmo tempo para não criar milhões de coroutines
+        bucket_slots = asyncio.Semaphore(max(4, self.concurrency // 50))
+        completed = collector.journal.completed if collector.journal else {}
+        source = iter(buckets)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[self.trace_config()],
+                                         cookie_jar=aiohttp.DummyCookieJar()) as session:
+            # Journal (fsync), writer e progresso rodam em uma thread própria, na ordem de chegada
+            with ThreadPoolExecutor(max_workers=self.tester.workers) as executor, \
+                    ThreadPoolExecutor(max_workers=1, thread_name_prefix='collector') as writer:
+                def add(index: int, result: Dict[str, Any], journaled: bool = False):
+                    return loop.run_in_executor(writer, collector.add, index, result, journaled)
+                
+                async def scan(index: int, bucket: str):
+                    try:
+                        result = await self.test_bucket(session, executor, bucket, verbose, status_filter, no_cli)
+                    finally:
+                        bucket_slots.release()
+                    await add(index, result)
+                    if verbose:
+                        print(f"{Colors.HEADER}Bucket concluído: {bucket}{Colors.RESET}")
+                
+                tasks = set()
+                index = 0
+                while True:
+                    # A fonte pode bloquear (fila/stdin): lê fora do event loop
+                    bucket = await loop.run_in_executor(None, next, source, None)
+                    if bucket is None:
+                        break
+                    if bucket in completed:
+                        await add(index, completed[bucket], journaled=True)
+                    else:
+                        await bucket_slots.acquire()
+                        task = asyncio.ensure_future(scan(index, bucket))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                    index += 1
+                
+                if tasks:
+                    await asyncio.gather(*tasks)
+
+class QueueResultSink:
+    """Writer usado nos processos filhos: envia cada bucket concluído ao processo pai"""
+    def __init__(self, results):
+        self.results = results
+        self.count = 0
+    
+    def write(self, result: Dict[str, Any]):
+        self.results.put(('result', result))
+        self.count += 1
+
+def process_scan_worker(options: Dict[str, Any], tasks, results, verbose: bool = False,
+                        status_filter: Optional[List[int]] = None, no_cli: bool = False):
+    """Processo filho: testa os buckets recebidos pela fila com um tester próprio"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # O Ctrl+C é tratado pelo processo pai
+    tester = build_tester(options)
+    sink = QueueResultSink(results)
+    try:
+        tester.test_buckets(iter(tasks.get, None), verbose=verbose, status_filter=status_filter,
+                            no_cli=no_cli, writer=sink, quiet=True)
+    finally:
+        results.put(('done', tester.build_metadata(sink.count)))
+        tester.close()
+
+class ProcessScanPool:
+    """Distribui os buckets entre processos filhos; journal, writer e relatório ficam no processo pai"""
+    def __init__(self, options: Dict[str, Any], processes: int):
+        self.processes = processes
+        # Cada filho tem seu próprio limitador: a taxa por host é dividida entre eles
+        self.options = dict(options, processes=1, host_rate=options.get('host_rate', 0) / processes)
+        self.metadata: List[Dict[str, Any]] = []
+    
+    def run(self, buckets: Iterable[str], collector: ResultCollector, verbose: bool = False,
+            status_filter: Optional[List[int]] = None, no_cli: bool = False):
+        """Alimenta os filhos sob demanda e registra os resultados na ordem em que terminam"""
+        context = multiprocessing.get_context('spawn')
+        tasks = context.Queue(maxsize=self.processes * 64)
+        results = context.Queue()
+        completed = collector.journal.completed if collector.journal else {}
+        positions: Dict[str, int] = {}
+        errors: List[BaseException] = []
+        
+        def feed():
+            try:
+                for index, bucket in enumerate(buckets):
+                    if bucket in completed:
+                        results.put(('journaled', index, completed[bucket]))
+                        continue
+                    positions[bucket] = index
+                    tasks.put(bucket)  # Bloqueia quando os filhos estão atrasados
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                for _ in range(self.processes):
+                    tasks.put(None)
+        
+        workers = [context.Process(target=process_scan_worker, daemon=True,
+                                   args=(self.options, tasks, results, verbose, status_filter, no_cli))
+                   for _ in range(self.processes)]
+        for worker in workers:
+            worker.start()
+        threading.Thread(target=feed, daemon=True).start()
+        
+        try:
+            while len(self.metadata) < len(workers):
+                try:
+                    message = results.get(timeout=1)
+                except queue.Empty:
+                    if not any(worker.is_alive() for worker in workers):
+                        break  # Filhos encerrados sem avisar (ex.: morte por sinal)
+                    continue
+                if message[0] == 'result':
+                    collector.add(positions.pop(message[1]['bucket']), message[1])
+                elif message[0] == 'journaled':
+                    collector.add(message[1], message[2], journaled=True)
+                else:
+                    self.metadata.append(message[1])
+        finally:
+            for worker in workers:
+                worker.join(timeout=5 if len(self.metadata) == len(workers) else 0)
+                if worker.is_alive():
+                    worker.terminate()
+        
+        if len(self.metadata) < len(workers):
+            print(f"{Colors.WARNING}{len(workers) - len(self.metadata)} processo(s) encerrado(s) inesperadamente; "
+                  f"{len(positions)} bucket(s) sem resultado{Colors.RESET}")
+        if errors:
+            raise errors[0]
+
+def progress_total(buckets: Iterable[str]) -> str:
+    """Sufixo '/N' do progresso quando o total de buckets é conhecido"""
+    return f'/{len(buckets)}' if hasattr(buckets, '__len__') else ''
+
+def open_bucket_source(source: str):
+    """Abre uma fonte de buckets: arquivo texto, .gz, .xz ou '-' para stdin"""
+    if source == '-':
+        return sys.stdin
+    if source.endswith('.gz'):
+        return gzip.open(source, 'rt', encoding='utf-8')
+    if source.endswith('.xz'):
+        return lzma.open(source, 'rt', encoding='utf-8')
+    return open(source, 'r', encoding='utf-8')
+
+def iter_bucket_file(source: str) -> Iterator[str]:
+    """Lê buckets de uma fonte sob demanda, um por linha"""
+    f = open_bucket_source(source)
+    try:
+        for line in f:
+            bucket = line.strip()
+            if bucket and not bucket.startswith('#'):  # Ignora linhas vazias e comentários
+                yield bucket
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+# Nomes distintos previstos no Bloom filter de deduplicação (~18 MB com a taxa padrão)
+DEDUP_CAPACITY = 10000000
+# --list deduplica com um set exato até este número de nomes distintos (~10 MB) e depois passa ao Bloom filter
+DEDUP_EXACT_LIMIT = 100000
+
+def iter_unique(buckets: Iterable[str], new_bloom: Optional[Callable[[], 'BloomFilter']] = None,
+                exact_limit: int = 0) -> Iterator[str]:
+    """Remove duplicatas durante o streaming: set exato até exact_limit nomes distintos; a partir daí,
+    com new_bloom, um Bloom filter (memória constante, falsos positivos raros). Sem new_bloom, sempre exato"""
+    seen = set()
+    bloom = None
+    for bucket in buckets:
+        if bloom is None:
+            if bucket in seen:
+                continue
+            seen.add(bucket)
+            if new_bloom is not None and len(seen) > exact_limit:
+                # O filtro só é alocado quando a fonte passa do limite; os nomes já vistos migram para ele
+                bloom = new_bloom()
+                for name in seen:
+                    bloom.add(name)
+                seen = None
+            yield bucket
+        elif bloom.add(bucket):
+            if bloom.count == bloom.capacity:
+                print(f"{Colors.WARNING}Deduplicação: {bloom.capacity} nomes distintos atingidos; a taxa de falsos "
+                      f"positivos passa a subir (aumente --dedup-capacity){Colors.RESET}", file=sys.stderr)
+            yield bucket
+
+class BloomFilter:
+    """Filtro de Bloom de tamanho fixo: sem falsos negativos, falsos positivos na taxa configurada até a capacidade"""
+    def __init__(self, capacity: int = 10_000_000, error_rate: float = 0.001):
+        if not 0 < error_rate < 1:
+            raise ValueError(f'taxa de falsos positivos inválida: {error_rate} (use 0 < taxa < 1)')
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))  # Bits
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def positions(self, item: str) -> Iterator[int]:
+        # Double hashing (Kirsch-Mitzenmacher) a partir de um único digest de 128 bits
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return ((h1 + i * h2) % size for i in range(self.hashes))
+    
+    def add(self, item: str) -> bool:
+        """Insere o item; False quando ele (provavelmente) já estava no filtro"""
+        bits = self.bits
+        new = False
+        for position in self.positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+    
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+    
+    def stats(self) -> Dict[str, Any]:
+        return {'capacity': self.capacity, 'error_rate': self.error_rate, 'bytes': len(self.bits),
+                'hashes': self.hashes, 'count': self.count}
+
+# Mutações do --permute quando --mutations não é informado
+DEFAULT_MUTATIONS = """
+@env = dev, development, prod, production, stage, staging, test, qa, uat
+@suffix = backup, backups, assets, static, media, files, uploads, data, logs, public, private, cdn, images, www, web
+{keyword}
+{keyword}{sep}{env}
+{env}{sep}{keyword}
+{keyword}{sep}{suffix}
+{suffix}{sep}{keyword}
+{keyword}{sep}{env}{sep}{suffix}
+{keyword}{sep}{suffix}{sep}{env}
+"""
+
+# Sequência de separadores gerada por variáveis vazias
+SEPARATOR_RUN = re.compile(r'[-.]{2,}')
+
+class MutationRules:
+    """Regras de mutação: templates com {keyword} e variáveis (@nome = a, b, ""), pré-expandidas uma vez"""
+    # {sep}: traço, ponto ou nada (pode ser redefinida no arquivo)
+    BUILTIN_VARIABLES = {'sep': ['-', '.', '']}
+    
+    def __init__(self, text: str, source: str = 'mutações'):
+        variables = {name: list(values) for name, values in self.BUILTIN_VARIABLES.items()}
+        rules = []
+        for number, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('@'):
+                name, separator, values = line[1:].partition('=')
+                if not separator or not name.strip().isidentifier():
+                    raise ValueError(f'{source}:{number}: variável inválida (use @nome = valor1, valor2)')
+                variables[name.strip()] = [value.strip().strip('"') for value in values.split(',')]
+            else:
+                rules.append((number, line))
+        
+        self.templates: List[tuple] = []
+        seen = set()
+        formatter = string.Formatter()
+        for number, rule in rules:
+            try:
+                names = sorted({field for _, field, _, _ in formatter.parse(rule) if field} - {'keyword'})
+            except ValueError as e:
+                raise ValueError(f'{source}:{number}: regra inválida: {rule} ({e})')
+            if '{keyword}' not in rule:
+                raise ValueError(f'{source}:{number}: regra sem {{keyword}}: {rule}')
+            unknown = [name for name in names if name not in variables]
+            if unknown:
+                raise ValueError(f"{source}:{number}: variáveis não definidas: {', '.join(unknown)}")
+            # Cada combinação vira um template só com {keyword}: a expansão por palavra é um str.join
+            for combination in product(*(variables[name] for name in names)):
+                parts = rule.format(keyword='{keyword}', **dict(zip(names, combination))).split('{keyword}')
+                # Valores vazios não deixam separadores sobrando ('acme-', 'acme--dev')
+                parts = [SEPARATOR_RUN.sub(lambda match: match.group()[0], part) for part in parts]
+                parts[0] = parts[0].lstrip('-.')
+                parts[-1] = parts[-1].rstrip('-.')
+                parts = tuple(parts)
+                if parts not in seen:
+                    seen.add(parts)
+                    self.templates.append(parts)
+    
+    @classmethod
+    def from_file(cls, filename: str) -> 'MutationRules':
+        with open(filename, 'r', encoding='utf-8') as f:
+            return cls(f.read(), filename)
+    
+    def expand(self, keyword: str) -> Iterator[str]:
+        for parts in self.templates:
+            yield keyword.join(parts)
+
+def iter_permutations(sources: List[str], rules: MutationRules) -> Iterator[str]:
+    """Candidatos do --permute sob demanda: cada palavra-chave combinada com todas as mutações"""
+    for source in sources:
+        for keyword in iter_bucket_file(source):
+            yield from rules.expand(keyword.lower())
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Converte 'i/n' (1 <= i <= n) em (índice, total)"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f'shard inválido: {value} (use i/n, ex.: 1/4)')
+    if not 1 <= index <= count:
+        raise ValueError(f'shard inválido: {value} (i deve estar entre 1 e n)')
+    return index, count
+
+def shard_of(bucket: str, count: int) -> int:
+    """Partição estável (1..count) de um bucket: o mesmo nome cai no mesmo shard em qualquer máquina"""
+    digest = hashlib.sha1(bucket.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+def iter_shard(buckets: Iterable[str], index: int, count: int) -> Iterator[str]:
+    """Mantém apenas os buckets do shard index/count"""
+    for bucket in buckets:
+        if shard_of(bucket, count) == index:
+            yield bucket
+
+class BucketStream:
+    """Fila limitada entre a leitura dos buckets (thread própria) e a engine de probes, com backpressure"""
+    _END = object()
+    
+    def __init__(self, source: Iterable[str], maxsize: int = 10000):
+        self.queue: queue.Queue = queue.Queue(maxsize=max(maxsize, 1))
+        self.produced = 0
+        self._error: Optional[BaseException] = None
+        self._reader = threading.Thread(target=self._read, args=(source,), daemon=True)
+        self._reader.start()
+    
+    def _read(self, source: Iterable[str]):
+        try:
+            for bucket in source:
+                self.queue.put(bucket)  # Bloqueia quando a engine está atrasada
+                self.produced += 1
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.queue.put(self._END)
+    
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            bucket = self.queue.get()
+            if bucket is self._END:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield bucket
+
 def load_buckets_from_file(filename: str) -> List[str]:
     """Carrega lista de buckets de um arquivo TXT"""
-    buckets = []
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            for line in f:
-                bucket = line.strip()
-                if bucket and not bucket.startswith('#'):  # Ignora linhas vazias e comentários
-                    buckets.append(bucket)
-        return buckets
+        return list(iter_bucket_file(filename))
     except FileNotFoundError:
         print(f"{Colors.ERROR}Arquivo não encontrado: {filename}{Colors.RESET}")
         sys.exit(1)
@@ -820,27 +3631,617 @@ def load_buckets_from_file(filename: str) -> List[str]:
         print(f"{Colors.ERROR}Erro ao ler arquivo {filename}: {e}{Colors.RESET}")
         sys.exit(1)
 
-def main():
+class ScanTracer:
+    """Modo --trace: cProfile em todas as threads e amostragem periódica das pilhas (collapsed stacks)"""
+    def __init__(self, prefix: str, interval: float = 0.005, top: int = 15):
+        self.prefix = prefix
+        self.interval = interval
+        self.top = top
+        self.lock = threading.Lock()
+        self.profiles: List[cProfile.Profile] = []
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+    
+    def _profile_thread(self, frame, event, arg):
+        # Hook instalado em cada thread nova: troca a si mesmo por um cProfile próprio da thread
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        profile.enable()
+    
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+    
+    def start(self) -> 'ScanTracer':
+        # O amostrador sobe antes do hook para não entrar no próprio profile
+        self._sampler = threading.Thread(target=self._sample, name='trace-sampler', daemon=True)
+        self._sampler.start()
+        threading.setprofile(self._profile_thread)
+        main = cProfile.Profile()
+        self.profiles.append(main)
+        main.enable()
+        return self
+    
+    def stop(self) -> str:
+        """Grava PREFIX.pstats e PREFIX.collapsed; retorna o resumo das funções mais caras"""
+        self.profiles[0].disable()
+        threading.setprofile(None)
+        self._stopped.set()
+        self._sampler.join()
+        
+        with self.lock:
+            profiles = list(self.profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(f'{self.prefix}.pstats')
+        with open(f'{self.prefix}.collapsed', 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f'{stack} {count}\n')
+        
+        hot = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        summary = f"\n{Colors.HEADER}TRACE: {len(profiles)} threads, {self.samples} amostras{Colors.RESET}\n"
+        summary += f"{Colors.INFO}{'tottime':>9} {'cumtime':>9} {'chamadas':>10}  função{Colors.RESET}\n"
+        for func, (_, calls, tottime, cumtime, _) in hot:
+            summary += f"{tottime:9.3f} {cumtime:9.3f} {calls:10d}  {pstats.func_std_string(func)}\n"
+        summary += f"{Colors.INFO}Profile: {self.prefix}.pstats | Pilhas (flamegraph): {self.prefix}.collapsed{Colors.RESET}"
+        return summary
+
+def build_tester(options: Dict[str, Any]) -> CloudBucketTester:
+    """Cria o tester a partir das opções da CLI (também usado pelos processos filhos)"""
+    resolver = None
+    if not options['no_dns_prefetch']:
+        resolver = DNSResolver(
+            nameserver=DNSResolver.parse_nameserver(options['dns_server']) if options['dns_server'] else None,
+            timeout=min(options['timeout'], 5),
+            negative_ttl=options['dns_negative_ttl']
+        )
+    
+    header_allowlist = tuple(name.strip().lower() for name in options['header_allowlist'].split(',') if name.strip())
+    registry = ProviderRegistry(
+        ProviderRegistry.load(options['provider_file']) if options['provider_file'] else None,
+        selected=[name.strip() for name in options['providers'].split(',') if name.strip()] if options['providers'] else None,
+        regions=[region.strip() for region in options['regions'].split(',') if region.strip()] if options['regions'] else None
+    )
+    tester = CloudBucketTester(
+        timeout=options['timeout'],
+        workers=options['workers'],
+        aws_profile=options['profile'],
+        engine=options['engine'],
+        concurrency=options['concurrency'],
+        per_host=options['per_host'],
+        resolver=resolver,
+        aws_strategy=options['aws_strategy'],
+        s3_region_cache=S3RegionCache(options['s3_region_cache']),
+        host_health=None if options['no_host_cache'] else HostHealthCache(options['host_recheck'], options['host_cache_timeouts']),
+        # Com --status só o código importa: sem --probe-mode explícito, um GET com Range de 1 byte basta
+        probe_mode=options['probe_mode'] or ('range' if options['status'] else 'get'),
+        max_body=1 if options['status'] and not options['probe_mode'] else max(options['max_body'], 1),
+        rate_limiter=None if options['no_rate_limit'] else HostRateLimiter(options['host_rate'], options['per_host'] or options['workers']),
+        max_retries=max(options['max_retries'], 0),
+        processes=max(options['processes'], 1),
+        shard=options['shard'],
+        cli_mode=options['cli_mode'],
+        probe_cache=ProbeCache(options['cache'], options['cache_ttl'], options['cache_negative_ttl'],
+                               options['cache_max_entries'], header_allowlist) if options['cache'] else None,
+        header_allowlist=header_allowlist,
+        registry=registry,
+        first_hit='bucket' if options['first_hit'] else 'provider' if options['first_hit_per_provider'] else None
+    )
+    tester.options = options
+    return tester
+
+def convert_main(argv: List[str]):
+    """Subcomando convert: NDJSON -> JSON agregado"""
+    parser = argparse.ArgumentParser(prog='cloudSniffer.py convert', description='Converte resultados NDJSON para o formato JSON agregado')
+    parser.add_argument('source', help='Arquivo NDJSON gerado com --output-format ndjson')
+    parser.add_argument('--output', '-o', type=str, help='Arquivo JSON de saída (padrão: mesmo nome com .json)')
+    args = parser.parse_args(argv)
+    
+    destination = args.output or os.path.splitext(args.source)[0] + '.json'
+    total = convert_ndjson_to_json(args.source, destination)
+    print(f"{Colors.INFO}{total} buckets convertidos para: {destination}{Colors.RESET}")
+
+def merge_main(argv: List[str]):
+    """Subcomando merge: junta resultados de shards (--shard) ou execuções separadas"""
+    parser = argparse.ArgumentParser(prog='cloudSniffer.py merge', description='Combina arquivos de resultados (JSON ou NDJSON) em um único JSON agregado')
+    parser.add_argument('sources', nargs='+', help='Arquivos de resultados de cada shard (JSON ou NDJSON)')
+    parser.add_argument('--output', '-o', type=str, help='Arquivo JSON de saída (padrão: timestamp automático)')
+    args = parser.parse_args(argv)
+    
+    for source in args.sources:
+        if not os.path.isfile(source):
+            print(f"{Colors.ERROR}Arquivo não encontrado: {source}{Colors.RESET}")
+            sys.exit(1)
+    
+    destination = args.output or f'bucket_test_results_merged_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+    metadata, report = merge_result_files(args.sources, destination)
+    
+    tester = CloudBucketTester()
+    tester.print_report(report, total_buckets=metadata['total_buckets'])
+    tester.close()
+    
+    missing = missing_shards(metadata['merged_from'])
+    if missing:
+        print(f"{Colors.WARNING}Shards ausentes: {', '.join(missing)}{Colors.RESET}")
+    print(f"\n{Colors.INFO}{metadata['total_buckets']} buckets de {len(args.sources)} arquivos combinados em: {destination}{Colors.RESET}")
+
+# Estados de um job do serve
+JOB_FINAL_STATES = ('done', 'failed', 'cancelled')
+
+class ScanJob:
+    """Job do serve: buckets pendentes, estado, resultados (acompanhados pelos streams NDJSON) e relatório"""
+    def __init__(self, job_id: str, buckets: List[str], status_filter: Optional[List[int]] = None, no_cli: bool = False):
+        self.id = job_id
+        self.buckets = buckets
+        self.status_filter = status_filter
+        self.no_cli = no_cli
+        self.state = 'queued'
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancel_requested = False
+        self.results: List[Dict[str, Any]] = []
+        self.report = ReportAggregator()
+        self.count = 0
+        self.changed = threading.Condition()
+    
+    def pending(self) -> Iterator[str]:
+        """Buckets ainda não testados; para de produzir assim que o job é cancelado"""
+        for bucket in self.buckets:
+            if self.cancel_requested:
+                return
+            yield bucket
+    
+    def write(self, result: Dict[str, Any]):
+        """Writer do ResultCollector: guarda o resultado e acorda os streams"""
+        with self.changed:
+            self.results.append(result)
+            self.count += 1
+            self.changed.notify_all()
+    
+    def finish(self, state: str, error: Optional[str] = None):
+        with self.changed:
+            self.state = state
+            self.error = error
+            self.finished = time.time()
+            self.changed.notify_all()
+    
+    def follow(self, offset: int = 0, wait: bool = True) -> Iterator[Dict[str, Any]]:
+        """Resultados a partir de offset; com wait, acompanha o job até ele terminar"""
+        index = offset
+        while True:
+            with self.changed:
+                if wait:
+                    self.changed.wait_for(lambda: index < len(self.results) or self.finished is not None)
+                batch = self.results[index:]
+                ended = self.finished is not None or not wait
+            index += len(batch)
+            yield from batch
+            if ended:
+                return
+    
+    def summary(self, detail: bool = False) -> Dict[str, Any]:
+        def timestamp(value: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(value).isoformat() if value else None
+        
+        summary = {
+            'id': self.id,
+            'state': self.state,
+            'error': self.error,
+            'buckets': len(self.buckets),
+            'completed': self.count,
+            'found': self.report.found,
+            'created': timestamp(self.created),
+            'started': timestamp(self.started),
+            'finished': timestamp(self.finished)
+        }
+        if detail:
+            summary['status_filter'] = self.status_filter
+            summary['no_cli'] = self.no_cli
+            summary['report'] = self.report.stats()
+        return summary
+
+class ScanService:
+    """Mantém um CloudBucketTester aquecido (pools, DNS, saúde de hosts) e executa os jobs da API"""
+    def __init__(self, tester: CloudBucketTester, max_jobs: int = 4, keep_jobs: int = 100,
+                 status_filter: Optional[List[int]] = None, no_cli: bool = False):
+        self.tester = tester
+        self.max_jobs = max_jobs
+        self.keep_jobs = keep_jobs  # Jobs encerrados mantidos em memória (com resultados)
+        self.status_filter = status_filter  # Padrões dos jobs que não informam status/no_cli
+        self.no_cli = no_cli
+        self.started = time.time()
+        self.jobs: Dict[str, ScanJob] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='scan-job')
+    
+    def submit(self, payload: Dict[str, Any]) -> ScanJob:
+        """Cria e enfileira um job a partir do JSON {"buckets": [...], "status": [...], "no_cli": bool}"""
+        buckets = payload.get('buckets')
+        if not isinstance(buckets, list) or not all(isinstance(bucket, str) for bucket in buckets):
+            raise ValueError('"buckets" deve ser uma lista de nomes')
+        buckets = list(iter_unique(bucket.strip() for bucket in buckets if bucket.strip()))
+        if not buckets:
+            raise ValueError('Nenhum bucket informado')
+        
+        status_filter = payload.get('status', self.status_filter)
+        if isinstance(status_filter, str):
+            status_filter = status_filter.split(',')
+        try:
+            status_filter = [int(status) for status in status_filter] if status_filter else None
+        except (TypeError, ValueError):
+            raise ValueError(f"Status codes inválidos: {payload.get('status')}")
+        
+        job = ScanJob(os.urandom(6).hex(), buckets, status_filter, bool(payload.get('no_cli', self.no_cli)))
+        with self.lock:
+            self.prune()
+            self.jobs[job.id] = job
+        self.executor.submit(self.run, job)
+        return job
+    
+    def run(self, job: ScanJob):
+        if job.cancel_requested:
+            job.finish('cancelled')
+            return
+        job.state = 'running'
+        job.started = time.time()
+        try:
+            self.tester.test_buckets(job.pending(), status_filter=job.status_filter, no_cli=job.no_cli,
+                                     writer=job, quiet=True, report=job.report)
+        except Exception as e:
+            job.finish('failed', f'{type(e).__name__}: {e}')
+            return
+        job.finish('cancelled' if job.cancel_requested and job.count < len(job.buckets) else 'done')
+    
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+    
+    def cancel(self, job_id: str) -> Optional[ScanJob]:
+        """Cancela um job: o bucket em andamento termina, os pendentes não são testados"""
+        job = self.get(job_id)
+        if job is not None and job.state not in JOB_FINAL_STATES:
+            job.cancel_requested = True
+        return job
+    
+    def prune(self):
+        """Descarta os jobs encerrados mais antigos além de keep_jobs (chamado com o lock)"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in JOB_FINAL_STATES]
+        for job_id in finished[:max(0, len(finished) - self.keep_jobs + 1)]:
+            del self.jobs[job_id]
+    
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            jobs = list(self.jobs.values())
+        states: Dict[str, int] = {}
+        for job in jobs:
+            states[job.state] = states.get(job.state, 0) + 1
+        return {
+            'uptime': round(time.time() - self.started, 1),
+            'max_jobs': self.max_jobs,
+            'jobs': states,
+            'tester': self.tester.build_metadata(None)
+        }
+    
+    def close(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            if job.state not in JOB_FINAL_STATES:
+                job.cancel_requested = True
+        self.executor.shutdown(wait=True)
+
+def make_service_handler(service: ScanService) -> type:
+    """Handler da API do serve (HTTP/1.0: o stream de resultados termina ao fechar a conexão)"""
+    class ServiceHandler(BaseHTTPRequestHandler):
+        def route(self) -> Tuple[List[str], Dict[str, str]]:
+            path, _, query = self.path.partition('?')
+            return [part for part in path.split('/') if part], dict(parse_qsl(query))
+        
+        def send_json(self, status: int, payload: Any):
+            body = json.dumps(payload, ensure_ascii=False, default=json_default).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def find_job(self, job_id: str) -> Optional[ScanJob]:
+            job = service.get(job_id)
+            if job is None:
+                self.send_json(404, {'error': f'Job não encontrado: {job_id}'})
+            return job
+        
+        def do_GET(self):
+            parts, query = self.route()
+            if parts == ['status']:
+                self.send_json(200, service.status())
+            elif parts == ['metrics']:
+                body = service.tester.metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif parts == ['jobs']:
+                with service.lock:
+                    jobs = list(service.jobs.values())
+                self.send_json(200, [job.summary() for job in jobs])
+            elif len(parts) == 2 and parts[0] == 'jobs':
+                job = self.find_job(parts[1])
+                if job is not None:
+                    self.send_json(200, job.summary(detail=True))
+            elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'results':
+                try:
+                    offset = int(query.get('offset') or 0)
+                    if offset < 0:
+                        raise ValueError
+                except ValueError:
+                    self.send_json(400, {'error': f"offset inválido: {query['offset']} (esperado inteiro >= 0)"})
+                    return
+                job = self.find_job(parts[1])
+                if job is not None:
+                    self.stream_results(job, offset, query.get('wait', '1') != '0')
+            else:
+                self.send_json(404, {'error': f'Rota desconhecida: {self.path}'})
+        
+        def stream_results(self, job: ScanJob, offset: int, wait: bool):
+            """NDJSON com um bucket por linha; a última linha traz o estado final do job"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+            try:
+                for result in job.follow(offset, wait):
+                    self.wfile.write(json.dumps(dict(result, type='bucket'), ensure_ascii=False,
+                                                default=json_default).encode() + b'\n')
+                    self.wfile.flush()
+                self.wfile.write(json.dumps(dict(job.summary(), type='job'), ensure_ascii=False).encode() + b'\n')
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Cliente desconectou; o job continua
+        
+        def do_POST(self):
+            if self.route()[0] != ['jobs']:
+                self.send_json(404, {'error': f'Rota desconhecida: {self.path}'})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                if not isinstance(payload, dict):
+                    raise ValueError('Corpo deve ser um objeto JSON')
+                job = service.submit(payload)
+            except ValueError as e:
+                self.send_json(400, {'error': str(e)})
+                return
+            self.send_json(202, job.summary())
+        
+        def do_DELETE(self):
+            parts = self.route()[0]
+            if len(parts) != 2 or parts[0] != 'jobs':
+                self.send_json(404, {'error': f'Rota desconhecida: {self.path}'})
+                return
+            job = service.cancel(parts[1])
+            if job is None:
+                self.send_json(404, {'error': f'Job não encontrado: {parts[1]}'})
+            else:
+                self.send_json(200, job.summary())
+        
+        def log_message(self, format, *args):
+            pass
+    
+    return ServiceHandler
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor da API do serve em um socket Unix"""
+    daemon_threads = True
+
+def start_service_server(service: ScanService, listen: Optional[str] = None, unix_socket: Optional[str] = None):
+    """Servidor da API em HOST:PORTA ou em um socket Unix (acessível apenas ao usuário)"""
+    handler = make_service_handler(service)
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, handler)
+        os.chmod(unix_socket, 0o600)
+        return server
+    host, _, port = (listen or '').rpartition(':')
+    if not port.isdigit():
+        raise ValueError(f"Endereço inválido: {listen} (esperado HOST:PORTA)")
+    server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), handler)
+    server.daemon_threads = True
+    return server
+
+def serve_main(argv: List[str]):
+    """Subcomando serve: daemon com tester aquecido e API local de jobs de scan"""
+    parser = build_parser()
+    parser.prog = 'cloudSniffer.py serve'
+    parser.description = 'Mantém um tester aquecido (pools de conexão, DNS, saúde de hosts) e recebe scans por uma API local'
+    parser.add_argument('--listen', type=str, default='127.0.0.1:8780', help='HOST:PORTA da API (padrão: 127.0.0.1:8780)')
+    parser.add_argument('--socket', type=str, help='Socket Unix da API, no lugar de --listen')
+    parser.add_argument('--max-jobs', type=int, default=4, help='Jobs executados ao mesmo tempo; os demais aguardam na fila (padrão: 4)')
+    parser.add_argument('--budget', type=int, help='Requisições simultâneas somando todos os jobs (padrão: --workers)')
+    parser.add_argument('--keep-jobs', type=int, default=100, help='Jobs encerrados mantidos em memória com seus resultados (padrão: 100)')
+    args = parser.parse_args(argv)
+    
+    if args.buckets or args.list or args.permute:
+        print(f"{Colors.ERROR}No serve os buckets chegam pela API (POST /jobs){Colors.RESET}")
+        sys.exit(1)
+    if args.engine != 'threads' or args.processes > 1:
+        print(f"{Colors.ERROR}O serve usa --engine threads em um único processo (o orçamento global é compartilhado entre threads){Colors.RESET}")
+        sys.exit(1)
+    
+    status_filter = None
+    if args.status:
+        try:
+            status_filter = [int(s.strip()) for s in args.status.split(',')]
+        except ValueError:
+            print(f"{Colors.ERROR}Status codes inválidos: {args.status}{Colors.RESET}")
+            sys.exit(1)
+    
+    try:
+        tester = build_tester(vars(args))
+        tester.budget = ConcurrencyBudget(args.budget or args.workers)
+        service = ScanService(tester, max(args.max_jobs, 1), max(args.keep_jobs, 1), status_filter, args.no_cli)
+        server = start_service_server(service, args.listen, args.socket)
+    except (ValueError, OSError) as e:
+        print(f"{Colors.ERROR}{e}{Colors.RESET}")
+        sys.exit(1)
+    
+    if args.socket:
+        print(f"{Colors.INFO}API em unix:{args.socket}{Colors.RESET}")
+    else:
+        print(f"{Colors.INFO}API em http://{args.listen}{Colors.RESET}")
+        host = args.listen.rpartition(':')[0]
+        if host not in ('', '127.0.0.1', 'localhost', '::1'):
+            print(f"{Colors.WARNING}A API não tem autenticação: prefira 127.0.0.1 ou --socket{Colors.RESET}")
+    print(f"{Colors.INFO}Jobs simultâneos: {service.max_jobs} | Orçamento global: {tester.budget.limit} requisições{Colors.RESET}")
+    
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    
+    signal.signal(signal.SIGTERM, stop)  # Orquestradores encerram o daemon com SIGTERM
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{Colors.WARNING}Encerrando: jobs em andamento são cancelados{Colors.RESET}")
+    finally:
+        server.server_close()
+        service.close()
+        tester.close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+def build_parser() -> argparse.ArgumentParser:
+    """Opções do scan (também configuram o tester compartilhado do subcomando serve)"""
     parser = argparse.ArgumentParser(description='Cloud Bucket Tester v3.0 - Testa buckets em diferentes provedores de cloud')
     
     parser.add_argument('buckets', nargs='*', help='Nome(s) do(s) bucket(s) para testar')
-    parser.add_argument('--list', '-l', type=str, help='Arquivo TXT com lista de buckets (um por linha)')
+    parser.add_argument('--list', '-l', type=str, action='append', help='Arquivo TXT com lista de buckets (um por linha); aceita .gz/.xz, - para stdin e pode ser repetido. Deduplicação exata até 100 mil nomes distintos, depois Bloom filter (memória limitada a ~18 MB)')
+    parser.add_argument('--permute', type=str, action='append', help='Arquivo de palavras-chave; gera candidatos sob demanda combinando cada uma com as --mutations (pode ser repetido)')
+    parser.add_argument('--mutations', type=str, help='Regras de mutação do --permute: templates com {keyword} e variáveis @nome = a, b (padrão: ambientes e sufixos comuns)')
+    parser.add_argument('--dedup-error-rate', type=float, default=0.001, help='Taxa de falsos positivos do Bloom filter de deduplicação; 0 usa sempre um set exato, com memória proporcional aos nomes distintos (padrão: 0.001)')
+    parser.add_argument('--dedup-capacity', type=int, default=DEDUP_CAPACITY, help='Nomes distintos previstos no Bloom filter de deduplicação (padrão: 10000000, ~18 MB)')
     parser.add_argument('--timeout', type=int, default=10, help='Timeout em segundos (padrão: 10)')
     parser.add_argument('--workers', type=int, default=15, help='Número de threads para testes paralelos (padrão: 15)')
     parser.add_argument('--output', type=str, help='Arquivo para salvar resultados JSON (padrão: timestamp automático)')
+    parser.add_argument('--queue-size', type=int, default=10000, help='Buckets lidos antecipadamente da(s) lista(s) (padrão: 10000)')
+    parser.add_argument('--output-format', choices=['json', 'ndjson'], default='json', help='json (agregado no final) ou ndjson (streaming, um bucket por linha) (padrão: json)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Modo verboso')
-    parser.add_argument('--status', type=str, help='Filtrar por status codes (ex: 200,403,404)')
+    parser.add_argument('--status', type=str, help='Filtrar por status codes (ex: 200,403,404); probes que não podem casar com o filtro são cancelados')
+    first_hit = parser.add_mutually_exclusive_group()
+    first_hit.add_argument('--first-hit', action='store_true', help='Encerra o bucket no primeiro achado confirmado (status do --status ou 200), cancelando os probes pendentes')
+    first_hit.add_argument('--first-hit-per-provider', action='store_true', help='Como --first-hit, mas encerra apenas o provedor que teve o achado')
     parser.add_argument('--profile', type=str, help='Perfil AWS para usar com AWS CLI')
     parser.add_argument('--no-cli', action='store_true', help='Pular testes de CLI (apenas HTTP)')
+    parser.add_argument('--cli-mode', choices=['native', 'subprocess'], default='native', help='Testes de listagem via HTTP no próprio processo (native) ou pelas CLIs aws/gsutil/az (subprocess) (padrão: native)')
+    parser.add_argument('--dry-run', action='store_true', help='Apenas exibe o probe plan e o total de requisições, sem I/O')
+    parser.add_argument('--no-dns-prefetch', action='store_true', help='Desativa a pré-resolução DNS dos hosts de cada bucket')
+    parser.add_argument('--dns-server', type=str, help='Servidor DNS HOST[:PORT] para a pré-resolução (padrão: resolver do sistema)')
+    parser.add_argument('--dns-negative-ttl', type=int, default=300, help='TTL em segundos para NXDOMAIN sem SOA / resolver do sistema (padrão: 300)')
+    parser.add_argument('--aws-strategy', choices=['discover', 'fanout'], default='discover', help='S3: descobre a região do bucket (discover) ou testa regiões fixas (fanout) (padrão: discover)')
+    parser.add_argument('--s3-region-cache', type=str, default=os.path.join(os.path.expanduser('~'), '.cache', 'cloudsniffer', 's3_regions.json'), help='Arquivo de cache bucket->região do S3 entre execuções')
+    parser.add_argument('--host-recheck', type=int, default=600, help='Intervalo em segundos para re-checar hosts que falharam (DNS/recusa/TLS) (padrão: 600)')
+    parser.add_argument('--no-host-cache', action='store_true', help='Desativa o cache de saúde de hosts')
+    parser.add_argument('--host-cache-timeouts', action='store_true', help='Também marca como morto o host com timeout de conexão (padrão: apenas DNS, recusa e TLS)')
+    parser.add_argument('--probe-mode', choices=PROBE_MODES, help='get (corpo inteiro), head, range (GET com Range) ou stream (lê até --max-body) (padrão: get; com --status, range de 1 byte)')
+    parser.add_argument('--max-body', type=int, default=65536, help='Bytes máximos de corpo lidos nos modos range/stream (padrão: 65536)')
+    parser.add_argument('--host-rate', type=float, default=100.0, help='Requisições/s máximas por host; reduzidas em 429/503 (0 = sem limite de taxa) (padrão: 100)')
+    parser.add_argument('--max-retries', type=int, default=2, help='Tentativas extras para respostas 429/503, respeitando Retry-After (padrão: 2)')
+    parser.add_argument('--no-rate-limit', action='store_true', help='Desativa a limitação adaptativa por host')
+    parser.add_argument('--providers', type=str, help='Testa apenas estes provedores, separados por vírgula (ex.: aws,gcp); o plano é podado antes de qualquer I/O')
+    parser.add_argument('--regions', type=str, help='Testa apenas estas regiões nos provedores regionais, separadas por vírgula (ex.: us-east-1,eu-west-1)')
+    parser.add_argument('--provider-file', type=str, help='Registro de provedores JSON/YAML (provedor -> regiões e templates {bucket}/{region}); substitui ou acrescenta aos embutidos')
+    parser.add_argument('--header-allowlist', type=str, default=','.join(HEADER_ALLOWLIST), help='Cabeçalhos guardados em probes que não são achados; prefixo* aceito, * guarda todos (padrão: %(default)s)')
+    parser.add_argument('--trace', type=str, metavar='PREFIX', help='Perfila o scan: grava PREFIX.pstats (cProfile) e PREFIX.collapsed (pilhas para flamegraph) e resume as funções mais caras')
+    parser.add_argument('--trace-interval', type=float, default=5, help='Intervalo de amostragem das pilhas do --trace em ms (padrão: 5)')
+    parser.add_argument('--trace-top', type=int, default=15, help='Funções exibidas no resumo do --trace (padrão: 15)')
+    parser.add_argument('--metrics-port', type=int, help='Expõe histogramas de latência por fase em http://127.0.0.1:PORTA/metrics (Prometheus) e /metrics.json')
+    parser.add_argument('--cache', type=str, help='Cache SQLite de resultados de probe entre execuções; entradas válidas não geram requisições')
+    parser.add_argument('--cache-ttl', type=int, default=3600, help='Validade em segundos de resultados positivos no --cache (padrão: 3600)')
+    parser.add_argument('--cache-negative-ttl', type=int, default=86400, help='Validade em segundos de NoSuchBucket/NXDOMAIN/host morto no --cache (padrão: 86400)')
+    parser.add_argument('--cache-max-entries', type=int, default=1000000, help='Entradas máximas no --cache; as mais antigas são removidas (padrão: 1000000)')
+    parser.add_argument('--journal', type=str, help='Journal de checkpoint: grava cada bucket concluído (fsync) para retomar depois')
+    parser.add_argument('--resume', type=str, help='Retoma um scan a partir do journal, pulando buckets já concluídos')
+    parser.add_argument('--processes', type=int, default=1, help='Processos de scan em paralelo, cada um com seus próprios --workers/--concurrency (padrão: 1)')
+    parser.add_argument('--shard', type=str, help='Testa apenas a partição i/n dos buckets (hash estável do nome, ex.: 1/4); junte as saídas com o subcomando merge')
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads', help='Engine de scan: threads por bucket ou asyncio global (padrão: threads)')
+    parser.add_argument('--concurrency', type=int, default=1000, help='Limite global de requisições simultâneas no --engine async (padrão: 1000)')
+    parser.add_argument('--per-host', type=int, help='Limite de requisições simultâneas por host no --engine async (padrão: --workers)')
+    return parser
+
+def main():
+    if sys.argv[1:2] == ['convert']:
+        convert_main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['merge']:
+        merge_main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['serve']:
+        serve_main(sys.argv[2:])
+        return
+    
+    args = build_parser().parse_args()
+    
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            print(f"{Colors.ERROR}{e}{Colors.RESET}")
+            sys.exit(1)
+    
+    # Fontes em streaming deduplicam em memória limitada: --permute (milhões de candidatos) direto no Bloom
+    # filter, --list em um set exato até DEDUP_EXACT_LIMIT nomes; --dedup-error-rate 0 = sempre set exato
+    new_bloom = None
+    if (args.list or args.permute) and args.dedup_error_rate > 0:
+        if not 0 < args.dedup_error_rate < 1:
+            print(f"{Colors.ERROR}taxa de falsos positivos inválida: {args.dedup_error_rate} (use 0 < taxa < 1){Colors.RESET}")
+            sys.exit(1)
+        new_bloom = lambda: BloomFilter(args.dedup_capacity, args.dedup_error_rate)
+    exact_limit = 0 if args.permute else DEDUP_EXACT_LIMIT
+    
+    def select(source: Iterable[str]) -> Iterator[str]:
+        return iter_unique(iter_shard(source, *shard) if shard else source, new_bloom, exact_limit)
     
-    args = parser.parse_args()
+    if args.mutations and not args.permute:
+        print(f"{Colors.ERROR}--mutations requer --permute{Colors.RESET}")
+        sys.exit(1)
     
     # Determina a lista de buckets
-    if args.list:
-        buckets = load_buckets_from_file(args.list)
-        print(f"{Colors.INFO}Carregados {len(buckets)} buckets do arquivo: {args.list}{Colors.RESET}")
+    if args.list or args.permute:
+        for source in (args.list or []) + (args.permute or []):
+            if source != '-' and not os.path.isfile(source):
+                print(f"{Colors.ERROR}Arquivo não encontrado: {source}{Colors.RESET}")
+                sys.exit(1)
+        # Leitura sob demanda: a lista nunca é carregada inteira em memória
+        streams = (bucket for source in args.list or [] for bucket in iter_bucket_file(source))
+        if args.permute:
+            try:
+                rules = MutationRules.from_file(args.mutations) if args.mutations else MutationRules(DEFAULT_MUTATIONS, 'padrão')
+            except (ValueError, OSError) as e:
+                print(f"{Colors.ERROR}{e}{Colors.RESET}")
+                sys.exit(1)
+            streams = chain(streams, iter_permutations(args.permute, rules))
+            print(f"{Colors.INFO}Permutações: palavras-chave de {', '.join(args.permute)} × {len(rules.templates)} mutações{Colors.RESET}")
+        buckets = BucketStream(select(chain(args.buckets, streams)), maxsize=args.queue_size)
+        if args.list:
+            print(f"{Colors.INFO}Lendo buckets de: {', '.join(args.list)}{Colors.RESET}")
     elif args.buckets:
-        buckets = args.buckets
+        buckets = list(select(args.buckets))
     else:
         print(f"{Colors.ERROR}Especifique buckets diretamente ou use --list para carregar de arquivo!{Colors.RESET}")
         print("Exemplos:")
@@ -862,15 +4263,31 @@ def main():
             sys.exit(1)
     
     # Inicializa o tester com novos parâmetros
-    tester = CloudBucketTester(
-        timeout=args.timeout, 
-        workers=args.workers, 
-        aws_profile=args.profile
-    )
+    try:
+        tester = build_tester(vars(args))
+    except (ValueError, OSError) as e:
+        print(f"{Colors.ERROR}{e}{Colors.RESET}")
+        sys.exit(1)
+    
+    if args.dry_run:
+        tester.print_probe_plan(buckets)
+        tester.close()
+        return
     
     print(f"{Colors.HEADER}Iniciando testes de buckets...{Colors.RESET}")
-    print(f"{Colors.INFO}Buckets a testar: {', '.join(buckets)}{Colors.RESET}")
+    if isinstance(buckets, list):
+        print(f"{Colors.INFO}Buckets a testar: {', '.join(buckets)}{Colors.RESET}")
     print(f"{Colors.INFO}Workers: {args.workers} | Timeout: {args.timeout}s{Colors.RESET}")
+    if args.shard:
+        print(f"{Colors.INFO}Shard: {args.shard}{Colors.RESET}")
+    if tester.processes > 1:
+        print(f"{Colors.INFO}Processos: {tester.processes} (taxa por host dividida entre eles){Colors.RESET}")
+    
+    if args.engine == 'async':
+        if aiohttp is None:
+            print(f"{Colors.ERROR}--engine async requer o pacote aiohttp (pip3 install aiohttp){Colors.RESET}")
+            sys.exit(1)
+        print(f"{Colors.INFO}Engine: async | Concorrência global: {args.concurrency} | Por host: {tester.per_host}{Colors.RESET}")
     
     if args.profile:
         print(f"{Colors.INFO}Usando perfil AWS: {args.profile}{Colors.RESET}")
@@ -878,15 +4295,50 @@ def main():
     if args.no_cli:
         print(f"{Colors.WARNING}Modo --no-cli: pulando testes de linha de comando{Colors.RESET}")
     
-    results = tester.test_buckets(buckets, verbose=args.verbose, status_filter=status_filter, no_cli=args.no_cli)
+    if args.metrics_port:
+        start_metrics_server(tester.metrics, args.metrics_port)
+        print(f"{Colors.INFO}Métricas: http://127.0.0.1:{args.metrics_port}/metrics (Prometheus) e /metrics.json{Colors.RESET}")
+    
+    tracer = ScanTracer(args.trace, args.trace_interval / 1000, args.trace_top).start() if args.trace else None
+    
+    journal = None
+    if args.resume or args.journal:
+        journal = ScanJournal(args.resume or args.journal, resume=bool(args.resume))
+        if args.resume:
+            print(f"{Colors.INFO}Retomando scan: {len(journal.completed)} buckets já concluídos em {args.resume}{Colors.RESET}")
+    
+    writer = None
+    if args.output_format == 'ndjson':
+        output = args.output or f'bucket_test_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.ndjson'
+        writer = NDJSONResultWriter(output, tester.build_metadata(len(buckets) if isinstance(buckets, list) else None))
+    
+    try:
+        results = tester.test_buckets(buckets, verbose=args.verbose, status_filter=status_filter, no_cli=args.no_cli,
+                                      journal=journal, writer=writer)
+    except KeyboardInterrupt:
+        if journal:
+            print(f"\n{Colors.WARNING}Scan interrompido. Retome com: --resume {journal.filename}{Colors.RESET}")
+        if tracer:
+            print(tracer.stop())
+        tester.close()
+        sys.exit(130)
+    finally:
+        if journal:
+            journal.close()
     
     # Gera e exibe relatório
     if not args.verbose:
-        report = tester.generate_report(results)
-        print(report)
+        tester.print_report(total_buckets=writer.count if writer else None)
     
     # Salva resultados
-    tester.save_results(results, args.output)
+    if writer:
+        writer.close(tester.build_metadata(writer.count))
+        print(f"\n{Colors.INFO}Resultados salvos em: {writer.filename}{Colors.RESET}")
+    else:
+        tester.save_results(results, args.output)
+    if tracer:
+        print(tracer.stop())
+    tester.close()
 
 if __name__ == '__main__':
     banner()
@@ -0,0 +1,95 @@
+import socket
+
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+import cloudSniffer
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Conta as consultas getaddrinfo por hostname"""
+    calls = []
+    real_getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(host, *args, **kwargs):
+        calls.append(host)
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+    return calls
+
+
+def test_new_connection_resolves_once_and_records_phases(http_server, lookups):
+    port = http_server().server_port
+    client = cloudSniffer.SharedHTTPClient(workers=1)
+    try:
+        cloudSniffer._connection_phases.current = None
+        assert client.request('GET', f'http://localhost:{port}/', timeout=5).status_code == 200
+        dns, connect, tls = cloudSniffer._connection_phases.current
+    finally:
+        client.close()
+
+    # Uma consulta DNS pelo nome; o urllib3 conecta ao endereço já resolvido
+    assert lookups.count('localhost') == 1
+    assert dns >= 0 and connect >= 0 and tls is None
+
+
+def test_refused_connection_uses_urllib3_errors(http_server):
+    server = http_server()
+    port = server.server_port
+    server.shutdown()
+    server.server_close()
+    client = cloudSniffer.SharedHTTPClient(workers=1)
+    try:
+        with pytest.raises(requests.exceptions.ConnectionError) as error:
+            client.request('GET', f'http://127.0.0.1:{port}/', timeout=5)
+    finally:
+        client.close()
+    assert isinstance(error.value.args[0].reason, NewConnectionError)
+    assert cloudSniffer.classify_connection_error(error.value) == 'refused'
+
+
+@pytest.fixture
+def multi_address(monkeypatch):
+    """multi.test resolve para 127.0.0.2 (nada escuta ali: recusa) e depois 127.0.0.1"""
+    real_getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host == 'multi.test':
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, port))
+                    for address in ('127.0.0.2', '127.0.0.1')]
+        return real_getaddrinfo(host, port, *args, **kwargs)
+
+    monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+
+
+def test_falls_back_to_next_resolved_address(http_server, multi_address):
+    port = http_server().server_port
+    url = f'http://multi.test:{port}/'
+    with requests.Session() as session:
+        assert session.get(url, timeout=5).status_code == 200
+
+    client = cloudSniffer.SharedHTTPClient(workers=1)
+    try:
+        cloudSniffer._connection_phases.current = None
+        assert client.request('GET', url, timeout=5).status_code == 200
+        dns, connect, tls = cloudSniffer._connection_phases.current
+    finally:
+        client.close()
+    assert dns >= 0 and connect >= 0 and tls is None
+
+
+def test_all_resolved_addresses_refused(http_server, multi_address):
+    server = http_server()
+    port = server.server_port
+    server.shutdown()
+    server.server_close()
+    client = cloudSniffer.SharedHTTPClient(workers=1)
+    try:
+        with pytest.raises(requests.exceptions.ConnectionError) as error:
+            client.request('GET', f'http://multi.test:{port}/', timeout=5)
+    finally:
+        client.close()
+    assert cloudSniffer.classify_connection_error(error.value) == 'refused'
@@ -0,0 +1,60 @@
+import re
+
+import cloudSniffer
+
+
+def scan_hosts(port, shared_hosts):
+    """Simula 5 buckets: 3 probes path-style no host compartilhado e 10 virtual-hosts próprios cada"""
+    client = cloudSniffer.SharedHTTPClient(workers=2, max_hosts=4, shared_hosts=shared_hosts)
+    try:
+        for bucket in range(1, 6):
+            for _ in range(3):
+                client.request('GET', f'http://127.0.0.1:{port}/bucket{bucket}', timeout=5).content
+            for vhost in range(1, 11):
+                client.request('GET', f'http://127.0.{bucket}.{vhost}:{port}/', timeout=5).content
+        return client.stats.snapshot()
+    finally:
+        client.close()
+
+
+def test_shared_hosts_survive_per_bucket_virtual_hosts(http_server):
+    # 0.0.0.0: os virtual-hosts são aliases de loopback (127.0.x.y)
+    port = http_server(host='0.0.0.0').server_port
+    single_lru = scan_hosts(port, None)
+    split_lru = scan_hosts(port, re.compile(r'127\.0\.0\.1'))
+
+    assert single_lru['requests'] == split_lru['requests'] == 65
+    # Uma única LRU pequena perde o host compartilhado a cada bucket; a LRU própria o mantém
+    assert single_lru['hits'] == 10
+    assert split_lru['hits'] == 14
+    assert split_lru['hit_ratio'] > single_lru['hit_ratio']
+
+
+def test_builtin_registry_shared_hosts():
+    pattern = cloudSniffer.ProviderRegistry().shared_host_pattern()
+    for host in ('s3.amazonaws.com', 's3.eu-west-1.amazonaws.com', 'storage.googleapis.com'):
+        assert pattern.fullmatch(host)
+    for host in ('acme.s3.amazonaws.com', 'acme.blob.core.windows.net', 'acme.storage.googleapis.com'):
+        assert not pattern.fullmatch(host)
+
+
+class FakePool:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_shared_pool_lru_evicts_and_closes_least_recent():
+    lru = cloudSniffer._PoolLRU(2)
+    a = lru.get_or_create('a', lambda: FakePool('a'))
+    b = lru.get_or_create('b', lambda: FakePool('b'))
+    assert lru.get_or_create('a', lambda: FakePool('other')) is a  # Reuso move 'a' para o fim
+    c = lru.get_or_create('c', lambda: FakePool('c'))
+
+    assert b.closed and not a.closed and not c.closed
+    assert len(lru) == 2
+    lru.clear()
+    assert a.closed and c.closed and len(lru) == 0
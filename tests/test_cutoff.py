@@ -0,0 +1,108 @@
+import pytest
+
+import cloudSniffer
+from conftest import OKHandler
+
+
+AWS, GCP, AZURE = cloudSniffer.Provider.AWS, cloudSniffer.Provider.GCP, cloudSniffer.Provider.AZURE
+PATH_STYLE, WEBSITE = cloudSniffer.Variant.PATH_STYLE, cloudSniffer.Variant.WEBSITE
+
+
+def status(code, variant=PATH_STYLE):
+    return {'status_code': code, 'variant': variant}
+
+
+def test_first_hit_closes_the_bucket():
+    cutoff = cloudSniffer.BucketCutoff('bucket', {200}, set())
+    assert not cutoff.observe(AWS, status(403))
+    assert cutoff.allows(AWS) and cutoff.allows(GCP)
+    assert cutoff.observe(AWS, status(200))
+    assert not cutoff.allows(AWS) and not cutoff.allows(GCP)
+
+
+def test_first_hit_per_provider_closes_only_that_provider():
+    cutoff = cloudSniffer.BucketCutoff('provider', {200, 403}, set())
+    assert cutoff.observe(GCP, status(403))
+    assert not cutoff.allows(GCP)
+    assert cutoff.allows(AWS) and cutoff.allows(AZURE)
+
+
+def test_status_pushdown_needs_a_rest_404_on_a_global_namespace():
+    cutoff = cloudSniffer.BucketCutoff(None, {200}, {AWS, GCP})
+    assert not cutoff.observe(AWS, status(200))  # Sem --first-hit, achados não encerram nada
+    assert not cutoff.observe(AWS, status(404, WEBSITE))  # 404 de website não prova inexistência
+    assert not cutoff.observe(AZURE, status(404))  # Namespace por conta: 404 não é conclusivo
+    assert cutoff.allows(AWS) and cutoff.allows(AZURE)
+    assert cutoff.observe(AWS, status(404))
+    assert not cutoff.allows(AWS) and cutoff.allows(GCP)
+
+
+@pytest.mark.parametrize('first_hit, status_filter, expected', [
+    (None, None, None),
+    (None, [200, 404], None),  # 404 pedido no filtro: nada a cortar
+    (None, [200], (None, {200}, True)),
+    ('bucket', None, ('bucket', set(cloudSniffer.FIRST_HIT_STATUS), False)),
+    ('provider', [403], ('provider', {403}, True)),
+])
+def test_new_cutoff(first_hit, status_filter, expected):
+    tester = cloudSniffer.CloudBucketTester(first_hit=first_hit)
+    try:
+        cutoff = tester.new_cutoff(status_filter)
+    finally:
+        tester.close()
+    if expected is None:
+        assert cutoff is None
+    else:
+        assert (cutoff.first_hit, cutoff.qualifying, bool(cutoff.missing_cutoff)) == expected
+        assert not cutoff.missing_cutoff or cutoff.missing_cutoff == {AWS, GCP}
+
+
+class StatusHandler(OKHandler):
+    """Responde o status indicado no primeiro segmento do caminho (/404/...)"""
+    paths = []
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        self.send_response(int(self.path.split('/')[1]))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET
+
+
+@pytest.fixture
+def scan(http_server, monkeypatch):
+    """Executa um bucket com um plano local [(provedor, status), ...] em um único worker"""
+    port = http_server(StatusHandler).server_port
+    StatusHandler.paths = []
+
+    def run(plan, first_hit=None, status_filter=None):
+        monkeypatch.setattr(cloudSniffer.CloudBucketTester, 'build_probe_plan', lambda self, bucket: [
+            cloudSniffer.Probe(f'http://127.0.0.1:{port}/{code}/{bucket}/{index}', provider, PATH_STYLE, 'http')
+            for index, (provider, code) in enumerate(plan)])
+        tester = cloudSniffer.CloudBucketTester(workers=1, first_hit=first_hit, aws_strategy='fanout')
+        try:
+            result = tester.test_bucket_comprehensive('bucket', status_filter=status_filter, no_cli=True)
+            return result, tester.cancelled_probe_count()
+        finally:
+            tester.close()
+
+    return run
+
+
+def test_first_hit_cancels_queued_probes(scan):
+    plan = [(AWS, 200)] + [(AWS, 403)] * 9 + [(GCP, 403)] * 10
+    result, cancelled = scan(plan, first_hit='bucket')
+    assert result['http_tests'][0]['status_code'] == 200
+    # Com um worker, no máximo um probe já havia saído da fila quando o achado chegou
+    assert len(StatusHandler.paths) <= 2
+    assert len(StatusHandler.paths) + cancelled == len(plan)
+
+
+def test_status_pushdown_skips_the_missing_provider_only(scan):
+    plan = [(AWS, 404)] + [(AWS, 200)] * 9 + [(GCP, 200)] * 5
+    result, cancelled = scan(plan, status_filter=[200])
+    gcp = [path for path in StatusHandler.paths if int(path.rsplit('/', 1)[1]) >= 10]
+    assert len(gcp) == 5
+    assert cancelled >= 8 and len(StatusHandler.paths) + cancelled == len(plan)
+    assert all(test['status_code'] == 200 for test in result['http_tests'])
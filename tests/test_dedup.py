@@ -0,0 +1,50 @@
+import cloudSniffer
+
+
+class BloomFactory:
+    """Conta quantos Bloom filters iter_unique alocou"""
+    def __init__(self):
+        self.created = []
+
+    def __call__(self):
+        bloom = cloudSniffer.BloomFilter(10000, 0.001)
+        self.created.append(bloom)
+        return bloom
+
+
+def test_small_list_stays_exact_without_allocating_bloom():
+    factory = BloomFactory()
+    names = ['a', 'b', 'a', 'c', 'b']
+    assert list(cloudSniffer.iter_unique(names, factory, exact_limit=10)) == ['a', 'b', 'c']
+    assert factory.created == []
+
+
+def test_large_list_switches_to_bloom_after_limit():
+    factory = BloomFactory()
+    names = [f'bucket-{i % 50}' for i in range(200)]  # 50 distintos, repetidos 4 vezes
+    assert list(cloudSniffer.iter_unique(names, factory, exact_limit=10)) == [f'bucket-{i}' for i in range(50)]
+    assert len(factory.created) == 1
+    # Os nomes vistos antes da troca migram para o filtro
+    assert factory.created[0].count == 50 and 'bucket-0' in factory.created[0]
+
+
+def test_permute_uses_bloom_from_the_start():
+    factory = BloomFactory()
+    assert list(cloudSniffer.iter_unique(['x', 'x', 'y'], factory, exact_limit=0)) == ['x', 'y']
+    assert len(factory.created) == 1
+
+
+def test_without_bloom_dedup_is_exact():
+    assert list(cloudSniffer.iter_unique(iter(['x', 'y', 'x', 'z']))) == ['x', 'y', 'z']
+
+
+def test_bloom_false_positive_rate_at_capacity():
+    bloom = cloudSniffer.BloomFilter(10000, 0.01)
+    for i in range(10000):
+        bloom.add(f'member-{i}')
+    assert all(f'member-{i}' in bloom for i in range(10000))  # Sem falsos negativos
+    false_positives = sum(f'other-{i}' in bloom for i in range(50000))
+    assert false_positives / 50000 < 0.015
+    # Inserções que colidiram por completo contam como repetidas: a contagem fica perto da capacidade
+    assert 9900 <= bloom.count <= 10000
+    assert bloom.stats()['hashes'] == 7 and bloom.stats()['bytes'] == 11982
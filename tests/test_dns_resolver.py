@@ -0,0 +1,122 @@
+import asyncio
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+import cloudSniffer
+
+# host -> (rcode, registros de resposta, SOA (ttl, minimum) na seção de autoridade)
+ZONE = {
+    'bucket.example.test': (0, [('1.2.3.4', 120), ('1.2.3.5', 90)], None),
+    'missing.example.test': (3, [], (900, 60)),
+    'nosoa.example.test': (3, [], None),
+    'empty.example.test': (0, [], (30, 300)),
+    'broken.example.test': (2, [], None),
+}
+
+
+def build_response(query: bytes) -> bytes:
+    """Resposta DNS mínima para a consulta A recebida, a partir de ZONE"""
+    query_id = struct.unpack('>H', query[:2])[0]
+    end = 12
+    labels = []
+    while query[end]:
+        labels.append(query[end + 1:end + 1 + query[end]].decode())
+        end += query[end] + 1
+    question = query[12:end + 5]
+    rcode, answers, soa = ZONE.get('.'.join(labels), (3, [], None))
+
+    records = b''
+    for address, ttl in answers:
+        records += struct.pack('>HHHIH', 0xC00C, 1, 1, ttl, 4) + socket.inet_aton(address)
+    if soa is not None:
+        ttl, minimum = soa
+        rdata = b'\x00\x00' + struct.pack('>IIIII', 1, 3600, 600, 86400, minimum)
+        records += struct.pack('>HHHIH', 0xC00C, 6, 1, ttl, len(rdata)) + rdata
+    header = struct.pack('>HHHHHH', query_id, 0x8180 | rcode, 1, len(answers), 1 if soa else 0, 0)
+    return header + question + records
+
+
+@pytest.fixture
+def nameserver():
+    """Servidor DNS falso em UDP, numa porta efêmera de 127.0.0.1"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(0.2)
+    running = threading.Event()
+    running.set()
+
+    def serve():
+        while running.is_set():
+            try:
+                query, addr = sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            sock.sendto(build_response(query), addr)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield sock.getsockname()
+    running.clear()
+    thread.join()
+    sock.close()
+
+
+def resolve(resolver, hosts):
+    return asyncio.run(resolver.resolve_many(hosts))
+
+
+def test_positive_and_negative_ttls(nameserver):
+    resolver = cloudSniffer.DNSResolver(nameserver=nameserver, timeout=1, negative_ttl=500)
+    now = time.monotonic()
+    entries = resolve(resolver, list(ZONE))
+
+    ok = entries['bucket.example.test']
+    assert ok.state == 'ok'
+    assert ok.addresses == ('1.2.3.4', '1.2.3.5')
+    assert ok.expires - now == pytest.approx(90, abs=2)  # Menor TTL das respostas
+
+    # NXDOMAIN: TTL negativo = min(TTL do SOA, MINIMUM); sem SOA, --dns-negative-ttl
+    assert entries['missing.example.test'].state == 'nxdomain'
+    assert entries['missing.example.test'].expires - now == pytest.approx(60, abs=2)
+    assert entries['nosoa.example.test'].expires - now == pytest.approx(500, abs=2)
+
+    assert entries['empty.example.test'].state == 'nodata'
+    assert entries['empty.example.test'].expires - now == pytest.approx(30, abs=2)
+
+    # SERVFAIL é transitório: não entra no cache
+    assert entries['broken.example.test'].state == 'error'
+    assert resolver.lookup('broken.example.test') is None
+
+    stats = resolver.stats()
+    assert stats['queries'] == 5
+    assert stats['nxdomain'] == 2
+    assert stats['cached_hosts'] == 4
+
+    resolve(resolver, ['bucket.example.test', 'missing.example.test'])
+    assert resolver.stats()['cache_hits'] == 2
+    resolver.close()
+
+
+def test_cache_is_bounded(nameserver):
+    resolver = cloudSniffer.DNSResolver(nameserver=nameserver, timeout=1, max_entries=2)
+    resolve(resolver, ['bucket.example.test'])
+    resolve(resolver, ['missing.example.test'])
+    resolve(resolver, ['empty.example.test'])
+
+    assert list(resolver.cache) == ['missing.example.test', 'empty.example.test']
+    assert resolver.stats()['evicted'] == 1
+    resolver.close()
+
+
+def test_expired_entries_are_swept():
+    resolver = cloudSniffer.DNSResolver(sweep_interval=0)
+    for index in range(100):
+        resolver.store(f'gone{index}.example.test', 'nxdomain', ttl=-1)
+    resolver.store('kept.example.test', 'ok', ('1.2.3.4',), ttl=60)
+
+    assert list(resolver.cache) == ['kept.example.test']
+    resolver.close()
@@ -0,0 +1,72 @@
+import pytest
+
+import cloudSniffer
+from conftest import OKHandler
+
+
+class EngineHandler(OKHandler):
+    """HEAD /discovery/<bucket> responde 301 com a região; GET /<status>/... responde o status indicado"""
+    def do_HEAD(self):
+        self.send_response(301 if self.path.startswith('/discovery/') else 200)
+        self.send_header('x-amz-bucket-region', 'eu-west-1')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self.send_response(int(self.path.split('/')[1]))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def local_scan(http_server, monkeypatch):
+    """Plano local: probes AWS por região descoberta (http) e probes GCP avançados"""
+    base = f'http://127.0.0.1:{http_server(EngineHandler).server_port}'
+
+    def build_probe_plan(self, bucket):
+        plan = [cloudSniffer.Probe(f'{base}/{status}/{bucket}/{region}', cloudSniffer.Provider.AWS,
+                                   cloudSniffer.Variant.PATH_STYLE, 'http')
+                for region in self.aws_regions_for(bucket) for status in (200, 403)]
+        plan += [cloudSniffer.Probe(f'{base}/{status}/{bucket}/advanced', cloudSniffer.Provider.GCP,
+                                    cloudSniffer.Variant.WEBSITE, 'advanced') for status in (200, 404, 500)]
+        return plan
+
+    monkeypatch.setattr(cloudSniffer.CloudBucketTester, 'build_probe_plan', build_probe_plan)
+    monkeypatch.setattr(cloudSniffer.CloudBucketTester, 's3_discovery_url', lambda self, bucket: f'{base}/discovery/{bucket}')
+
+    def run(engine):
+        tester = cloudSniffer.CloudBucketTester(workers=4, engine=engine)
+        try:
+            results = tester.test_buckets(['alpha', 'beta'], no_cli=True, quiet=True)
+            return results, tester.report
+        finally:
+            tester.close()
+
+    return run
+
+
+def summary(result):
+    return {kind: sorted((test['url'], test['status_code'], str(test['variant'])) for test in result[f'{kind}_tests'])
+            for kind in ('http', 'advanced')}
+
+
+@pytest.mark.parametrize('engine', ['threads', 'async'])
+def test_engine_runs_discovery_http_and_advanced_probes(local_scan, engine):
+    results, report = local_scan(engine)
+
+    assert [result['bucket'] for result in results] == ['alpha', 'beta']
+    for result in results:
+        discovery = [test for test in result['http_tests'] if test['variant'] == cloudSniffer.Variant.DISCOVERY]
+        assert len(discovery) == 1 and discovery[0]['status_code'] == 301
+        # Descoberta em eu-west-1: um único par de probes AWS
+        aws = [test for test in result['http_tests'] if test['variant'] != cloudSniffer.Variant.DISCOVERY]
+        assert sorted((test['status_code'], test['url'].rsplit('/', 1)[-1]) for test in aws) == [
+            (200, 'eu-west-1'), (403, 'eu-west-1')]
+        assert sorted(test['status_code'] for test in result['advanced_tests']) == [200, 404, 500]
+    assert report.buckets == 2 and report.found == 2
+
+
+def test_engines_agree(local_scan):
+    threads, _ = local_scan('threads')
+    asynchronous, _ = local_scan('async')
+    assert [summary(result) for result in threads] == [summary(result) for result in asynchronous]
@@ -0,0 +1,26 @@
+import cloudSniffer
+
+
+def test_connect_timeouts_are_opt_in():
+    default = cloudSniffer.HostHealthCache()
+    default.record_failure('https://slow.example.test/a', 'connect-timeout', 'timed out')
+    default.record_failure('https://dead.example.test/a', 'dns', 'NXDOMAIN')
+    assert default.check('https://slow.example.test/b') is None
+    assert default.check('https://dead.example.test/b') == ('dns', 'NXDOMAIN')
+
+    opt_in = cloudSniffer.HostHealthCache(cache_timeouts=True)
+    opt_in.record_failure('https://slow.example.test/a', 'connect-timeout', 'timed out')
+    assert opt_in.check('https://slow.example.test/b') == ('connect-timeout', 'timed out')
+
+
+def test_failures_are_bounded_and_swept():
+    cache = cloudSniffer.HostHealthCache(max_hosts=3)
+    for index in range(10):
+        cache.record_failure(f'https://b{index}.example.test/', 'dns', 'NXDOMAIN')
+    assert len(cache.failures) == 3
+    assert cache.stats()['evicted'] == 7
+
+    expiring = cloudSniffer.HostHealthCache(recheck_interval=0)
+    for index in range(10):
+        expiring.record_failure(f'https://b{index}.example.test/', 'refused', 'refused')
+    assert len(expiring.failures) == 1
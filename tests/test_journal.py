@@ -0,0 +1,48 @@
+import json
+
+import cloudSniffer
+
+
+def test_resume_discards_torn_last_line(tmp_path):
+    path = tmp_path / 'scan.journal'
+    journal = cloudSniffer.ScanJournal(str(path))
+    journal.record({'bucket': 'alpha', 'found': True})
+    journal.record({'bucket': 'beta', 'found': False})
+    journal.close()
+    # Crash no meio da escrita: a última linha ficou sem '\n'
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"bucket": "gam')
+
+    journal = cloudSniffer.ScanJournal(str(path), resume=True)
+    assert list(journal.completed) == ['alpha', 'beta']
+    assert journal.completed['alpha']['found'] is True
+
+    # A linha rasgada foi truncada: o próximo registro começa em uma linha própria
+    journal.record({'bucket': 'gamma', 'found': True})
+    journal.close()
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['bucket'] for line in lines] == ['alpha', 'beta', 'gamma']
+
+
+def test_resume_stops_at_corrupt_complete_line(tmp_path):
+    path = tmp_path / 'scan.journal'
+    path.write_text('{"bucket": "alpha"}\nnot json\n{"bucket": "beta"}\n', encoding='utf-8')
+
+    journal = cloudSniffer.ScanJournal(str(path), resume=True)
+    journal.close()
+    assert list(journal.completed) == ['alpha']
+    assert path.read_text(encoding='utf-8') == '{"bucket": "alpha"}\n'
+
+
+def test_resume_without_file_and_fresh_journal_truncates(tmp_path):
+    path = tmp_path / 'scan.journal'
+    journal = cloudSniffer.ScanJournal(str(path), resume=True)
+    assert journal.completed == {}
+    journal.record({'bucket': 'alpha'})
+    journal.close()
+
+    # Sem resume o journal recomeça do zero
+    journal = cloudSniffer.ScanJournal(str(path))
+    journal.close()
+    assert journal.completed == {}
+    assert path.read_text(encoding='utf-8') == ''
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import cloudSniffer
+from test_report import bucket_result
+
+
+def write_shard(path, shard, buckets):
+    """NDJSON de um shard como o --output-format ndjson grava"""
+    writer = cloudSniffer.NDJSONResultWriter(str(path), {'shard': shard})
+    for name, accessible in buckets:
+        writer.write(bucket_result(name, accessible))
+    writer.close({'shard': shard, 'total_buckets': writer.count})
+    return str(path)
+
+
+def test_ndjson_writer_round_trip(tmp_path):
+    path = write_shard(tmp_path / 'one.ndjson', '1/1', [('alpha', 2), ('beta', 0)])
+
+    records = list(cloudSniffer.iter_result_file(path))
+    assert [kind for kind, _ in records] == ['metadata', 'bucket', 'bucket', 'metadata']
+    assert records[1][1] == bucket_result('alpha', 2)
+    assert records[-1][1] == {'shard': '1/1', 'total_buckets': 2}
+
+    destination = tmp_path / 'one.json'
+    assert cloudSniffer.convert_ndjson_to_json(path, str(destination)) == 2
+    data = json.loads(destination.read_text(encoding='utf-8'))
+    assert data['metadata']['total_buckets'] == 2
+    assert data['results'] == [bucket_result('alpha', 2), bucket_result('beta', 0)]
+
+
+def test_shards_partition_the_input():
+    buckets = [f'bucket-{i}' for i in range(200)]
+    shards = [list(cloudSniffer.iter_shard(buckets, index, 3)) for index in (1, 2, 3)]
+    assert sorted(sum(shards, [])) == sorted(buckets)
+    assert all(shards)
+    # Estável: o mesmo nome sempre cai no mesmo shard
+    assert list(cloudSniffer.iter_shard(buckets, 2, 3)) == shards[1]
+
+
+def test_merge_deduplicates_buckets_across_shards(tmp_path):
+    first = write_shard(tmp_path / 'a.ndjson', '1/3', [('alpha', 2), ('beta', 1)])
+    second = write_shard(tmp_path / 'b.ndjson', '2/3', [('beta', 1), ('gamma', 0)])
+    # Um JSON agregado também entra no merge
+    aggregated = tmp_path / 'c.json'
+    cloudSniffer.write_results_json(str(aggregated), {'shard': '3/3'}, [bucket_result('delta', 3)])
+
+    destination = tmp_path / 'merged.json'
+    metadata, report = cloudSniffer.merge_result_files([first, second, str(aggregated)], str(destination))
+
+    data = json.loads(destination.read_text(encoding='utf-8'))
+    assert [result['bucket'] for result in data['results']] == ['alpha', 'beta', 'gamma', 'delta']
+    assert metadata['total_buckets'] == data['metadata']['total_buckets'] == 4
+    assert [shard['buckets'] for shard in metadata['merged_from']] == [2, 2, 1]
+    assert cloudSniffer.missing_shards(metadata['merged_from']) == []
+    assert report.buckets == 4 and report.found == 3
+    assert report.accessible['http'] == 6
+
+
+@pytest.mark.parametrize('declared, missing', [
+    (['1/4', '3/4'], ['2/4', '4/4']),
+    (['1/2', '1/3'], []),  # Particionamentos diferentes: nada a apontar
+    (['1/2', None], []),
+])
+def test_missing_shards(declared, missing):
+    assert cloudSniffer.missing_shards([{'shard': shard} for shard in declared]) == missing
+
+
+@pytest.mark.parametrize('value', ['0/2', '3/2', '1', 'a/b', '1/2/3'])
+def test_invalid_shard(value):
+    with pytest.raises(ValueError):
+        cloudSniffer.parse_shard(value)
@@ -0,0 +1,42 @@
+import pytest
+
+import cloudSniffer
+
+
+def test_default_rules_expansion_count():
+    rules = cloudSniffer.MutationRules(cloudSniffer.DEFAULT_MUTATIONS)
+    # 1 + 2 * 3 * 9 (env) + 2 * 3 * 15 (suffix) + 2 * 3 * 9 * 15: {sep} repetido na regra usa o mesmo valor
+    assert len(rules.templates) == 955
+    candidates = list(rules.expand('acme'))
+    assert len(candidates) == len(set(candidates)) == 955
+    assert {'acme', 'acme-dev', 'dev.acme', 'acmebackup', 'acme-prod-logs', 'acme.static.qa'} <= set(candidates)
+
+
+def test_empty_values_and_duplicate_templates():
+    rules = cloudSniffer.MutationRules('@env = dev, ""\n{keyword}{sep}{env}\n{env}{sep}{keyword}\n{keyword}')
+    # Valor vazio não deixa separador sobrando; 'acme' gerado por três regras entra uma vez
+    assert list(rules.expand('acme')) == ['acme-dev', 'acme.dev', 'acmedev', 'acme', 'dev-acme', 'dev.acme', 'devacme']
+
+
+def test_sep_can_be_redefined():
+    rules = cloudSniffer.MutationRules('@sep = _\n@env = dev\n{keyword}{sep}{env}')
+    assert list(rules.expand('acme')) == ['acme_dev']
+
+
+@pytest.mark.parametrize('text, message', [
+    ('{env}-data', 'sem {keyword}'),
+    ('{keyword}-{missing}', 'não definidas: missing'),
+    ('@ = a, b\n{keyword}', 'variável inválida'),
+    ('@env\n{keyword}', 'variável inválida'),
+    ('{keyword}-{env', 'regra inválida'),
+])
+def test_invalid_rules(text, message):
+    with pytest.raises(ValueError, match=message):
+        cloudSniffer.MutationRules(text, 'regras.txt')
+
+
+def test_iter_permutations_reads_keywords_lazily(tmp_path):
+    keywords = tmp_path / 'keywords.txt'
+    keywords.write_text('Acme\n# comentário\n\nglobex\n', encoding='utf-8')
+    rules = cloudSniffer.MutationRules('@env = dev, prod\n{keyword}-{env}')
+    assert list(cloudSniffer.iter_permutations([str(keywords)], rules)) == ['acme-dev', 'acme-prod', 'globex-dev', 'globex-prod']
@@ -0,0 +1,40 @@
+import re
+import threading
+
+import cloudSniffer
+
+
+def bucket_result(index):
+    timings = {'dns': 0.001, 'connect': 0.002, 'tls': None, 'ttfb': 0.01, 'total': 0.02}
+    tests = [{'url': f'https://bucket-{index}.s3.amazonaws.com/', 'provider': 'aws', 'timings': timings},
+             {'url': f'https://storage.googleapis.com/bucket-{index}', 'provider': 'gcp', 'timings': None}]
+    return {'bucket': f'bucket-{index}', 'http_tests': tests, 'advanced_tests': []}
+
+
+def exported(text, pattern):
+    return sum(int(value) for value in re.findall(pattern, text, re.M))
+
+
+def test_prometheus_counters_match_histograms_under_concurrent_updates():
+    metrics = cloudSniffer.PhaseMetrics()
+    done = threading.Event()
+
+    def scan():
+        for index in range(3000):
+            metrics.observe_bucket(bucket_result(index))
+        done.set()
+
+    threading.Thread(target=scan, daemon=True).start()
+    while not done.is_set():
+        text = metrics.prometheus()
+        probes = exported(text, r'^cloudsniff_probes_total (\d+)$')
+        errors = exported(text, r'^cloudsniff_probe_errors_total (\d+)$')
+        answered = exported(text, r'^cloudsniff_probe_phase_seconds_by_provider_count\{provider="[^"]+",phase="total"\} (\d+)$')
+        # Instantâneo único: probes = erros + probes com fases, mesmo durante o scan
+        assert probes == errors + answered
+        assert errors * 2 == probes
+
+    summary = metrics.summary()
+    assert summary['probes'] == 6000 and summary['errors'] == 3000
+    assert summary['provider']['aws']['total']['count'] == 3000
+    assert summary['host']['{bucket}.s3.amazonaws.com']['connect']['p50'] == 0.005
@@ -0,0 +1,95 @@
+import pytest
+
+import cloudSniffer
+
+
+class Clock:
+    """time.time controlado pelo teste"""
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cloudSniffer.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = cloudSniffer.ProbeCache(str(tmp_path / 'probes.db'), positive_ttl=60, negative_ttl=600)
+    yield cache
+    cache.close()
+
+
+def probe(status, error=None, headers=None):
+    return cloudSniffer.ProbeResult('https://bucket.s3.amazonaws.com/', 'GET', status_code=status,
+                                    accessible=status is not None and status < 400, headers=headers or {}, error=error)
+
+
+def test_positive_and_negative_ttl(cache, clock):
+    cache.set('open', probe(200, headers={'Server': 'AmazonS3', 'Set-Cookie': 'x'}))
+    cache.set('missing', probe(404))
+
+    hit = cache.get('open', 'https://other/')
+    assert hit['status_code'] == 200 and hit['cached'] and hit['url'] == 'https://other/'
+    assert hit['headers'] == {'Server': 'AmazonS3'}  # Só a allowlist vai para o disco
+
+    clock.now += 60
+    assert cache.get('open', 'https://other/') is None  # Positivo expira primeiro
+    assert cache.get('missing', 'https://other/')['status_code'] == 404
+    clock.now += 540
+    assert cache.get('missing', 'https://other/') is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['stores']) == (2, 2, 2)
+
+
+@pytest.mark.parametrize('result, negative', [
+    (probe(200), False),
+    (probe(403), False),
+    (probe(400), True),
+    (probe(404), True),
+    (probe(None, error='NameResolutionError: NXDOMAIN'), True),
+    (probe(None, error='Read timed out'), None),
+    (probe(429), None),
+    (probe(503), None),
+])
+def test_transient_results_are_not_cached(cache, result, negative):
+    assert cloudSniffer.ProbeCache.is_negative(result) is negative
+    cache.set('key', result)
+    assert (cache.get('key', result['url']) is None) == (negative is None)
+
+
+def test_eviction_keeps_newest_entries(tmp_path, clock):
+    filename = str(tmp_path / 'probes.db')
+    cache = cloudSniffer.ProbeCache(filename, max_entries=10)
+    for index in range(20):
+        clock.now += 1
+        cache.set(f'key-{index}', probe(200))
+    cache.close()  # Poda ao fechar: mantém 90% de max_entries, as mais recentes
+    assert cache.evicted == 11
+
+    cache = cloudSniffer.ProbeCache(filename, max_entries=10)
+    try:
+        kept = [index for index in range(20) if cache.get(f'key-{index}', 'u') is not None]
+    finally:
+        cache.close()
+    assert kept == list(range(11, 20))
+
+
+def test_cache_is_shared_through_the_file(tmp_path, clock):
+    filename = str(tmp_path / 'probes.db')
+    writer = cloudSniffer.ProbeCache(filename)
+    writer.set('key', probe(403))
+    writer.close()
+
+    reader = cloudSniffer.ProbeCache(filename)
+    try:
+        assert reader.get('key', 'u')['status_code'] == 403
+    finally:
+        reader.close()
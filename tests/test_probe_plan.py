@@ -0,0 +1,125 @@
+import socket
+from urllib.parse import urlparse
+
+import pytest
+
+import cloudSniffer
+from conftest import OKHandler
+
+
+@pytest.fixture
+def tester():
+    tester = cloudSniffer.CloudBucketTester(aws_strategy='fanout')
+    yield tester
+    tester.close()
+
+
+def test_mixed_case_names_are_validated_lowercase(tester):
+    mixed = tester.build_probe_plan('MyCompany-Backup')
+    lower = tester.build_probe_plan('mycompany-backup')
+
+    assert len(mixed) == len(lower)
+    assert {probe.provider for probe in mixed} == {probe.provider for probe in lower}
+    assert cloudSniffer.Provider.AWS in {probe.provider for probe in mixed}
+    # Hosts canônicos em minúsculas; o nome digitado segue nos caminhos
+    assert all(urlparse(probe.url).netloc == urlparse(probe.url).netloc.lower() for probe in mixed)
+    assert 'https://s3.amazonaws.com/MyCompany-Backup' in {probe.url for probe in mixed}
+
+
+def test_equivalent_templates_collapse_to_one_probe():
+    registry = cloudSniffer.ProviderRegistry({'store': {'http': [
+        'https://{bucket}.example', 'https://{bucket}.example/', 'HTTPS://{bucket}.EXAMPLE:443/', 'https://{bucket}.example/?',
+        'https://example/{bucket}', 'http://{bucket}.example:80/',
+    ]}})
+    tester = cloudSniffer.CloudBucketTester(registry=registry)
+    try:
+        plan = tester.build_probe_plan('acme')
+    finally:
+        tester.close()
+    assert [probe.url for probe in plan] == ['https://acme.example/', 'https://example/acme', 'http://acme.example/']
+
+
+def test_fanout_plan_has_no_duplicate_urls(tester):
+    plan = tester.build_probe_plan('acme-data')
+    urls = [probe.url for probe in plan]
+    assert len(urls) == len(set(urls))
+    # Com e sem barra final no path-style do S3: uma única URL canônica por região
+    assert 'https://s3.eu-west-1.amazonaws.com/acme-data' in urls
+    assert 'https://s3.eu-west-1.amazonaws.com/acme-data/' not in urls
+    assert {probe.provider for probe in plan} >= {cloudSniffer.Provider.AWS, cloudSniffer.Provider.GCP}
+
+
+class DiscoveryHandler(OKHandler):
+    """HEAD da descoberta: o status e o x-amz-bucket-region vêm do caminho (/301/eu-west-1/bucket)"""
+    def do_HEAD(self):
+        _, status, region, _ = self.path.split('/', 3)
+        self.send_response(int(status))
+        if region != '-':
+            self.send_header('x-amz-bucket-region', region)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def discover(http_server, monkeypatch):
+    """Descobre a região de 'acme-data' com a resposta indicada e retorna (descoberta, plano AWS, tester)"""
+    port = http_server(DiscoveryHandler).server_port
+    testers = []
+
+    def run(status, region='-', url=None):
+        monkeypatch.setattr(cloudSniffer.CloudBucketTester, 's3_discovery_url',
+                            lambda self, bucket: url or f'http://127.0.0.1:{port}/{status}/{region}/{bucket}')
+        tester = cloudSniffer.CloudBucketTester()
+        testers.append(tester)
+        discovery = tester.discover_s3_region('acme-data')
+        try:
+            plan = tester.build_probe_plan('acme-data')
+        finally:
+            tester.release_discovery('acme-data')
+        return discovery, [probe for probe in plan if probe.provider == cloudSniffer.Provider.AWS], tester
+
+    yield run
+    for tester in testers:
+        tester.close()
+
+
+def aws_regions(plan):
+    return {region for probe in plan for region in cloudSniffer.AWS_FANOUT_REGIONS if region in probe.url}
+
+
+def test_discovery_redirect_narrows_aws_to_the_region(discover):
+    discovery, plan, tester = discover(301, 'eu-west-1')
+    assert discovery['status_code'] == 301 and discovery['variant'] == cloudSniffer.Variant.DISCOVERY
+    assert aws_regions(plan) == {'eu-west-1'}
+    # Endpoints legados (us-east-1) já foram cobertos pela própria descoberta
+    assert not any('://s3.amazonaws.com/' in probe.url for probe in plan)
+    assert tester.s3_region_cache.get('acme-data') == 'eu-west-1'
+    assert tester._s3_discovery == {}  # Liberada depois do plano
+
+
+def test_discovery_private_bucket_keeps_region(discover):
+    _, plan, _ = discover(403, 'ap-southeast-1')
+    assert aws_regions(plan) == {'ap-southeast-1'}
+
+
+@pytest.mark.parametrize('status', [400, 404])
+def test_discovery_missing_bucket_drops_aws(discover, status):
+    discovery, plan, tester = discover(status)
+    assert discovery['status_code'] == status
+    assert plan == []
+    assert tester.s3_region_cache.get('acme-data') is None
+
+
+@pytest.mark.parametrize('status, region', [(500, '-'), (301, '-'), (301, 'not-a-region')])
+def test_ambiguous_discovery_falls_back_to_fanout(discover, status, region):
+    _, plan, _ = discover(status, region)
+    assert aws_regions(plan) == set(cloudSniffer.AWS_FANOUT_REGIONS)
+
+
+def test_discovery_network_error_falls_back_to_fanout(discover):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        closed = sock.getsockname()[1]  # Porta sem servidor: conexão recusada
+    discovery, plan, _ = discover(0, url=f'http://127.0.0.1:{closed}/acme-data')
+    assert discovery['status_code'] is None and discovery['error']
+    assert aws_regions(plan) == set(cloudSniffer.AWS_FANOUT_REGIONS)
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import cloudSniffer
+
+
+HEADERS = {'Server': 'AmazonS3', 'x-amz-request-id': 'ABC', 'X-Amz-Bucket-Region': 'eu-west-1', 'Date': 'now'}
+
+
+def result(status, bucket='my-bucket', path=''):
+    return cloudSniffer.ProbeResult(f'https://{bucket}.s3.amazonaws.com/{path}', 'GET', status_code=status,
+                                    accessible=status in (200, 403, 404), headers=dict(HEADERS), size=12,
+                                    timings=(0.001, 0.002, None, 0.01, 0.02))
+
+
+def test_compact_keeps_serialized_form_for_hits():
+    probe = result(200)
+    before = probe.to_dict()
+    probe.compact('my-bucket')
+
+    assert probe.to_dict() == before
+    assert probe['url'] == 'https://my-bucket.s3.amazonaws.com/'
+    assert probe['timings'] == {'dns': 0.001, 'connect': 0.002, 'tls': None, 'ttfb': 0.01, 'total': 0.02}
+    assert json.loads(json.dumps(probe, default=cloudSniffer.json_default)) == before
+
+
+def test_compact_filters_headers_of_non_hits():
+    for status in (404, 500):
+        probe = result(status)
+        before = probe.to_dict()
+        probe.compact('my-bucket')
+        after = probe.to_dict()
+        assert after['headers'] == {'Server': 'AmazonS3', 'X-Amz-Bucket-Region': 'eu-west-1'}
+        assert {k: v for k, v in after.items() if k != 'headers'} == {k: v for k, v in before.items() if k != 'headers'}
+
+
+def test_compact_interns_url_templates():
+    first, second = result(404, 'alpha'), result(404, 'beta')
+    first.compact('alpha')
+    second.compact('beta')
+    # O template sem o nome do bucket é compartilhado entre buckets
+    assert first._template is second._template
+    assert (first.url, second.url) == ('https://alpha.s3.amazonaws.com/', 'https://beta.s3.amazonaws.com/')
+
+    # URL sem o nome do bucket (ex.: endpoint de descoberta) fica como está
+    other = cloudSniffer.ProbeResult('https://s3.amazonaws.com/', 'HEAD')
+    other.compact('alpha')
+    assert other.url == 'https://s3.amazonaws.com/'
+
+    first['url'] = 'https://elsewhere/'
+    assert first.url == 'https://elsewhere/' and first.to_dict()['url'] == 'https://elsewhere/'
+
+
+def test_dict_protocol_and_provider_fields():
+    probe = result(200)
+    assert list(probe.keys()) == list(cloudSniffer.ProbeResult.FIELDS[:-2])
+    assert 'status_code' in probe and 'bucket' not in probe
+    assert probe.get('bucket', 'default') == 'default'
+    with pytest.raises(KeyError):
+        probe['bucket']
+    with pytest.raises(KeyError):
+        probe['bucket'] = 'x'
+    with pytest.raises(AttributeError):
+        probe.extra = 1  # __slots__: sem __dict__ por probe
+
+    probe['provider'], probe['variant'] = 'aws', 'virtual-hosted'
+    assert probe.to_dict()['provider'] == 'aws' and probe.to_dict()['variant'] == 'virtual-hosted'
+
+
+def test_hit_excludes_no_such_bucket():
+    assert result(200).hit and result(403).hit
+    assert not result(404).hit and not result(500).hit
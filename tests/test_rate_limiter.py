@@ -0,0 +1,26 @@
+import time
+
+import cloudSniffer
+
+
+def test_token_bucket_applies_between_requests():
+    limiter = cloudSniffer.HostRateLimiter(rate=10, max_concurrency=15)
+    granted = 0
+    for _ in range(50):
+        if limiter.reserve('s3.amazonaws.com') == 0:
+            granted += 1
+            limiter.release('s3.amazonaws.com')
+    # Rajada limitada ao tamanho do bucket (10 tokens), mesmo com o host ocioso entre requisições
+    assert granted <= 11
+
+
+def test_idle_hosts_are_swept_once_refilled():
+    limiter = cloudSniffer.HostRateLimiter(rate=100, max_concurrency=15, sweep_interval=0)
+    assert limiter.reserve('a.example.test') == 0
+    limiter.release('a.example.test')
+    assert 'a.example.test' in limiter.hosts
+
+    time.sleep(0.05)  # 100 rps: o token usado volta em 10 ms
+    limiter.reserve('b.example.test')
+    assert 'a.example.test' not in limiter.hosts
+    assert 'b.example.test' in limiter.hosts
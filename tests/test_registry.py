@@ -0,0 +1,61 @@
+import json
+from collections import Counter
+
+import pytest
+
+import cloudSniffer
+
+
+def plan_for(bucket, **registry):
+    tester = cloudSniffer.CloudBucketTester(aws_strategy='fanout', registry=cloudSniffer.ProviderRegistry(**registry))
+    try:
+        return tester.build_probe_plan(bucket)
+    finally:
+        tester.close()
+
+
+def test_provider_selection_prunes_the_plan():
+    full = Counter(str(probe.provider) for probe in plan_for('acme-data'))
+    selected = Counter(str(probe.provider) for probe in plan_for('acme-data', selected=['aws', 'gcp']))
+    assert selected == {'aws': full['aws'], 'gcp': full['gcp']}
+    assert sum(full.values()) > sum(selected.values())
+
+
+def test_region_filter_prunes_templates():
+    urls = {probe.url for probe in plan_for('acme-data', selected=['aws'], regions=['eu-west-1'])}
+    assert 'https://acme-data.s3.eu-west-1.amazonaws.com/' in urls
+    assert 'https://acme-data.s3-accelerate.amazonaws.com/' in urls  # Sem {region}: não é filtrado
+    assert not any('us-east-1' in url or 's3.amazonaws.com/' in url for url in urls)
+
+
+def test_user_file_adds_and_replaces_providers(tmp_path):
+    path = tmp_path / 'providers.json'
+    path.write_text(json.dumps({'providers': {
+        'internal': {'regions': ['lab', 'prod'], 'http': ['https://{bucket}.{region}.storage.example']},
+        'azure': {'http': ['https://{bucket}.blob.example.net/']},
+    }}), encoding='utf-8')
+
+    providers = cloudSniffer.ProviderRegistry.load(str(path))
+    assert providers['aws'] is cloudSniffer.BUILTIN_PROVIDERS['aws']
+    urls = {(str(probe.provider), probe.url) for probe in plan_for('acme', providers=providers, selected=['internal', 'azure'])}
+    assert urls == {('internal', 'https://acme.lab.storage.example/'), ('internal', 'https://acme.prod.storage.example/'),
+                    ('azure', 'https://acme.blob.example.net/')}
+
+
+@pytest.mark.parametrize('providers, message', [
+    ({'bad': {'http': ['https://example.com/']}}, 'sem {bucket}'),
+    ({'bad': {'http': ['https://{bucket}.{region}.example']}}, 'não define regiões'),
+    ({'bad': {'name_rule': 'nope', 'http': ['https://{bucket}.example']}}, 'Regra de nome desconhecida'),
+])
+def test_invalid_templates(providers, message):
+    with pytest.raises(ValueError, match=message):
+        cloudSniffer.ProviderRegistry(providers)
+
+
+def test_unknown_provider_and_invalid_file(tmp_path):
+    with pytest.raises(ValueError, match='Provedores desconhecidos: nope'):
+        cloudSniffer.ProviderRegistry(selected=['aws', 'nope'])
+    path = tmp_path / 'providers.json'
+    path.write_text('["aws"]', encoding='utf-8')
+    with pytest.raises(ValueError, match='esperado um objeto'):
+        cloudSniffer.ProviderRegistry.load(str(path))
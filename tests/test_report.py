@@ -0,0 +1,56 @@
+import re
+
+import cloudSniffer
+
+
+def bucket_result(name, accessible):
+    tests = [{'url': f'https://{name}.s3.amazonaws.com/{i}', 'status_code': 200 if i < accessible else 404,
+              'accessible': i < accessible, 'provider': 'aws'} for i in range(max(accessible, 1))]
+    return {'bucket': name, 'http_tests': tests, 'advanced_tests': [], 'cli_tests': []}
+
+
+def test_sections_are_spooled_and_rendered_in_order():
+    report = cloudSniffer.ReportAggregator()
+    # Concluídos fora de ordem (engine async/processos): o relatório segue a ordem de entrada
+    for index in (3, 1, 2):
+        report.observe(bucket_result(f'bucket-{index}', index), index)
+
+    assert report.spool is not None
+    assert len(report.sections) == 9  # Apenas (ordem, posição, tamanho) em memória
+    text = report.render()
+    positions = [text.index(f'BUCKET: bucket-{index}') for index in (1, 2, 3)]
+    assert positions == sorted(positions)
+    assert 'bucket-3 (3), bucket-2 (2), bucket-1 (1)' in text
+
+
+def test_top_buckets_stay_bounded():
+    report = cloudSniffer.ReportAggregator()
+    for index in range(1, 51):
+        report.observe(bucket_result(f'bucket-{index:02d}', index % 7 + 1), index)
+
+    top = report.top_buckets()
+    assert len(report.top) == cloudSniffer.REPORT_TOP_BUCKETS
+    assert top == [('bucket-06', 7), ('bucket-13', 7), ('bucket-20', 7), ('bucket-27', 7), ('bucket-34', 7)]
+    assert report.stats()['found'] == 50
+
+
+def test_equal_hits_have_no_ranking():
+    report = cloudSniffer.ReportAggregator()
+    for index in range(1, 4):
+        report.observe(bucket_result(f'bucket-{index}', 2), index)
+    assert 'Buckets com mais achados' not in report.render()
+
+
+def test_generate_report_accepts_results_list():
+    tester = cloudSniffer.CloudBucketTester()
+    try:
+        results = [bucket_result('bucket-1', 2), bucket_result('bucket-2', 0)]
+        text = re.sub(r'\x1b\[[0-9;]*m', '', tester.generate_report(results))
+        assert 'BUCKET: bucket-1' in text and 'BUCKET: bucket-2' not in text
+        assert 'Buckets testados: 2\n' in text and 'Buckets encontrados: 1\n' in text
+        stats = cloudSniffer.ReportAggregator.from_results(results).stats()
+        assert stats['buckets'] == 2 and stats['found'] == 1
+        # Lista vazia: relatório vazio, não o agregador do último test_buckets
+        assert 'Nenhum bucket acessível encontrado' in tester.generate_report([])
+    finally:
+        tester.close()
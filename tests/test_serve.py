@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+import cloudSniffer
+from conftest import OKHandler
+
+
+DISCOVER_S3_REGION = cloudSniffer.CloudBucketTester.discover_s3_region
+
+
+class SlowHandler(OKHandler):
+    """Responde 200 após 20 ms, para que os jobs fiquem em andamento"""
+    def do_GET(self):
+        time.sleep(0.02)
+        super().do_GET()
+
+    do_HEAD = do_GET
+
+
+@pytest.fixture
+def local_probes(http_server, monkeypatch):
+    """Probe plan de 3 URLs por bucket em um servidor local (sem descoberta de região)"""
+    port = http_server(SlowHandler).server_port
+    monkeypatch.setattr(cloudSniffer.CloudBucketTester, 'build_probe_plan', lambda self, bucket: [
+        cloudSniffer.Probe(f'http://127.0.0.1:{port}/{bucket}/{i}', cloudSniffer.Provider.AWS,
+                           cloudSniffer.Variant.PATH_STYLE, 'http') for i in range(3)])
+    monkeypatch.setattr(cloudSniffer.CloudBucketTester, 'discover_s3_region', lambda self, bucket: None)
+
+
+@pytest.fixture
+def api(local_probes):
+    """Sobe o serve em uma porta efêmera"""
+    tester = cloudSniffer.CloudBucketTester(workers=4)
+    tester.budget = cloudSniffer.ConcurrencyBudget(2)
+    service = cloudSniffer.ScanService(tester, max_jobs=2, no_cli=True)
+    server = cloudSniffer.start_service_server(service, '127.0.0.1:0')
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+    service.close()
+    tester.close()
+
+
+def stream(base, job_id, offset=0):
+    """Linhas NDJSON do stream de resultados (até o job terminar)"""
+    response = requests.get(f'{base}/jobs/{job_id}/results', params={'offset': offset}, timeout=30)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_submit_status_and_results(api):
+    response = requests.post(f'{api}/jobs', json={'buckets': ['alpha', 'beta', 'alpha', ' ']}, timeout=5)
+    assert response.status_code == 202
+    job = response.json()
+    assert job['buckets'] == 2 and job['state'] in ('queued', 'running')
+
+    lines = stream(api, job['id'])
+    assert [line['bucket'] for line in lines[:-1]] == ['alpha', 'beta']
+    assert lines[-1]['type'] == 'job' and lines[-1]['state'] == 'done'
+    assert [line['bucket'] for line in stream(api, job['id'], offset=1)[:-1]] == ['beta']
+
+    detail = requests.get(f'{api}/jobs/{job["id"]}', timeout=5).json()
+    assert detail['completed'] == 2 and detail['found'] == 2
+    assert detail['report']['accessible_urls']['http'] == 6
+    assert [summary['id'] for summary in requests.get(f'{api}/jobs', timeout=5).json()] == [job['id']]
+
+    budget = requests.get(f'{api}/status', timeout=5).json()['tester']['concurrency_budget']
+    assert budget['limit'] == 2 and 1 <= budget['peak'] <= 2
+
+
+def test_report_argument_leaves_tester_report(local_probes):
+    tester = cloudSniffer.CloudBucketTester(workers=2)
+    try:
+        shared = tester.report
+        job_report = cloudSniffer.ReportAggregator()
+        tester.test_buckets(['alpha'], no_cli=True, quiet=True, report=job_report)
+        # Jobs simultâneos do serve: cada um agrega no próprio relatório, sem trocar o do tester
+        assert tester.report is shared
+        assert job_report.found == 1 and shared.found == 0
+    finally:
+        tester.close()
+
+
+def test_concurrent_jobs_keep_their_own_report(api):
+    batches = {prefix: [f'{prefix}-{i}' for i in range(8)] for prefix in ('left', 'right')}
+    jobs = {prefix: requests.post(f'{api}/jobs', json={'buckets': buckets}, timeout=5).json()['id']
+            for prefix, buckets in batches.items()}
+
+    for prefix, job_id in jobs.items():
+        lines = stream(api, job_id)
+        assert [line['bucket'] for line in lines[:-1]] == batches[prefix]
+        detail = requests.get(f'{api}/jobs/{job_id}', timeout=5).json()
+        assert detail['found'] == 8
+        assert detail['report']['buckets'] == 8
+        assert detail['report']['accessible_urls']['http'] == 24
+
+
+class AmbiguousDiscoveryHandler(OKHandler):
+    """HEAD da descoberta de região responde 500: resposta ambígua, o plano usa o fan-out"""
+    def do_HEAD(self):
+        self.send_response(500)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def test_overlapping_jobs_on_same_bucket_keep_region_discovery(api, http_server, monkeypatch):
+    port = http_server(AmbiguousDiscoveryHandler).server_port
+    both_discovered = threading.Barrier(2)
+
+    def build_probe_plan(self, bucket):
+        # Os dois jobs já descobriram; um monta o plano (e libera a descoberta) antes do outro
+        if both_discovered.wait(timeout=5):
+            time.sleep(0.3)
+        return [cloudSniffer.Probe(f'http://127.0.0.1:{port}/{bucket}/{region}', cloudSniffer.Provider.AWS,
+                                   cloudSniffer.Variant.VIRTUAL_HOSTED, 'http')
+                for region in self.aws_regions_for(bucket)]
+
+    monkeypatch.setattr(cloudSniffer.CloudBucketTester, 'discover_s3_region', DISCOVER_S3_REGION)
+    monkeypatch.setattr(cloudSniffer.CloudBucketTester, 's3_discovery_url', lambda self, bucket: f'http://127.0.0.1:{port}/{bucket}')
+    monkeypatch.setattr(cloudSniffer.CloudBucketTester, 'build_probe_plan', build_probe_plan)
+
+    jobs = [requests.post(f'{api}/jobs', json={'buckets': ['shared-bucket']}, timeout=5).json()['id'] for _ in range(2)]
+    for job_id in jobs:
+        result = stream(api, job_id)[0]
+        probes = [test for test in result['http_tests'] if test['variant'] != 'discovery']
+        # O job que monta o plano por último ainda vê a própria descoberta: fan-out completo
+        assert len(probes) == len(cloudSniffer.AWS_FANOUT_REGIONS)
+
+
+def test_cancel_stops_pending_buckets(api):
+    job_id = requests.post(f'{api}/jobs', json={'buckets': [f'bucket-{i}' for i in range(200)]}, timeout=5).json()['id']
+    response = requests.delete(f'{api}/jobs/{job_id}', timeout=5)
+    assert response.status_code == 200
+
+    final = stream(api, job_id)[-1]
+    assert final['state'] == 'cancelled'
+    assert final['completed'] < 200
+
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('get', '/jobs/unknown', None, 404),
+    ('get', '/jobs/unknown/results', None, 404),
+    ('delete', '/jobs/unknown', None, 404),
+    ('get', '/nowhere', None, 404),
+    ('post', '/jobs', b'not json', 400),
+    ('post', '/jobs', b'[]', 400),
+    ('post', '/jobs', b'{"buckets": "alpha"}', 400),
+    ('post', '/jobs', b'{"buckets": []}', 400),
+    ('post', '/jobs', b'{"buckets": ["alpha"], "status": "2xx"}', 400),
+])
+def test_error_responses(api, method, path, body, status):
+    response = requests.request(method, f'{api}{path}', data=body, timeout=5)
+    assert response.status_code == status
+    assert response.headers['Content-Type'] == 'application/json'
+    assert response.json()['error']
+
+
+@pytest.mark.parametrize('offset', ['abc', '-1', '1.5'])
+def test_invalid_offset(api, offset):
+    job_id = requests.post(f'{api}/jobs', json={'buckets': ['alpha']}, timeout=5).json()['id']
+    response = requests.get(f'{api}/jobs/{job_id}/results', params={'offset': offset}, timeout=5)
+    assert response.status_code == 400
+    assert 'offset' in response.json()['error']
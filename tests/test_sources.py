@@ -0,0 +1,55 @@
+import gzip
+import io
+import lzma
+import time
+
+import pytest
+
+import cloudSniffer
+
+
+LINES = 'alpha\n# comentário\n\n  beta  \ngamma\n'
+
+
+@pytest.mark.parametrize('name, opener', [
+    ('buckets.txt', open),
+    ('buckets.txt.gz', gzip.open),
+    ('buckets.txt.xz', lzma.open),
+])
+def test_compressed_sources(tmp_path, name, opener):
+    path = tmp_path / name
+    with opener(path, 'wt', encoding='utf-8') as f:
+        f.write(LINES)
+    assert list(cloudSniffer.iter_bucket_file(str(path))) == ['alpha', 'beta', 'gamma']
+
+
+def test_stdin_source_is_not_closed(monkeypatch):
+    stdin = io.StringIO(LINES)
+    monkeypatch.setattr(cloudSniffer.sys, 'stdin', stdin)
+    assert list(cloudSniffer.iter_bucket_file('-')) == ['alpha', 'beta', 'gamma']
+    assert not stdin.closed
+
+
+def test_bucket_stream_applies_backpressure():
+    def source():
+        for index in range(100):
+            yield f'bucket-{index}'
+
+    stream = cloudSniffer.BucketStream(source(), maxsize=5)
+    time.sleep(0.2)
+    # Sem consumo, o leitor para com a fila cheia (5 na fila + 1 bloqueado no put)
+    assert stream.produced == 5 and stream.queue.qsize() == 5
+    assert list(stream) == [f'bucket-{index}' for index in range(100)]
+    assert stream.produced == 100
+
+
+def test_bucket_stream_reraises_reader_errors():
+    def source():
+        yield 'alpha'
+        raise OSError('arquivo truncado')
+
+    stream = cloudSniffer.BucketStream(source())
+    buckets = iter(stream)
+    assert next(buckets) == 'alpha'
+    with pytest.raises(OSError, match='truncado'):
+        next(buckets)
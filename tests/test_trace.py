@@ -0,0 +1,52 @@
+import pstats
+import re
+import threading
+import time
+
+import cloudSniffer
+
+
+def busy_worker(deadline):
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def test_trace_profiles_threads_and_writes_collapsed_stacks(tmp_path):
+    prefix = str(tmp_path / 'scan')
+    tracer = cloudSniffer.ScanTracer(prefix, interval=0.001, top=5).start()
+    try:
+        # Thread criada depois do start: recebe o próprio cProfile pelo hook
+        worker = threading.Thread(target=busy_worker, args=(time.perf_counter() + 0.2,))
+        worker.start()
+        worker.join()
+    finally:
+        summary = tracer.stop()
+
+    assert len(tracer.profiles) >= 2 and tracer.samples > 0
+    functions = {name for _, _, name in pstats.Stats(f'{prefix}.pstats').stats}
+    assert 'busy_worker' in functions
+
+    lines = open(f'{prefix}.collapsed', encoding='utf-8').read().splitlines()
+    # Formato do flamegraph.pl: frames separados por ';' e a contagem depois do último espaço
+    assert lines and all(re.fullmatch(r'[^;]+(;[^;]+)* \d+', line) for line in lines)
+    assert any(line.rsplit(' ', 1)[0].endswith('test_trace.py:busy_worker') for line in lines)
+
+    plain = re.sub(r'\x1b\[[0-9;]*m', '', summary)
+    assert f'TRACE: {len(tracer.profiles)} threads, {tracer.samples} amostras' in plain
+    assert len(re.findall(r'^\s+\d+\.\d{3}\s+\d+\.\d{3}\s+\d+\s+\S', plain, re.M)) == 5
+    assert f'{prefix}.pstats' in plain and f'{prefix}.collapsed' in plain
+
+
+def test_trace_removes_its_hooks(tmp_path):
+    tracer = cloudSniffer.ScanTracer(str(tmp_path / 'scan')).start()
+    tracer.stop()
+    assert threading.getprofile() is None
+    assert not tracer._sampler.is_alive()
+    # Threads novas depois do stop não ganham profile
+    count = len(tracer.profiles)
+    worker = threading.Thread(target=lambda: None)
+    worker.start()
+    worker.join()
+    assert len(tracer.profiles) == count